@@ -0,0 +1,379 @@
+from numpy import arange, argsort, array_equal, bincount, bitwise_or, \
+    concatenate, count_nonzero, flatnonzero, full, int8, ones, uint32, \
+    uint64, unique, where, zeros
+
+from simulator.utils import popcount
+
+BLOCK_STATES = ("masks", "matrix")
+
+
+# Block states of total_slices slices of n blocks, kept by the backend kind
+# (one of BLOCK_STATES). With check, every change is verified against a
+# recount of the blocks.
+def blockStates(kind, total_slices, n, check=False):
+    if kind == "masks":
+        states = MaskBlockStates(total_slices, n)
+        if check:
+            return CheckedBlockStates(
+                states, MatrixBlockStates(total_slices, n, True))
+        return states
+    elif kind == "matrix":
+        return MatrixBlockStates(total_slices, n, check)
+    raise Exception("Incorrect block states: " + str(kind))
+
+
+# unsigned dtype with a bit for each of n blocks
+def maskType(n):
+    if n <= 32:
+        return uint32
+    if n <= 64:
+        return uint64
+    raise Exception("Blocks of a slice do not fit in a 64 bit mask, n = " +
+                    str(n))
+
+
+# (unique slices, the bits of each one OR-ed together) of slices and bits
+# of the same length
+def combineBits(slices, bits):
+    if len(slices) == 0:
+        return slices, bits
+    order = argsort(slices, kind="mergesort")
+    slices = slices[order]
+    starts = flatnonzero(concatenate(([True], slices[1:] != slices[:-1])))
+    return slices[starts], bitwise_or.reduceat(bits[order], starts)
+
+
+class MaskBlockStates(object):
+    """
+    Block states of every slice as three disjoint n-bit masks, bit i for
+    block i: blocks Unavailable (state 0), Lost with a disk or machine (-1)
+    and Lost to an LSE (-2). Blocks in none of them are Normal (1).
+
+    Array methods take (slices, positions) pairs of chunks, a slice may be
+    given more than once with different positions.
+    """
+
+    def __init__(self, total_slices, n):
+        self.n = n
+        dtype = maskType(n)
+        self.unavailable = zeros(total_slices, dtype=dtype)
+        self.disk_lost = zeros(total_slices, dtype=dtype)
+        self.lse_lost = zeros(total_slices, dtype=dtype)
+        # bit of each block in the masks, and of all blocks
+        self.bits = 1 << arange(n, dtype=dtype)
+        self.all_bits = bitwise_or.reduce(self.bits)
+
+    # blocks in state 0
+    def unavailableMask(self, slice_index):
+        return int(self.unavailable[slice_index])
+
+    # blocks in state -1 or -2
+    def lostMask(self, slice_index):
+        return int(self.disk_lost[slice_index] | self.lse_lost[slice_index])
+
+    # blocks not in state 1, the erasure mask of drs.base.Base
+    def erasedMask(self, slice_index):
+        return int(self.unavailable[slice_index] |
+                   self.disk_lost[slice_index] | self.lse_lost[slice_index])
+
+    def durableCount(self, slice_index):
+        return self.n - int(popcount(self.lostMask(slice_index)))
+
+    def availableCount(self, slice_index):
+        return self.n - int(popcount(self.erasedMask(slice_index)))
+
+    def chunkState(self, slice_index, index):
+        bit = self.bits[index]
+        if self.disk_lost[slice_index] & bit:
+            return -1
+        if self.lse_lost[slice_index] & bit:
+            return -2
+        if self.unavailable[slice_index] & bit:
+            return 0
+        return 1
+
+    def setChunk(self, slice_index, index, state):
+        bit = self.bits[index]
+        self.unavailable[slice_index] &= ~bit
+        self.disk_lost[slice_index] &= ~bit
+        self.lse_lost[slice_index] &= ~bit
+        if state == 0:
+            self.unavailable[slice_index] |= bit
+        elif state == -1:
+            self.disk_lost[slice_index] |= bit
+        elif state == -2:
+            self.lse_lost[slice_index] |= bit
+
+    def sliceState(self, slice_index):
+        return [self.chunkState(slice_index, i) for i in xrange(self.n)]
+
+    def lostMasks(self, slices):
+        return self.disk_lost[slices] | self.lse_lost[slices]
+
+    def erasedMasks(self, slices):
+        return self.unavailable[slices] | self.lostMasks(slices)
+
+    def durableCounts(self, slices):
+        return self.n - popcount(self.lostMasks(slices)).astype(int)
+
+    def availableCounts(self, slices):
+        return self.n - popcount(self.erasedMasks(slices)).astype(int)
+
+    def chunkStates(self, slices, positions):
+        bits = self.bits[positions]
+        states = ones(len(slices), dtype=int8)
+        states[(self.unavailable[slices] & bits) != 0] = 0
+        states[(self.lse_lost[slices] & bits) != 0] = -2
+        states[(self.disk_lost[slices] & bits) != 0] = -1
+        return states
+
+    # The chunks fail: they become -1 when durable, otherwise state 1
+    # becomes 0 and lost chunks stay as they are.
+    def failChunks(self, slices, positions, durable):
+        slices, bits = combineBits(slices, self.bits[positions])
+        if durable:
+            self.disk_lost[slices] |= bits
+            self.unavailable[slices] &= ~bits
+            self.lse_lost[slices] &= ~bits
+        else:
+            self.unavailable[slices] |= bits & ~self.lostMasks(slices)
+
+    # The chunks in state 0 become 1.
+    def restoreChunks(self, slices, positions):
+        slices, bits = combineBits(slices, self.bits[positions])
+        self.unavailable[slices] &= ~bits
+
+    def check(self, slices):
+        unavailable = self.unavailable[slices]
+        disk_lost = self.disk_lost[slices]
+        lse_lost = self.lse_lost[slices]
+        if (unavailable & disk_lost).any() or \
+                (unavailable & lse_lost).any() or \
+                (disk_lost & lse_lost).any():
+            raise Exception("Block state masks overlap")
+        if ((unavailable | disk_lost | lse_lost) & ~self.all_bits).any():
+            raise Exception("Block state masks exceed n bits")
+
+
+class MatrixBlockStates(object):
+    """
+    Block states of every slice as a (slices, n) int8 matrix, with per-slice
+    counters of the available blocks (state 1) and the durable ones (state 1
+    or 0), changed along with the cells. The erasure masks the DRS lookups
+    take are kept next to them. With check, every count lookup and every
+    check() recounts the cells.
+    """
+
+    def __init__(self, total_slices, n, check=False):
+        self.n = n
+        self.status = ones((total_slices, n), dtype=int8)
+        self.available = full(total_slices, n, dtype=int8)
+        self.durable = full(total_slices, n, dtype=int8)
+        dtype = maskType(n)
+        # blocks not in state 1, and blocks in state -1 or -2
+        self.erased = zeros(total_slices, dtype=dtype)
+        self.lost = zeros(total_slices, dtype=dtype)
+        self.bits = 1 << arange(n, dtype=dtype)
+        self.recount = check
+
+    def unavailableMask(self, slice_index):
+        return int(self.erased[slice_index] & ~self.lost[slice_index])
+
+    def lostMask(self, slice_index):
+        return int(self.lost[slice_index])
+
+    def erasedMask(self, slice_index):
+        return int(self.erased[slice_index])
+
+    def durableCount(self, slice_index):
+        if self.recount and self.durable[slice_index] != \
+                count_nonzero(self.status[slice_index] >= 0):
+            raise Exception("Durable counter differs from the recount")
+        return int(self.durable[slice_index])
+
+    def availableCount(self, slice_index):
+        if self.recount and self.available[slice_index] != \
+                count_nonzero(self.status[slice_index] == 1):
+            raise Exception("Available counter differs from the recount")
+        return int(self.available[slice_index])
+
+    def chunkState(self, slice_index, index):
+        return int(self.status[slice_index, index])
+
+    def setChunk(self, slice_index, index, state):
+        old = self.status[slice_index, index]
+        if old == state:
+            return
+        if old == 1:
+            self.available[slice_index] -= 1
+        if old >= 0:
+            self.durable[slice_index] -= 1
+        if state == 1:
+            self.available[slice_index] += 1
+        if state >= 0:
+            self.durable[slice_index] += 1
+        self.status[slice_index, index] = state
+
+        bit = self.bits[index]
+        if state == 1:
+            self.erased[slice_index] &= ~bit
+        else:
+            self.erased[slice_index] |= bit
+        if state < 0:
+            self.lost[slice_index] |= bit
+        else:
+            self.lost[slice_index] &= ~bit
+
+    def sliceState(self, slice_index):
+        return self.status[slice_index].tolist()
+
+    def lostMasks(self, slices):
+        return self.lost[slices]
+
+    def erasedMasks(self, slices):
+        return self.erased[slices]
+
+    def durableCounts(self, slices):
+        return self.durable[slices].astype(int)
+
+    def availableCounts(self, slices):
+        return self.available[slices].astype(int)
+
+    def chunkStates(self, slices, positions):
+        return self.status[slices, positions]
+
+    # add changes to the counters of slices, a slice may come more than once
+    def _add(self, counters, slices, changes):
+        if len(slices) == 0:
+            return
+        slices, inverse = unique(slices, return_inverse=True)
+        counters[slices] += bincount(inverse, weights=changes,
+                                     minlength=len(slices)).astype(int8)
+
+    def failChunks(self, slices, positions, durable):
+        old = self.status[slices, positions]
+        if durable:
+            new = full(len(old), -1, dtype=int8)
+        else:
+            new = where(old == 1, int8(0), old)
+        self.status[slices, positions] = new
+        self._add(self.available, slices, -(old == 1).astype(int8))
+        self._add(self.durable, slices,
+                  -((old >= 0) & (new < 0)).astype(int8))
+
+        slices, bits = combineBits(slices, self.bits[positions])
+        self.erased[slices] |= bits
+        if durable:
+            self.lost[slices] |= bits
+
+    def restoreChunks(self, slices, positions):
+        back = self.status[slices, positions] == 0
+        slices = slices[back]
+        positions = positions[back]
+        self.status[slices, positions] = 1
+        self._add(self.available, slices, ones(len(slices), dtype=int8))
+
+        slices, bits = combineBits(slices, self.bits[positions])
+        self.erased[slices] &= ~bits
+
+    def check(self, slices):
+        if (self.durable[slices] < 0).any() or \
+                (self.available[slices] < 0).any():
+            raise Exception("Block counters below zero")
+        if not self.recount:
+            return
+        rows = self.status[slices]
+        if (self.durable[slices] != count_nonzero(rows >= 0, axis=1)).any() \
+                or (self.available[slices] !=
+                    count_nonzero(rows == 1, axis=1)).any():
+            raise Exception("Block counters differ from the recount")
+        if (self.erased[slices] !=
+                bitwise_or.reduce((rows != 1) * self.bits, axis=1)).any() or \
+                (self.lost[slices] !=
+                 bitwise_or.reduce((rows < 0) * self.bits, axis=1)).any():
+            raise Exception("Erasure masks differ from the recount")
+
+
+class CheckedBlockStates(object):
+    """
+    Block states kept by two backends at once, every change goes to both
+    and every lookup must give the same answer from both. Used to check a
+    backend against a reference which recounts its cells.
+    """
+
+    def __init__(self, states, reference):
+        self.n = states.n
+        self.states = states
+        self.reference = reference
+
+    def _same(self, value, expected):
+        if not array_equal(value, expected):
+            raise Exception("Block states differ from the reference: " +
+                            str(value) + " != " + str(expected))
+        return value
+
+    def unavailableMask(self, slice_index):
+        return self._same(self.states.unavailableMask(slice_index),
+                          self.reference.unavailableMask(slice_index))
+
+    def lostMask(self, slice_index):
+        return self._same(self.states.lostMask(slice_index),
+                          self.reference.lostMask(slice_index))
+
+    def erasedMask(self, slice_index):
+        return self._same(self.states.erasedMask(slice_index),
+                          self.reference.erasedMask(slice_index))
+
+    def durableCount(self, slice_index):
+        return self._same(self.states.durableCount(slice_index),
+                          self.reference.durableCount(slice_index))
+
+    def availableCount(self, slice_index):
+        return self._same(self.states.availableCount(slice_index),
+                          self.reference.availableCount(slice_index))
+
+    def chunkState(self, slice_index, index):
+        return self._same(self.states.chunkState(slice_index, index),
+                          self.reference.chunkState(slice_index, index))
+
+    def setChunk(self, slice_index, index, state):
+        self.states.setChunk(slice_index, index, state)
+        self.reference.setChunk(slice_index, index, state)
+
+    def sliceState(self, slice_index):
+        return self._same(self.states.sliceState(slice_index),
+                          self.reference.sliceState(slice_index))
+
+    def lostMasks(self, slices):
+        return self._same(self.states.lostMasks(slices),
+                          self.reference.lostMasks(slices))
+
+    def erasedMasks(self, slices):
+        return self._same(self.states.erasedMasks(slices),
+                          self.reference.erasedMasks(slices))
+
+    def durableCounts(self, slices):
+        return self._same(self.states.durableCounts(slices),
+                          self.reference.durableCounts(slices))
+
+    def availableCounts(self, slices):
+        return self._same(self.states.availableCounts(slices),
+                          self.reference.availableCounts(slices))
+
+    def chunkStates(self, slices, positions):
+        return self._same(self.states.chunkStates(slices, positions),
+                          self.reference.chunkStates(slices, positions))
+
+    def failChunks(self, slices, positions, durable):
+        self.states.failChunks(slices, positions, durable)
+        self.reference.failChunks(slices, positions, durable)
+
+    def restoreChunks(self, slices, positions):
+        self.states.restoreChunks(slices, positions)
+        self.reference.restoreChunks(slices, positions)
+
+    def check(self, slices):
+        self.states.check(slices)
+        self.reference.check(slices)
+        self.erasedMasks(slices)
+        self.lostMasks(slices)
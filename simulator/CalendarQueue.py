@@ -0,0 +1,164 @@
+import sys
+from bisect import insort
+from heapq import nsmallest
+from math import isinf
+
+from simulator.EventQueue import EventQueue
+
+
+class CalendarQueue(EventQueue):
+    """
+    Calendar queue scheduler (R. Brown, CACM 1988).
+
+    Time is cut into buckets of 'bucket_width' hours which wrap around a
+    'year' of 'bucket_count' buckets. An event at time t lives in bucket
+    int(t/width) % bucket_count, each bucket keeps its (time, event_id, event)
+    entries sorted, and removeFirst scans forward from the bucket of the last
+    popped event. Enqueue and dequeue are O(1) amortized while the bucket
+    width tracks the gap between neighbouring events, so the calendar is
+    resized (and the width re-estimated from the earliest pending events)
+    whenever the event count leaves [bucket_count/2, 2*bucket_count].
+
+    Events come out in exactly the (time, event_id) order of EventQueue, and
+    are cancelled the same way, by clearing the event slot of their entry.
+    Times too far out for a virtual bucket number, infinity among them,
+    share the overflow bucket.
+    """
+    min_bucket_count = 2
+    overflow_bucket = sys.maxint
+    # number of earliest events used to estimate the bucket width
+    sample_size = 25
+
+    def __init__(self, compact_ratio=0.5, bucket_count=2, bucket_width=1.0):
+        self.compact_ratio = compact_ratio
+        self.bucket_count = bucket_count
+        self.bucket_width = bucket_width
+        self.buckets = [[] for i in xrange(bucket_count)]
+        # live events, and cancelled entries still in the buckets
+        self.count = 0
+        self.dead = 0
+        # virtual bucket, int(time/bucket_width), the dequeue scan is at.
+        # No pending event has a smaller virtual bucket.
+        self.current = 0
+
+    def _virtualBucket(self, ts):
+        vb = ts/self.bucket_width
+        if vb >= self.overflow_bucket:
+            return self.overflow_bucket
+        if vb <= -self.overflow_bucket:
+            return -self.overflow_bucket
+        return int(vb)
+
+    def _estimateWidth(self, entries):
+        times = [entry[0] for entry in nsmallest(self.sample_size, entries)
+                 if not isinf(entry[0])]
+        gaps = [times[i+1] - times[i] for i in xrange(len(times)-1)]
+        gaps = [gap for gap in gaps if gap > 0]
+        if gaps == []:
+            return self.bucket_width
+
+        # leave the outliers out, they are the sparse far-future events
+        avg_gap = sum(gaps)/len(gaps)
+        gaps = [gap for gap in gaps if gap <= 2*avg_gap]
+        return 3.0*sum(gaps)/len(gaps)
+
+    def _resize(self, bucket_count):
+        entries = []
+        for bucket in self.buckets:
+            entries += [entry for entry in bucket if entry[2] is not None]
+        entries.sort()
+        self.dead = 0
+
+        self.bucket_width = self._estimateWidth(entries)
+        self.bucket_count = bucket_count
+        self.buckets = [[] for i in xrange(bucket_count)]
+        # entries are sorted, so plain appends keep every bucket sorted
+        for entry in entries:
+            vb = self._virtualBucket(entry[0])
+            self.buckets[vb % bucket_count].append(entry)
+        if entries != []:
+            self.current = self._virtualBucket(entries[0][0])
+        else:
+            self.current = 0
+
+    def addEvent(self, e):
+        entry = [e.getTime(), e.event_id, e]
+        e.queue_entry = entry
+        vb = self._virtualBucket(entry[0])
+        insort(self.buckets[vb % self.bucket_count], entry)
+        self.count += 1
+        if vb < self.current:
+            self.current = vb
+
+        if self.count > 2*self.bucket_count:
+            self._resize(2*self.bucket_count)
+
+    def removeFirst(self):
+        if self.count == 0:
+            return None
+
+        vb = self.current
+        bucket = None
+        for i in xrange(self.bucket_count):
+            candidate = self.buckets[vb % self.bucket_count]
+            while candidate != [] and candidate[0][2] is None:
+                candidate.pop(0)
+                self.dead -= 1
+            if candidate != [] and \
+               self._virtualBucket(candidate[0][0]) <= vb:
+                bucket = candidate
+                break
+            vb += 1
+
+        # Nothing within one year of the current bucket, jump straight to
+        # the earliest event.
+        if bucket is None:
+            self.compact()
+            bucket = min([b for b in self.buckets if b != []])
+            vb = self._virtualBucket(bucket[0][0])
+
+        self.current = vb
+        first_key, event_id, first_event = bucket.pop(0)
+        first_event.queue_entry = None
+        self.count -= 1
+
+        if self.count < self.bucket_count/2 and \
+           self.bucket_count > self.min_bucket_count:
+            self._resize(self.bucket_count/2)
+        return first_event
+
+    def remove(self, e):
+        entry = e.queue_entry
+        if entry is None or entry[2] is not e:
+            raise Exception("Event is not in the queue")
+        entry[2] = None
+        e.queue_entry = None
+        self.count -= 1
+        self.dead += 1
+        if self.dead > self.compact_ratio*(self.count + self.dead):
+            self.compact()
+
+    def compact(self):
+        self.buckets = [[entry for entry in bucket if entry[2] is not None]
+                        for bucket in self.buckets]
+        self.dead = 0
+
+    def convertToArray(self):
+        res = []
+        for bucket in self.buckets:
+            res += [e for ts, event_id, e in bucket if e is not None]
+        return res
+
+    # Events keep the handle of this queue, so remove() on the clone does
+    # not reach them.
+    def clone(self):
+        ret = CalendarQueue(self.compact_ratio, self.bucket_count,
+                            self.bucket_width)
+        ret.buckets = [[list(entry) for entry in bucket if entry[2] is not None]
+                       for bucket in self.buckets]
+        ret.count = self.count
+        ret.current = self.current
+        return ret
+
+    def size(self):
+        return self.count
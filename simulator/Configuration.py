@@ -47,7 +47,46 @@ class Configuration(object):
 
         self.datacenters = int(d.pop("datacenters", 1))
 
+        # file the generated events are printed to, None (or empty) for none
         self.event_file = d.pop("event_file", None)
+        if self.event_file is not None and self.event_file.strip() == "":
+            self.event_file = None
+        # "text" for one line per event, "binary" for an EventLog
+        self.event_file_format = d.pop("event_file_format", "text")
+        # binary event file of an earlier run, whose events are handled
+        # instead of generating new ones
+        self.replay_file = d.pop("replay_file", None)
+        if self.replay_file is not None and self.replay_file.strip() == "":
+            self.replay_file = None
+
+        # event scheduler: "heap" or "calendar"
+        self.scheduler = d.pop("scheduler", "heap")
+        # cancelled events the queue holds, as a fraction of all its entries,
+        # before it compacts them away
+        self.compaction_threshold = float(d.pop("compaction_threshold", 0.5))
+        # generate failure events on demand instead of the whole timeline
+        # before the simulation starts
+        self.streaming_events = self._bool(d.pop("streaming_events", "false"))
+        # processes generating the events of the racks in parallel, each rack
+        # from its own random streams; 0 generates them in this process, rack
+        # by rack when seeded, otherwise walking the whole topology in order
+        self.generation_workers = int(d.pop("generation_workers", 0))
+        # master seed all random streams are derived from (see
+        # simulator.Seeds); empty draws from the unseeded global generators
+        seed = d.pop("seed", "").strip()
+        self.seed = int(seed) if seed != "" else None
+
+        # event trace: "off", "summary" or "event"
+        self.trace_level = d.pop("trace_level", "off")
+        self.trace_file = d.pop("trace_file", BASE_PATH + "log/trace")
+        # trace only every trace_every-th event
+        self.trace_every = int(d.pop("trace_every", 1))
+        # trace only events touching these slices
+        trace_slices = d.pop("trace_slices", "")
+        if trace_slices.strip() == "":
+            self.trace_slices = None
+        else:
+            self.trace_slices = splitIntMethod(trace_slices)
 
         # If n <= 15 in each stripe, no two chunks are on the same rack.
         self.num_chunks_diff_racks = 15
@@ -77,6 +116,18 @@ class Configuration(object):
 
         self.parallel_repair = self._bool(d.pop("parallel_repair", "false"))
 
+        # how the block states of the slices are kept, one of
+        # BlockStates.BLOCK_STATES: "masks" (three bitmasks per slice) or
+        # "matrix" (int8 states with available/durable counters)
+        self.block_states = d.pop("block_states", "masks")
+        # debug: check the block states against a recount of the blocks, and
+        # the lookups done on them
+        self.check_counters = self._bool(d.pop("check_counters", "false"))
+        # directory the repairable tables of the codes are cached in between
+        # runs; empty keeps them in memory only
+        drs_table_dir = d.pop("drs_table_dir", "").strip()
+        self.drs_table_dir = drs_table_dir if drs_table_dir != "" else None
+
         self.availability_counts_for_recovery = self._bool(d[
             "availability_counts_for_recovery"])
 
@@ -96,6 +147,8 @@ class Configuration(object):
             self.detect_intervals = splitFloatMethod(detect_intervals)
 
         self.drs_handler = getDRSHandler(data_redundancy[0], data_redundancy[1:])
+        if self.drs_table_dir is not None:
+            self.drs_handler.setTableDir(self.drs_table_dir)
         if not self.lazy_recovery:
             self.recovery_threshold = self.drs_handler.n - 1
         else:
@@ -186,7 +239,7 @@ class Configuration(object):
     def DRSHandler(self):
         return self.drs_handler
 
-    def getAvailableLazyThreshold(self, time_since_failed):
+    def getAvailableLazyThreshold(self, time_since_failed, rand=random):
         threshold_gap = self.drs_handler.n - 1 - self.recovery_threshold
         length = len(self.availability_to_durability_threshold)
         index = 0
@@ -199,7 +252,7 @@ class Configuration(object):
                     index = i
                 break
         threshold_increment = threshold_gap * \
-            (1 if random() < self.recovery_probability[i] else 0)
+            (1 if rand() < self.recovery_probability[i] else 0)
         return self.recovery_threshold + threshold_increment
 
     def returnSliceSize(self):
@@ -214,6 +267,15 @@ class Configuration(object):
              "machines_per_rack": self.machines_per_rack,
              "datacenters": self.datacenters,
              "event_file": self.event_file,
+             "event_file_format": self.event_file_format,
+             "replay_file": self.replay_file,
+             "scheduler": self.scheduler,
+             "block_states": self.block_states,
+             "compaction_threshold": self.compaction_threshold,
+             "streaming_events": self.streaming_events,
+             "generation_workers": self.generation_workers,
+             "seed": self.seed,
+             "trace_level": self.trace_level,
              "recovery_threshold": self.recovery_threshold,
              "lazy_only_available": self.lazy_only_available,
              "data_redundancy": self.data_redundancy,
@@ -249,7 +311,16 @@ class Configuration(object):
                         ", data placement: " + self.data_placement + \
                         ", recovery bandwidth cross rack: " + str(self.recovery_bandwidth_cross_rack) + \
                         ", installment size: " + str(self.installment_size) + \
-                        ", event file path: " + self.event_file + \
+                        ", event file path: " + str(self.event_file) + \
+                        ", event file format: " + self.event_file_format + \
+                        ", replay file: " + str(self.replay_file) + \
+                        ", scheduler: " + self.scheduler + \
+                        ", block states: " + self.block_states + \
+                        ", compaction threshold: " + str(self.compaction_threshold) + \
+                        ", streaming events: " + str(self.streaming_events) + \
+                        ", generation workers: " + str(self.generation_workers) + \
+                        ", seed: " + str(self.seed) + \
+                        ", trace level: " + self.trace_level + \
                         ", outputs: " + str(self.outputs) + \
                         ", auto repair: " + str(self.auto_repair) + \
                         ", hierarchical: " + str(self.hierarchical) + \
@@ -1,10 +1,19 @@
-from enum import Enum
+from itertools import count
+
+from numpy import array, argsort, concatenate, int8, int32, float64
+
+# source of event_id, which breaks ties between events at the same time
+_event_ids = count(1)
 
 
 class Event(object):
-    event_id = 0
+    # no per-instance __dict__, an Event is a handful of pointers
+    __slots__ = ("type", "time", "unit", "info", "ignore",
+                 "next_recovery_time", "attributes", "event_id",
+                 "queue_entry")
 
-    class EventType(Enum):
+    class EventType(object):
+        # small int type codes, compared directly in handleEvent
         Start = 0
         Failure = 1
         Recovered = 2
@@ -17,6 +26,10 @@ class Event(object):
         # ScrubComplete = 7
         End = 8
 
+        names = ("Start", "Failure", "Recovered", "EagerRecoveryStart",
+                 "EagerRecoveryInstallment", "LatentDefect",
+                 "LatentRecovered", "RAFIRecovered", "End")
+
     def __init__(self, e_type, time, unit, info=-100, ignore=False,
                  next_recovery_time=0):
         self.type = e_type
@@ -25,13 +38,19 @@ class Event(object):
         self.info = info
         self.ignore = ignore
         self.next_recovery_time = next_recovery_time
-        self.attributes = {}
-        Event.event_id += 1
-        self.event_id = Event.event_id
+        # only created by setAttributes
+        self.attributes = None
+        self.event_id = next(_event_ids)
+        # [time, event_id, event] entry of the queue holding this event,
+        # cancelling the event clears the entry (tombstone).
+        self.queue_entry = None
 
     def getType(self):
         return self.type
 
+    def getTypeName(self):
+        return "EventType." + Event.EventType.names[self.type]
+
     def getTime(self):
         return self.time
 
@@ -39,18 +58,100 @@ class Event(object):
         return self.unit
 
     def getAttributes(self, key):
-        if self.attributes == {}:
+        if self.attributes is None:
             return None
         return self.attributes[key]
 
     def setAttributes(self, key, value):
+        if self.attributes is None:
+            self.attributes = {}
         self.attributes[key] = value
 
     # time + " " + next_recovery + " " + unit + " " + type + " " + info + " "
     # + ignore
     def toString(self):
         format_string = str(self.time) + "  " + str(self.next_recovery_time) \
-            + "  " + self.unit.toString() + "  " + str(self.type) + "  " \
+            + "  " + self.unit.toString() + "  " + self.getTypeName() + "  " \
             + str(self.info) + "  " + str(self.ignore) + "  " \
             + str(self.event_id) + "\n"
         return format_string
+
+
+class EventBatch(object):
+    """
+    Struct-of-arrays form of many events, for events generated in bulk:
+    int8 type codes, int32 unit ids, float64 times and next recovery times,
+    int8 infos and bool ignore flags. Unit ids are resolved through a unit
+    table (see Unit.unitTable) only when the batch is turned into Events.
+    """
+
+    def __init__(self, types, unit_ids, times, next_recovery_times=None,
+                 infos=None, ignores=None):
+        self.types = array(types, dtype=int8)
+        self.unit_ids = array(unit_ids, dtype=int32)
+        self.times = array(times, dtype=float64)
+        size = len(self.times)
+        if next_recovery_times is None:
+            next_recovery_times = [0] * size
+        if infos is None:
+            infos = [-100] * size
+        if ignores is None:
+            ignores = [False] * size
+        self.next_recovery_times = array(next_recovery_times, dtype=float64)
+        self.infos = array(infos, dtype=int8)
+        self.ignores = array(ignores, dtype=bool)
+
+    @staticmethod
+    def fromEvents(events):
+        return EventBatch([e.type for e in events],
+                          [e.unit.getID() for e in events],
+                          [e.time for e in events],
+                          [e.next_recovery_time for e in events],
+                          [e.info for e in events],
+                          [e.ignore for e in events])
+
+    # one batch of the events of batches, in order
+    @staticmethod
+    def concatenate(batches):
+        return EventBatch(concatenate([b.types for b in batches]),
+                          concatenate([b.unit_ids for b in batches]),
+                          concatenate([b.times for b in batches]),
+                          concatenate([b.next_recovery_times
+                                       for b in batches]),
+                          concatenate([b.infos for b in batches]),
+                          concatenate([b.ignores for b in batches]))
+
+    def size(self):
+        return len(self.times)
+
+    # stable, so events at the same time keep their order in the batch
+    def sort(self):
+        order = argsort(self.times, kind="mergesort")
+        self.types = self.types[order]
+        self.unit_ids = self.unit_ids[order]
+        self.times = self.times[order]
+        self.next_recovery_times = self.next_recovery_times[order]
+        self.infos = self.infos[order]
+        self.ignores = self.ignores[order]
+
+    # events first to last (exclusive, None for the end) as Events
+    def toEvents(self, unit_table, first=0, last=None):
+        if last is None:
+            last = len(self.times)
+        for i in xrange(first, last):
+            yield Event(int(self.types[i]), float(self.times[i]),
+                        unit_table[self.unit_ids[i]], int(self.infos[i]),
+                        bool(self.ignores[i]),
+                        float(self.next_recovery_times[i]))
+
+    # Event source for StreamingEventQueue (see Unit.eventCycles) of a sorted
+    # batch: adds its events to queue chunk_size at a time, and yields the
+    # time of the first event not added yet.
+    def source(self, queue, unit_table, chunk_size=10000):
+        size = self.size()
+        for first in xrange(0, size, chunk_size):
+            last = min(first + chunk_size, size)
+            for e in self.toEvents(unit_table, first, last):
+                queue.addEvent(e)
+            if last < size:
+                yield float(self.times[last])
@@ -0,0 +1,132 @@
+import json
+import struct
+
+from numpy import dtype, empty, memmap, searchsorted
+
+from simulator.Event import EventBatch
+
+MAGIC = "CRSIMEVT"
+VERSION = 1
+# magic, version, length of the JSON header that follows
+PREAMBLE = struct.Struct("<8sII")
+
+# one fixed-width, packed record per event
+RECORD = dtype([("time", "<f8"),
+                ("next_recovery_time", "<f8"),
+                ("unit_id", "<i4"),
+                ("type", "i1"),
+                ("info", "i1"),
+                ("ignore", "?")])
+
+
+class EventLogWriter(object):
+    """
+    Binary, append-only event log. The file starts with a header naming
+    every unit id (the unit table) and a free-form message, followed by
+    fixed-width RECORDs. Records must be appended in time order, which lets
+    EventLogReader find a time range by binary search.
+    """
+
+    def __init__(self, file_name, msg, unit_table):
+        units = {}
+        for unit_id, unit in unit_table.iteritems():
+            units[str(unit_id)] = unit.toString()
+        header = json.dumps({"message": msg, "units": units})
+
+        self.out = open(file_name, "wb")
+        self.out.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        self.out.write(header)
+        self.last_time = None
+
+    # batch: an EventBatch
+    def append(self, batch):
+        if batch.size() == 0:
+            return
+        if (self.last_time is not None and batch.times[0] < self.last_time) \
+                or (batch.times[1:] < batch.times[:-1]).any():
+            raise Exception("Event log records must be appended in time order")
+
+        records = empty(batch.size(), dtype=RECORD)
+        records["time"] = batch.times
+        records["next_recovery_time"] = batch.next_recovery_times
+        records["unit_id"] = batch.unit_ids
+        records["type"] = batch.types
+        records["info"] = batch.infos
+        records["ignore"] = batch.ignores
+        self.out.write(records.tostring())
+        self.last_time = batch.times[-1]
+
+    def close(self):
+        self.out.close()
+
+
+class EventLogReader(object):
+    """
+    Reads an event log written by EventLogWriter through a memory map, so
+    only the records of the time ranges asked for are paged in.
+    """
+
+    def __init__(self, file_name):
+        with open(file_name, "rb") as fp:
+            magic, version, header_len = PREAMBLE.unpack(
+                fp.read(PREAMBLE.size))
+            if magic != MAGIC or version != VERSION:
+                raise Exception("Not an event log: " + file_name)
+            header = json.loads(fp.read(header_len))
+            fp.seek(0, 2)
+            data_len = fp.tell() - PREAMBLE.size - header_len
+
+        self.message = header["message"]
+        # unit id: full unit name, as written
+        self.units = {}
+        for unit_id, name in header["units"].iteritems():
+            self.units[int(unit_id)] = name
+
+        if data_len == 0:
+            self.records = empty(0, dtype=RECORD)
+        else:
+            self.records = memmap(file_name, dtype=RECORD, mode="r",
+                                  offset=PREAMBLE.size + header_len,
+                                  shape=(data_len/RECORD.itemsize,))
+
+    def size(self):
+        return len(self.records)
+
+    def _batch(self, records):
+        return EventBatch(records["type"], records["unit_id"],
+                          records["time"], records["next_recovery_time"],
+                          records["info"], records["ignore"])
+
+    # events with start_time <= time < end_time
+    def timeRange(self, start_time, end_time):
+        times = self.records["time"]
+        first = searchsorted(times, start_time, "left")
+        last = searchsorted(times, end_time, "left")
+        return self._batch(self.records[first:last])
+
+    def readAll(self):
+        return self._batch(self.records)
+
+    # {unit id in the log: unit} for the units under root, matched by name
+    def resolveUnits(self, root):
+        by_name = {}
+        for unit in root.unitTable().itervalues():
+            by_name[unit.toString()] = unit
+        units = {}
+        for unit_id, name in self.units.iteritems():
+            if name not in by_name:
+                raise Exception("Unit " + name + " of the event log is not in the topology")
+            units[unit_id] = by_name[name]
+        return units
+
+    # Event source for StreamingEventQueue (see Unit.eventCycles): adds the
+    # logged events to queue chunk_size records at a time, and yields the time
+    # of the first record not added yet.
+    def replay(self, queue, units, chunk_size=10000):
+        times = self.records["time"]
+        for first in xrange(0, self.size(), chunk_size):
+            batch = self._batch(self.records[first:first+chunk_size])
+            for e in batch.toEvents(units):
+                queue.addEvent(e)
+            if first + chunk_size < self.size():
+                yield float(times[first+chunk_size])
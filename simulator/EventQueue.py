@@ -1,114 +1,132 @@
-from collections import OrderedDict
-from simulator.Event import Event
-from simulator.unit.SliceSet import SliceSet
-
-
-class EventQueue(object):
-    events = OrderedDict()
-
-    def addEvent(self, e):
-        if e.getTime() in EventQueue.events.keys():
-            EventQueue.events.get(e.getTime()).append(e)
-        else:
-            event_list = []
-            event_list.append(e)
-            EventQueue.events.setdefault(e.getTime(), event_list)
-
-    def updateEvent(self, ts, e, slice_index):
-        if isinstance(e.getUnit(), SliceSet):
-            index = EventQueue.events.get(ts).index(e)
-            EventQueue.event.get(ts)[index].getUnit().remove(slice_index)
-        else:
-            raise Exception("lost unit is not SliceSet.")
-
-    def addEventQueue(self, queue):
-        all_events = queue.getAllEvents()
-        for e in all_events:
-            self.addEvent(e)
-
-    def remove(self, e):
-        ts = e.getTime()
-        events = EventQueue.events.get(ts)
-        events.remove(e)
-        if len(events) == 0:
-            EventQueue.events.pop(ts)
-
-    def removeFirst(self):
-        if EventQueue.events.keys() == []:
-            return None
-
-        # pop and deal with event based on the timestamp, so we need to
-        # sort at first.
-        keys = EventQueue.events.keys()
-        keys.sort()
-        first_key = keys[0]
-
-        first_value = EventQueue.events[first_key]
-        first_event = first_value.pop(0)
-        if len(first_value) == 0:
-            EventQueue.events.pop(first_key)
-
-        return first_event
-
-    def getAllEvents(self):
-        res = []
-        for e in EventQueue.events.values():
-            res.append(e)
-        return res
-
-    def convertToArray(self):
-        event_list = []
-        # check if we can operate OrderedDict like this?
-        # Yes, we can. This is normal operation for Dict.
-        iterator = EventQueue.events.itervalues()
-        for l in iterator:
-            for e in l:
-                event_list.append(e)
-
-        return event_list
-
-    # override?
-    def clone(self):
-        ret = EventQueue()
-        keys = EventQueue.events.keys()
-        keys.sort()
-        # this place will be self.events or EventQueue.events?
-        for ts in keys:
-            list1 = EventQueue.events.get(ts)
-            list2 = []
-            for e in list1:
-                list2.append(e)
-            ret.events.setdefault(ts, list2)
-
-        return ret
-
-    def size(self):
-        size = 0
-        for item in EventQueue.events.values():
-            size += len(item)
-        return size
-
-    def printAll(self, file_name, msg):
-        with open(file_name, 'w+') as out:
-            out.write(msg + "\n")
-            keys = EventQueue.events.keys()
-            keys.sort()
-            for t in keys:
-                res = EventQueue.events[t]
-                for e in res:
-                    if e.ignore is False:
-                        out.write(e.toString())
-
-    def printEvents(self, file_name, msg, event_type=Event.EventType.Failure, sort = True):
-        with open(file_name, 'w') as fp:
-            fp.write(msg + "\n")
-            keys = EventQueue.events.keys()
-            if sort:
-                keys.sort()
-            for t in keys:
-                res = EventQueue.events[t]
-                for e in res:
-                    if (e.ignore is False) and \
-                            e.getType() == event_type:
-                        fp.write(e.toString())
-
+from heapq import heappush, heappop, heapify
+
+from simulator.Event import Event, EventBatch
+from simulator.EventLog import EventLogWriter
+from simulator.unit.SliceSet import SliceSet
+
+
+class EventQueue(object):
+    """
+    Pending events kept in a binary heap of [time, event_id, event] entries.
+    Events with the same timestamp are popped in FIFO order of event_id.
+
+    remove() cancels an event in O(1) by clearing the event slot of its
+    entry; dead entries are skipped when they reach the top of the heap, and
+    the heap is compacted once they exceed 'compact_ratio' of all entries.
+    """
+
+    def __init__(self, compact_ratio=0.5):
+        self.events = []
+        self.compact_ratio = compact_ratio
+        # number of cancelled entries still in the heap
+        self.dead = 0
+
+    def addEvent(self, e):
+        entry = [e.getTime(), e.event_id, e]
+        e.queue_entry = entry
+        heappush(self.events, entry)
+
+    def updateEvent(self, ts, e, slice_index):
+        if isinstance(e.getUnit(), SliceSet):
+            e.getUnit().removeSlice(slice_index)
+        else:
+            raise Exception("lost unit is not SliceSet.")
+
+    def addEventQueue(self, queue):
+        all_events = queue.getAllEvents()
+        for e in all_events:
+            self.addEvent(e)
+
+    def remove(self, e):
+        entry = e.queue_entry
+        if entry is None or entry[2] is not e:
+            raise Exception("Event is not in the queue")
+        entry[2] = None
+        e.queue_entry = None
+        self.dead += 1
+        if self.dead > self.compact_ratio*len(self.events):
+            self.compact()
+
+    # drop all cancelled entries
+    def compact(self):
+        self.events = [entry for entry in self.events if entry[2] is not None]
+        heapify(self.events)
+        self.dead = 0
+
+    def removeFirst(self):
+        while self.events != []:
+            first_key, event_id, first_event = heappop(self.events)
+            if first_event is None:
+                self.dead -= 1
+                continue
+            first_event.queue_entry = None
+            return first_event
+        return None
+
+    # The earliest event and, when accept(event) holds for it, the events at
+    # the same time right after it that accept holds for too. The first event
+    # not taken is put back; it keeps its event_id, and so its place.
+    def removeFirstBatch(self, accept):
+        first_event = self.removeFirst()
+        if first_event is None:
+            return []
+        batch = [first_event]
+        if not accept(first_event):
+            return batch
+
+        e = self.removeFirst()
+        while e is not None and e.getTime() == first_event.getTime() and \
+                accept(e):
+            batch.append(e)
+            e = self.removeFirst()
+        if e is not None:
+            self.addEvent(e)
+        return batch
+
+    def getAllEvents(self):
+        res = self.convertToArray()
+        res.sort(key=lambda e: (e.getTime(), e.event_id))
+        return res
+
+    def convertToArray(self):
+        return [e for ts, event_id, e in self.events if e is not None]
+
+    # Events keep the handle of this queue, so remove() on the clone does
+    # not reach them.
+    def clone(self):
+        ret = EventQueue(self.compact_ratio)
+        ret.events = [list(entry) for entry in self.events
+                      if entry[2] is not None]
+        heapify(ret.events)
+        return ret
+
+    def size(self):
+        return len(self.events) - self.dead
+
+    def printAll(self, file_name, msg):
+        with open(file_name, 'w+') as out:
+            out.write(msg + "\n")
+            for e in self.getAllEvents():
+                if e.ignore is False:
+                    out.write(e.toString())
+
+    # printAll as a binary event log, see EventLog. Ignored events are kept,
+    # with their ignore flag set.
+    def writeLog(self, file_name, msg, unit_table, chunk_size=100000):
+        writer = EventLogWriter(file_name, msg, unit_table)
+        events = self.getAllEvents()
+        for i in xrange(0, len(events), chunk_size):
+            writer.append(EventBatch.fromEvents(events[i:i+chunk_size]))
+        writer.close()
+
+    def printEvents(self, file_name, msg, event_type=Event.EventType.Failure, sort = True):
+        with open(file_name, 'w') as fp:
+            fp.write(msg + "\n")
+            if sort:
+                res = self.getAllEvents()
+            else:
+                res = self.convertToArray()
+            for e in res:
+                if (e.ignore is False) and \
+                        e.getType() == event_type:
+                    fp.write(e.toString())
@@ -0,0 +1,189 @@
+from numpy import arange, array, concatenate, cumsum, empty, float64, \
+    int32, lexsort, ones, power, repeat, searchsorted, zeros
+import numpy.random
+
+from simulator.Event import Event, EventBatch
+from simulator.failure.WeibullGenerator import WeibullGenerator
+from simulator.unit.DiskWithScrubbing import DiskWithScrubbing
+
+
+class LatentErrorPopulation(object):
+    """
+    Latent sector errors of all disks, generated at once. While the failure
+    timelines are generated, disks only add the windows they draw latent
+    errors in (see Disk.generateLatentErrors); generate() then draws the
+    errors of every window with a few NumPy calls and returns them, with the
+    scrub recoveries of DiskWithScrubbing, as one sorted EventBatch. Given
+    result_events, as for streamed timelines, the errors of each window are
+    drawn and added to it as soon as the window is added instead.
+
+    Latent errors drawn one after another from a Weibull generator with
+    gamma == 0 make a Poisson process (see WeibullGenerator), so the count
+    in a window is Poisson with the hazard the window spans, and the errors
+    are spread over it by uniform hazards. Other generators fall back to
+    generateUntil window by window.
+    """
+
+    def __init__(self, array_random=numpy.random, result_events=None):
+        # stream the errors are drawn from, see simulator.Seeds
+        self.array_random = array_random
+        self.result_events = result_events
+        self._clear()
+
+    def _clear(self):
+        self.disks = []
+        # start time of the latent error generator, and the window
+        self.generator_starts = []
+        self.starts = []
+        self.ends = []
+        # correlated failure intervals of the disk when the window was added,
+        # only disks with scrubbing stop their errors at them
+        self.failure_intervals = []
+
+    def addWindow(self, disk, start_time, end_time):
+        self.disks.append(disk)
+        self.generator_starts.append(
+            disk.latent_error_generator.getCurrentTime())
+        self.starts.append(start_time)
+        self.ends.append(end_time)
+        if isinstance(disk, DiskWithScrubbing):
+            self.failure_intervals.append(
+                [interval[:2] for interval in disk.failure_intervals])
+        else:
+            self.failure_intervals.append([])
+        if self.result_events is not None:
+            for e in self.generate().toEvents({disk.getID(): disk}):
+                self.result_events.addEvent(e)
+            self._clear()
+
+    # (window indexes, times) of the latent errors of windows drawn from
+    # the same generator as windows[0], sorted by window and time
+    def _weibullErrors(self, windows, lamda, beta):
+        generator_starts = array([self.generator_starts[w] for w in windows])
+        starts = array([self.starts[w] for w in windows])
+        if (starts < generator_starts).any():
+            raise Exception("Negative current time!")
+        start_hazards = power((starts - generator_starts)/lamda, beta)
+        end_hazards = power((array([self.ends[w] for w in windows]) -
+                             generator_starts)/lamda, beta)
+        spans = (end_hazards - start_hazards).clip(0)
+
+        counts = self.array_random.poisson(spans)
+        owners = repeat(arange(len(windows)), counts)
+        hazards = start_hazards[owners] + \
+            self.array_random.random_sample(len(owners))*spans[owners]
+        times = lamda*power(hazards, 1.0/beta) + generator_starts[owners]
+        order = lexsort((times, owners))
+        return array(windows, dtype=int32)[owners[order]], times[order]
+
+    def _generatorErrors(self, window):
+        generator = self.disks[window].latent_error_generator
+        generator.reset(self.generator_starts[window])
+        times = generator.generateUntil(self.starts[window], self.ends[window])
+        return full_of(window, len(times)), times
+
+    # (window indexes, times) of all latent errors, sorted by window and time
+    def _errors(self):
+        groups = {}
+        parts = []
+        for w, disk in enumerate(self.disks):
+            generator = disk.latent_error_generator
+            if isinstance(generator, WeibullGenerator) and \
+                    generator.gamma == 0:
+                key = (generator.lamda, generator.beta)
+                groups.setdefault(key, []).append(w)
+            else:
+                parts.append(self._generatorErrors(w))
+        for (lamda, beta), windows in groups.iteritems():
+            parts.append(self._weibullErrors(windows, lamda, beta))
+        if parts == []:
+            return empty(0, dtype=int32), empty(0)
+
+        owners = concatenate([part[0] for part in parts])
+        times = concatenate([part[1] for part in parts])
+        order = lexsort((times, owners))
+        return owners[order], times[order]
+
+    # (window, first, last) of the windows with entries in sorted owners
+    def _ranges(self, owners):
+        windows = arange(len(self.disks))
+        firsts = searchsorted(owners, windows, "left")
+        lasts = searchsorted(owners, windows, "right")
+        has_entries = lasts > firsts
+        return zip(windows[has_entries].tolist(),
+                   firsts[has_entries].tolist(), lasts[has_entries].tolist())
+
+    def generate(self):
+        owners, times = self._errors()
+        ends = array(self.ends, dtype=float64)[owners]
+
+        # a window of a disk with scrubbing stops at its first error in a
+        # correlated failure interval
+        in_interval = zeros(len(times), dtype=bool)
+        for w, first, last in self._ranges(owners):
+            for fail_time, recover_time in self.failure_intervals[w]:
+                window_times = times[first:last]
+                in_interval[first:last] |= (fail_time <= window_times) & \
+                    (window_times <= recover_time)
+        keep = ~afterFirst(owners, in_interval, True)
+        owners = owners[keep]
+        times = times[keep]
+        ends = ends[keep]
+
+        # scrubs find the errors on disks with scrubbing, a window stops
+        # after the first error whose scrub is not before its end
+        recovery_times = zeros(len(times))
+        scrubbed = zeros(len(times), dtype=bool)
+        for w, first, last in self._ranges(owners):
+            scrub_generator = getattr(self.disks[w], "scrub_generator", None)
+            if scrub_generator is None:
+                continue
+            recovery_times[first:last] = scrub_generator.nextEvents(
+                times[first:last])
+            scrubbed[first:last] = True
+        late = scrubbed & (recovery_times >= ends)
+        keep = ~afterFirst(owners, late, False)
+        recovered = keep & scrubbed & ~late
+
+        unit_ids = array([disk.getID() for disk in self.disks],
+                         dtype=int32)
+        batch = EventBatch(
+            concatenate((full_of(Event.EventType.LatentDefect,
+                                 count_of(keep)),
+                         full_of(Event.EventType.LatentRecovered,
+                                 count_of(recovered)))),
+            concatenate((unit_ids[owners[keep]], unit_ids[owners[recovered]])),
+            concatenate((times[keep], recovery_times[recovered])),
+            concatenate((recovery_times[keep], zeros(count_of(recovered)))))
+        batch.sort()
+        return batch
+
+
+# For entries grouped by owners: whether an entry comes after the first one
+# of its group with mask set, or is that one when inclusive
+def afterFirst(owners, mask, inclusive):
+    if len(owners) == 0:
+        return zeros(0, dtype=bool)
+    hits = cumsum(mask)
+    # hits before the group of every entry
+    group_start = ones(len(owners), dtype=bool)
+    group_start[1:] = owners[1:] != owners[:-1]
+    starts = arange(len(owners))[group_start]
+    before = (hits - mask)[starts]
+    before = repeat(before, diff_of(starts, len(owners)))
+    if inclusive:
+        return hits - before > 0
+    return hits - mask - before > 0
+
+
+def full_of(value, size):
+    return repeat(array([value], dtype=int32), size)
+
+
+def count_of(mask):
+    return int(mask.sum())
+
+
+# lengths of the groups starting at starts
+def diff_of(starts, size):
+    return concatenate((starts[1:], [size])) - starts
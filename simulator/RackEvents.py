@@ -0,0 +1,116 @@
+import random
+from multiprocessing import Pool
+
+import numpy.random
+
+from simulator.Event import EventBatch
+from simulator.LatentErrors import LatentErrorPopulation
+from simulator.Seeds import Seeds
+from simulator.unit.Disk import Disk
+from simulator.unit.Rack import Rack
+
+# racks the pool workers generate events for, inherited when they fork
+_racks = []
+
+
+class EventList(object):
+    """
+    Stand-in for an event queue which only keeps the events added to it.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def addEvent(self, e):
+        self.events.append(e)
+
+
+# Racks under root, in unit order
+def racksOf(root):
+    racks = []
+    for unit_id, unit in sorted(root.unitTable().iteritems()):
+        if isinstance(unit, Rack):
+            racks.append(unit)
+    if not independentRacks(racks):
+        raise Exception("Units above racks fail, events can not be "
+                        "generated rack by rack")
+    return racks
+
+
+# Events can only be generated rack by rack when no unit above the racks
+# fails on its own.
+def independentRacks(racks):
+    for rack in racks:
+        parent = rack.getParent()
+        while parent is not None:
+            if parent.failure_generator is not None:
+                return False
+            parent = parent.getParent()
+    return True
+
+
+# Whether the events of root can be generated rack by rack
+def byRacks(root):
+    return independentRacks([unit for unit in root.unitTable().itervalues()
+                             if isinstance(unit, Rack)])
+
+
+# Events of one rack from start_time to end_time as a sorted EventBatch. The
+# units of the rack draw from their own streams (see Seeds.seedUnits), its
+# latent errors from latent_random. Draws left on the global random and
+# numpy.random come from global_seed, the global states of the process are
+# restored afterwards.
+def rackEvents(rack, latent_random, global_seed, start_time, end_time):
+    state = random.getstate()
+    array_state = numpy.random.get_state()
+    random.seed(global_seed)
+    numpy.random.seed(global_seed)
+    try:
+        latent_errors = LatentErrorPopulation(latent_random)
+        for unit in rack.unitTable().itervalues():
+            if isinstance(unit, Disk):
+                unit.latent_errors = latent_errors
+        events = EventList()
+        rack.generateEvents(events, start_time, end_time, True)
+        batch = EventBatch.concatenate([EventBatch.fromEvents(events.events),
+                                        latent_errors.generate()])
+    finally:
+        random.setstate(state)
+        numpy.random.set_state(array_state)
+    batch.sort()
+    return batch
+
+
+def _rackEvents(args):
+    rack_index = args[0]
+    return rackEvents(_racks[rack_index], *args[1:])
+
+
+# Events of all racks under root, one sorted EventBatch per rack. Every rack
+# draws from its own random streams, derived from seeds, so the events do not
+# depend on workers: with workers > 1 racks are shared out to a pool of that
+# many processes, otherwise they are generated in this one. Unseeded runs
+# take a master seed from the random state of the process.
+def generateRackEvents(root, start_time, end_time, workers=1, seeds=None):
+    global _racks
+    if seeds is None or not seeds.seeded():
+        seeds = Seeds(int(numpy.random.randint(0, 2**31 - 1)))
+        seeds.seedUnits(root)
+    racks = racksOf(root)
+    rack_args = [(seeds.arrayStream("latent errors", rack.getID()),
+                  seeds.seed("globals", rack.getID()), start_time, end_time)
+                 for rack in racks]
+    if workers <= 1:
+        return [rackEvents(rack, *args)
+                for rack, args in zip(racks, rack_args)]
+
+    _racks = racks
+    pool = Pool(workers)
+    try:
+        batches = pool.map(_rackEvents,
+                           [(i,) + args for i, args in enumerate(rack_args)])
+    finally:
+        pool.close()
+        pool.join()
+        _racks = []
+    return batches
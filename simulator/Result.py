@@ -1,30 +1,32 @@
 
 
 class Result(object):
-    undurable_count = 0
-    unavailable_count = 0
-    # undurable caused by LSE, disk, node, disk count cause lost, node count cause lost
-    undurable_count_details = None
-    unavailable_slice_durations = {}
-    NOMDL = 0
-    PDL = 0.0
-    # unavailability = MTTR/(MTTF + MTTR)
-    PUA = 0.0
-    # unavailability = downtime/(uptime+downtime)
-    PUA1 = 0.0
-    # total repair cost, in PiBs
-    TRC = 0.0
-    # total storage cost, in PiB*year
-    TSC = 0.0
-    queue_times = 0
-    avg_queue_time = 0.0
+
+    def __init__(self):
+        self.undurable_count = 0
+        self.unavailable_count = 0
+        # undurable caused by LSE, disk, node, disk count cause lost, node count cause lost
+        self.undurable_count_details = None
+        self.unavailable_slice_durations = {}
+        self.NOMDL = 0
+        self.PDL = 0.0
+        # unavailability = MTTR/(MTTF + MTTR)
+        self.PUA = 0.0
+        # unavailability = downtime/(uptime+downtime)
+        self.PUA1 = 0.0
+        # total repair cost, in PiBs
+        self.TRC = 0.0
+        # total storage cost, in PiB*year
+        self.TSC = 0.0
+        self.queue_times = 0
+        self.avg_queue_time = 0.0
 
     def toString(self):
-        return "unavailable=" + str(Result.unavailable_count) + \
-            "  undurable=" + str(Result.undurable_count) + \
-            " PUA=" + str(Result.PUA) + \
-            " PDL=" + str(Result.PDL) + \
-            " TRC=" + str(Result.TRC) + "PiBs" + \
-            " TSC=" + str(Result.TSC) + "PiB*year" + \
-            " NOMDL=" + str(Result.NOMDL) + " queue times=" + str(Result.queue_times) + \
-            " average queue time=" + str(Result.avg_queue_time) + "h"
+        return "unavailable=" + str(self.unavailable_count) + \
+            "  undurable=" + str(self.undurable_count) + \
+            " PUA=" + str(self.PUA) + \
+            " PDL=" + str(self.PDL) + \
+            " TRC=" + str(self.TRC) + "PiBs" + \
+            " TSC=" + str(self.TSC) + "PiB*year" + \
+            " NOMDL=" + str(self.NOMDL) + " queue times=" + str(self.queue_times) + \
+            " average queue time=" + str(self.avg_queue_time) + "h"
@@ -0,0 +1,56 @@
+import random
+from hashlib import sha256
+from struct import unpack
+
+import numpy.random
+from numpy.random import RandomState
+
+
+class Seeds(object):
+    """
+    Independent random streams derived from one master seed. A stream is
+    named, e.g. ("unit", 17, "failureGenerator"), and seeded with a hash of
+    the master seed, the replica and its name, so a stream does not depend
+    on which other streams were made before it, nor in which order.
+
+    Without a master seed every stream is the global random module (or
+    numpy.random), as if no seeding took place.
+    """
+
+    def __init__(self, master_seed=None, replica=0):
+        self.master_seed = master_seed
+        self.replica = replica
+
+    def seeded(self):
+        return self.master_seed is not None
+
+    # 32-bit seed of the stream called name
+    def seed(self, *name):
+        digest = sha256(repr((self.master_seed, self.replica) + name)).digest()
+        return unpack("<I", digest[:4])[0]
+
+    # random.Random of the stream called name
+    def stream(self, *name):
+        if not self.seeded():
+            return random
+        return random.Random(self.seed(*name))
+
+    # numpy RandomState of the stream called name
+    def arrayStream(self, *name):
+        if not self.seeded():
+            return numpy.random
+        return RandomState(self.seed(*name))
+
+    # gives every unit under root, and each of its event generators, a
+    # stream of its own, named by the unit id
+    def seedUnits(self, root):
+        if not self.seeded():
+            return
+        for unit_id, unit in root.unitTable().iteritems():
+            unit.setRandom(self.stream("unit", unit_id))
+            for generator in unit.getEventGenerators():
+                if generator is None:
+                    continue
+                name = ("generator", unit_id, generator.getName())
+                generator.setRandom(self.stream(*name),
+                                    self.arrayStream(*name))
@@ -10,6 +10,12 @@ from simulator.Event import Event
 from simulator.Result import Result
 from simulator.utils import splitMethod
 from simulator.EventQueue import EventQueue
+from simulator.CalendarQueue import CalendarQueue
+from simulator.StreamingEventQueue import StreamingEventQueue
+from simulator.EventLog import EventLogReader
+from simulator.LatentErrors import LatentErrorPopulation
+from simulator.RackEvents import generateRackEvents, byRacks
+from simulator.Seeds import Seeds
 from simulator.Log import info_logger, error_logger
 from simulator.Configuration import Configuration
 from simulator.XMLParser import XMLParser
@@ -47,6 +53,15 @@ def returnDistributer(data_placement, hier):
         raise Exception("Incorrect data placement")
 
 
+def returnScheduler(scheduler):
+    if scheduler == "heap":
+        return EventQueue
+    elif scheduler == "calendar":
+        return CalendarQueue
+    else:
+        raise Exception("Incorrect scheduler")
+
+
 class Simulation(object):
 
     def __init__(self, conf_path):
@@ -67,9 +82,13 @@ class Simulation(object):
             for item in contents:
                 writer.writerow(item)
 
-    def run(self):
-        conf = Configuration(self.conf_path)
-        xml = XMLParser(conf)
+    # xml: an already parsed XMLParser, which can be shared by replicas.
+    def run(self, xml=None):
+        if xml is None:
+            conf = Configuration(self.conf_path)
+            xml = XMLParser(conf)
+        else:
+            conf = xml.config()
         distributer_class = returnDistributer(conf.data_placement, conf.hierarchical)
         self.distributer = distributer_class(xml)
         self.conf = self.distributer.returnConf()
@@ -78,6 +97,10 @@ class Simulation(object):
             self.event_handler = RAFIEventHandler
         else:
             self.event_handler = EventHandler
+        # every iteration draws from streams of its own
+        seeds = Seeds(self.conf.seed, self.iteration_times)
+        seeds.seedUnits(self.distributer.getRoot())
+        self.distributer.setRandom(seeds.stream("placement"))
         self.distributer.start()
         # self.distributer.printGroupsToFile()
 
@@ -85,25 +108,78 @@ class Simulation(object):
         self.distributer.getRoot().printAll()
 
         events_handled = 0
-        events = EventQueue()
+        events = returnScheduler(self.conf.scheduler)(
+            self.conf.compaction_threshold)
 
         root = self.distributer.getRoot()
-        root.generateEvents(events, 0, self.conf.total_time, True)
-
-        # if False:
-        if self.conf.event_file != None:
+        streamed = self.conf.streaming_events or \
+            self.conf.replay_file is not None
+        if self.conf.replay_file is not None:
+            # failure timeline recorded by an earlier run, nothing generated
+            reader = EventLogReader(self.conf.replay_file)
+            events = StreamingEventQueue(events)
+            events.addSource(reader.replay(events, reader.resolveUnits(root)))
+        elif self.conf.streaming_events:
+            events = StreamingEventQueue(events)
+            # latent errors come from the same sampler and stream as in the
+            # other modes, drawn window by window as the timeline goes
+            latent_errors = LatentErrorPopulation(
+                seeds.arrayStream("latent errors"), events)
+            for unit in root.unitTable().itervalues():
+                if isinstance(unit, Disk):
+                    unit.latent_errors = latent_errors
+            events.addSource(root.eventCycles(events, 0, self.conf.total_time,
+                                              True, True))
+        else:
+            # latent errors of all disks are drawn at once after the failure
+            # timelines; batches are only turned into Events as the queue
+            # reaches them, unless the whole timeline is printed
+            unit_table = root.unitTable()
+            # seeded runs draw rack by rack whenever they can, so the events
+            # are the same for any generation_workers
+            if self.conf.generation_workers > 0 or \
+                    (seeds.seeded() and byRacks(root)):
+                batches = generateRackEvents(
+                    root, 0, self.conf.total_time,
+                    max(self.conf.generation_workers, 1), seeds)
+            else:
+                latent_errors = LatentErrorPopulation(
+                    seeds.arrayStream("latent errors"))
+                for unit in unit_table.itervalues():
+                    if isinstance(unit, Disk):
+                        unit.latent_errors = latent_errors
+                root.generateEvents(events, 0, self.conf.total_time, True)
+                batches = [latent_errors.generate()]
+
+            if self.conf.event_file != None:
+                for batch in batches:
+                    for e in batch.toEvents(unit_table):
+                        events.addEvent(e)
+            else:
+                # merged by the time of their next events
+                events = StreamingEventQueue(events)
+                for batch in batches:
+                    events.addSource(batch.source(events, unit_table))
+
+        # there is no whole timeline to print when events are streamed
+        if self.conf.event_file != None and not streamed:
             events_file = self.conf.event_file + '-' + self.ts
-            events.printAll(events_file, "Iteration number: "+str(self.iteration_times))
+            msg = "Iteration number: " + str(self.iteration_times)
+            if self.conf.event_file_format == "binary":
+                events.writeLog(events_file, msg, root.unitTable())
+            else:
+                events.printAll(events_file, msg)
         self.iteration_times += 1
 
         handler = self.event_handler(self.distributer)
+        handler.setRandom(seeds.stream("handler"))
 
         print "total slices:", handler.total_slices
-        e = events.removeFirst()
-        while e is not None:
-            handler.handleEvent(e, events)
-            e = events.removeFirst()
-            events_handled += 1
+        batch = events.removeFirstBatch(handler.batchable)
+        while batch != []:
+            handler.handleEvents(batch, events)
+            events_handled += len(batch)
+            batch = events.removeFirstBatch(handler.batchable)
 
         self.total_events_handled += events_handled
 
@@ -111,11 +187,24 @@ class Simulation(object):
         info_logger.info(result.toString())
         return result
 
+    # Run num_replicas independent replicas in this process. Configuration
+    # and layer file are parsed only once; each replica still builds its own
+    # units, data placement, event queue, event handler and Result.
+    def runMany(self, num_replicas):
+        conf = Configuration(self.conf_path)
+        xml = XMLParser(conf)
+
+        results = []
+        for i in xrange(num_replicas):
+            results.append(self.run(xml))
+        conf.DRSHandler().saveTable()
+        return results
+
     def main(self, num_iterations):
         contents = []
 
-        for i in xrange(num_iterations):
-            result = self.run()
+        results = self.runMany(num_iterations)
+        for result in results:
             outputs = [result.PDL, result.PUA, result.TRC, result.TSC]
             if not self.conf.queue_disable:
                 outputs.append(result.queue_times)
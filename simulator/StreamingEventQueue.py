@@ -0,0 +1,71 @@
+from heapq import heappush, heappop, heapreplace
+
+
+class StreamingEventQueue(object):
+    """
+    Event queue fed on demand by event sources.
+
+    A source is an iterator which adds its events to the queue a few at a
+    time and yields, after each step, a lower bound on the time of every
+    event it has still to add (Unit.eventCycles is one). removeFirst only
+    steps the sources whose bound is not later than the earliest queued
+    event, so the wrapped queue holds a handful of pending events per unit
+    instead of the whole timeline.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+        # heap of [bound, source order, source]
+        self.sources = []
+        self.source_count = 0
+
+    def addSource(self, source, start_time=0):
+        heappush(self.sources, [start_time, self.source_count, source])
+        self.source_count += 1
+
+    def _step(self):
+        order, source = self.sources[0][1:]
+        try:
+            heapreplace(self.sources, [next(source), order, source])
+        except StopIteration:
+            heappop(self.sources)
+
+    def addEvent(self, e):
+        self.queue.addEvent(e)
+
+    def remove(self, e):
+        self.queue.remove(e)
+
+    def removeFirst(self):
+        e = self.queue.removeFirst()
+        while self.sources != []:
+            if e is None:
+                self._step()
+            elif self.sources[0][0] <= e.getTime():
+                # a source may still add events before e, put it back
+                self.queue.addEvent(e)
+                while self.sources != [] and \
+                        self.sources[0][0] <= e.getTime():
+                    self._step()
+            else:
+                break
+            e = self.queue.removeFirst()
+        return e
+
+    def removeFirstBatch(self, accept):
+        e = self.removeFirst()
+        if e is None:
+            return []
+        # every source is past e now, so all events at its time are queued
+        self.queue.addEvent(e)
+        return self.queue.removeFirstBatch(accept)
+
+    # Only the events generated so far.
+    def getAllEvents(self):
+        return self.queue.getAllEvents()
+
+    def convertToArray(self):
+        return self.queue.convertToArray()
+
+    def size(self):
+        return self.queue.size()
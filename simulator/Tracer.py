@@ -0,0 +1,102 @@
+import json
+from time import strftime
+
+from simulator.Event import Event
+from simulator.unit.SliceSet import SliceSet
+
+
+class Tracer(object):
+    """
+    Trace of the events a handler processes, written as JSON lines to a
+    buffered file instead of stdout.
+
+    level "off" writes nothing, "summary" writes one record with the number
+    of events of each type when the trace is closed, and "event" also writes
+    one record per traced event. Events can be sampled: 'every' traces only
+    every every-th event, and 'slices' only the events whose unit holds a
+    chunk of one of these slices.
+    """
+    levels = ["off", "summary", "event"]
+    buffer_size = 1 << 20
+
+    def __init__(self, level="off", file_path=None, every=1, slices=None):
+        if level not in Tracer.levels:
+            raise Exception("Incorrect trace level")
+        self.level = Tracer.levels.index(level)
+        self.every = every
+        self.slices = slices
+        # ids of the units holding a chunk of a traced slice
+        self.unit_ids = None
+
+        self.events_seen = 0
+        self.type_counts = [0] * len(Event.EventType.names)
+        # other statistics for the summary record, see setSummary
+        self.summary = {}
+
+        self.out = None
+        if self.level > 0:
+            if file_path is None:
+                raise Exception("Trace file is not given")
+            self.out = open(file_path + '-' + strftime("%Y%m%d.%H.%M.%S"),
+                            'w', Tracer.buffer_size)
+
+    def isOn(self):
+        return self.level > 0
+
+    # slice_locations: the disks of every slice, as the distributer returns
+    def setSliceLocations(self, slice_locations):
+        if self.slices is None:
+            return
+        self.unit_ids = set()
+        for slice_index in self.slices:
+            for disk in slice_locations[slice_index]:
+                u = disk
+                while u is not None:
+                    self.unit_ids.add(u.getID())
+                    u = u.getParent()
+
+    def _touchesSlices(self, e):
+        u = e.getUnit()
+        if isinstance(u, SliceSet):
+            for slice_index in u.slices:
+                if slice_index in self.slices:
+                    return True
+            return False
+        return u.getID() in self.unit_ids
+
+    def event(self, e):
+        if self.level == 0:
+            return
+        self.events_seen += 1
+        self.type_counts[e.getType()] += 1
+        if self.level < 2:
+            return
+        if self.events_seen % self.every != 0:
+            return
+        if self.slices is not None and not self._touchesSlices(e):
+            return
+
+        record = {"id": e.event_id,
+                  "time": e.getTime(),
+                  "type": Event.EventType.names[e.getType()],
+                  "unit": e.getUnit().toString(),
+                  "next_recovery_time": e.next_recovery_time,
+                  "info": e.info}
+        self.out.write(json.dumps(record) + "\n")
+
+    # adds a statistic of the run to the summary record
+    def setSummary(self, key, value):
+        self.summary[key] = value
+
+    def close(self):
+        if self.out is None:
+            return
+        counts = {}
+        for code, count in enumerate(self.type_counts):
+            if count != 0:
+                counts[Event.EventType.names[code]] = count
+        summary = {"events": self.events_seen, "types": counts}
+        summary.update(self.summary)
+        self.out.write(json.dumps({"summary": summary}) + "\n")
+        self.out.close()
+        self.out = None
@@ -0,0 +1,116 @@
+from numpy import arange, argsort, asarray, atleast_1d, concatenate, diff, \
+    empty, flatnonzero, float64, full, int32, isnan, maximum, nan
+
+
+class UnavailableDurations(object):
+    """
+    Durations in which slices are unavailable, stored column by column:
+    slice, start time and end time of each duration, in the order they
+    started. The end of an open duration is NaN; the open duration of every
+    slice is found through an index array, -1 meaning none.
+    """
+
+    def __init__(self, total_slices, capacity=1024):
+        self.slices = empty(capacity, dtype=int32)
+        self.starts = empty(capacity, dtype=float64)
+        self.ends = empty(capacity, dtype=float64)
+        self.size = 0
+        self.open_index = full(total_slices, -1, dtype=int32)
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, count):
+        capacity = len(self.starts)
+        if self.size + count <= capacity:
+            return
+        while capacity < self.size + count:
+            capacity *= 2
+        for name in ("slices", "starts", "ends"):
+            column = getattr(self, name)
+            grown = empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    # open a duration of every slice in slices at time
+    def start(self, slices, time):
+        slices = array_of(slices)
+        count = len(slices)
+        self._reserve(count)
+        begin = self.size
+        self.slices[begin:begin+count] = slices
+        self.starts[begin:begin+count] = time
+        self.ends[begin:begin+count] = nan
+        self.open_index[slices] = arange(begin, begin+count, dtype=int32)
+        self.size += count
+
+    # close the open durations of slices at time, slices without one are
+    # left as they are
+    def end(self, slices, time):
+        slices = array_of(slices)
+        index = self.open_index[slices]
+        opened = index >= 0
+        self.ends[index[opened]] = time
+        self.open_index[slices[opened]] = -1
+
+    def isOpen(self, slice_index):
+        return self.open_index[slice_index] >= 0
+
+    # (slices, starts, ends) of all durations, open ones end at end_time
+    def columns(self, end_time):
+        ends = self.ends[:self.size].copy()
+        ends[isnan(ends)] = end_time
+        return self.slices[:self.size], self.starts[:self.size], ends
+
+    # {slice: [[start, end] or [start], ...]}, the former dict-of-lists form
+    def toDict(self):
+        durations = {}
+        for slice_index, start, end in zip(self.slices[:self.size].tolist(),
+                                           self.starts[:self.size].tolist(),
+                                           self.ends[:self.size].tolist()):
+            duration = [start] if end != end else [start, end]
+            durations.setdefault(slice_index, []).append(duration)
+        return durations
+
+    # (TTFs, TTRs) arrays. With system_perspective, overlapping durations
+    # make one system outage (see outages); otherwise every duration counts,
+    # TTFs being the times between their starts.
+    def failuresAndRepairs(self, end_time, system_perspective=True):
+        slices, starts, ends = self.columns(end_time)
+        if system_perspective:
+            return outages(starts, ends)
+        if self.size == 0:
+            return empty(0), empty(0)
+        order = argsort(starts, kind="mergesort")
+        FTs = starts[order]
+        TTRs = ends[order] - FTs
+        TTFs = concatenate((FTs[:1], diff(FTs)))
+        return TTFs, TTRs
+
+
+# Union of the durations [starts[i], ends[i]]: durations which overlap or
+# touch are merged into one system outage. Returns the (TTFs, TTRs) arrays of
+# the outages in time order, a TTF being the up time before the outage
+# (counted from 0 for the first one) and a TTR its length. O(n log n).
+def outages(starts, ends):
+    if len(starts) == 0:
+        return empty(0), empty(0)
+    order = argsort(starts, kind="mergesort")
+    starts = starts[order]
+    # latest end of all durations up to each one
+    reach = maximum.accumulate(ends[order])
+
+    # an outage begins at a duration starting after all earlier ones ended
+    first = flatnonzero(concatenate(([True], starts[1:] > reach[:-1])))
+    last = concatenate((first[1:], [len(starts)])) - 1
+    outage_starts = starts[first]
+    outage_ends = reach[last]
+
+    TTRs = outage_ends - outage_starts
+    TTFs = outage_starts - concatenate(([0.0], outage_ends[:-1]))
+    return TTFs, TTRs
+
+
+# slices as an int32 array, a single slice index is taken as one element
+def array_of(slices):
+    return atleast_1d(asarray(slices, dtype=int32))
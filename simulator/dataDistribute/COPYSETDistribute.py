@@ -1,6 +1,5 @@
 from math import ceil, floor
 from time import strftime
-from random import randint, choice, sample
 
 from simulator.Configuration import Configuration
 from simulator.XMLParser import XMLParser
@@ -26,7 +25,7 @@ class COPYSETDistribute(DataDistribute):
         usable_machine_indexes = [i for i in xrange(len(copy_set))]
         for i in full_machine_indexes:
             usable_machine_indexes.remove(i)
-        chosen_index = sample(usable_machine_indexes, self.n)
+        chosen_index = self.random.sample(usable_machine_indexes, self.n)
         return chosen_index
 
     def divideMachinesIntoSets(self, machines):
@@ -37,10 +36,10 @@ class COPYSETDistribute(DataDistribute):
 
         while len(rack_indexes) >= self.s:
             copy_set = []
-            chosen_rack_indexes = sample(rack_indexes, self.s)
+            chosen_rack_indexes = self.random.sample(rack_indexes, self.s)
             for rack_index in chosen_rack_indexes:
                 rack = machines[rack_index]
-                machine_index = choice(machine_indexes[rack_index])
+                machine_index = self.random.choice(machine_indexes[rack_index])
                 copy_set.append(rack[machine_index])
                 machine_indexes[rack_index].remove(machine_index)
                 if machine_indexes[rack_index] == []:
@@ -76,7 +75,7 @@ class COPYSETDistribute(DataDistribute):
             locations = []
             retry_count = 0
             while retry_count <= 100:
-                copy_set_index = choice(copysets_index)
+                copy_set_index = self.random.choice(copysets_index)
                 copy_set = copy_sets[copy_set_index]
                 machine_indexes = self._getMachinesFromCopyset(copy_set, full_machine_indexes[copy_set_index])
                 if machine_indexes is None:
@@ -93,11 +92,11 @@ class COPYSETDistribute(DataDistribute):
                 for i in full_disk_indexes[copy_set_index][machine_index]:
                     disk_indexes.remove(i)
                 try:
-                    disk_index = choice(disk_indexes)
+                    disk_index = self.random.choice(disk_indexes)
                 except IndexError:
                     raise Exception("full machine is " + machine.toString())
                 disk = machine.getChildren()[disk_index]
-                disk.addChild(i)
+                disk.addChild(i, len(locations))
                 locations.append(disk)
 
                 if len(disk.getChildren()) >= self.conf.max_chunks_per_disk:
@@ -171,11 +170,11 @@ class HierCOPYSETDistribute(COPYSETDistribute):
         chosen_index = []
         for i, rack in enumerate(machine_indexes):
             try:
-                chosen_index += sample(machine_indexes[i], chunks_on_racks[i])
+                chosen_index += self.random.sample(machine_indexes[i], chunks_on_racks[i])
             except ValueError:
                 break
         if len(chosen_index) < self.n:
-            chosen_index = sample(usable_machine_indexes, self.n)
+            chosen_index = self.random.sample(usable_machine_indexes, self.n)
         return chosen_index
 
     def divideMachinesIntoSets(self, machines):
@@ -188,7 +187,7 @@ class HierCOPYSETDistribute(COPYSETDistribute):
             copy_set = []
             try:
                 retry_count += 1
-                chosen_rack_indexes = sample(rack_indexes, self.r)
+                chosen_rack_indexes = self.random.sample(rack_indexes, self.r)
             except ValueError:
                 continue
 
@@ -202,7 +201,7 @@ class HierCOPYSETDistribute(COPYSETDistribute):
             for i, rack_index in enumerate(chosen_rack_indexes):
                 rack = machines[rack_index]
 
-                m_indexes = sample(machine_indexes[rack_index], self.slices_chunks_on_racks[i])
+                m_indexes = self.random.sample(machine_indexes[rack_index], self.slices_chunks_on_racks[i])
                 for m_index in m_indexes:
                     copy_set.append(rack[m_index])
                     machine_indexes[rack_index].remove(m_index)
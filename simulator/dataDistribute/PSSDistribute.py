@@ -1,4 +1,3 @@
-from random import randint, choice, sample
 from time import strftime, time
 
 from simulator.Configuration import Configuration
@@ -24,9 +23,9 @@ class PSSDistribute(DataDistribute):
             #     break
 
             # why execution blocked here sometimes?
-            chosen_racks = sample(disks, self.n)
+            chosen_racks = self.random.sample(disks, self.n)
             for rack_disks in chosen_racks:
-                disk_index_in_rack = randint(0, len(rack_disks)-1)
+                disk_index_in_rack = self.random.randint(0, len(rack_disks)-1)
                 group.append(rack_disks.pop(disk_index_in_rack))
                 if len(rack_disks) == 0:
                     disks.remove(rack_disks)
@@ -44,15 +43,15 @@ class PSSDistribute(DataDistribute):
 
         full_disk_count = 0
         for i in xrange(self.total_slices - increase_slices, self.total_slices):
-            group = choice(groups)
+            group = self.random.choice(groups)
             self.slice_locations.append(group)
-            for disk in group:
+            for position, disk in enumerate(group):
                 if len(disk.getChildren()) > self.conf.max_chunks_per_disk:
                     full_disk_count += self.n
                     groups.remove(group)
                     error_logger.error("A Partition is completely full, full disk count is " + str(full_disk_count))
                     break
-                disk.addChild(i)
+                disk.addChild(i, position)
 
             self._my_assert(len(self.slice_locations[i]) == self.n)
 
@@ -99,7 +98,7 @@ class HierPSSDistribute(PSSDistribute):
             copy_set = []
             try:
                 retry_count += 1
-                chosen_rack_indexes = sample(rack_indexes, self.r)
+                chosen_rack_indexes = self.random.sample(rack_indexes, self.r)
             except ValueError:
                 continue
 
@@ -113,7 +112,7 @@ class HierPSSDistribute(PSSDistribute):
             for i, rack_index in enumerate(chosen_rack_indexes):
                 rack = machines[rack_index]
 
-                m_indexes = sample(machine_indexes[rack_index], self.slices_chunks_on_racks[i])
+                m_indexes = self.random.sample(machine_indexes[rack_index], self.slices_chunks_on_racks[i])
                 for m_index in m_indexes:
                     copy_set.append(rack[m_index])
                     machine_indexes[rack_index].remove(m_index)
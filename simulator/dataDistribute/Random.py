@@ -1,4 +1,3 @@
-from random import randint, sample, choice
 
 from simulator.Configuration import Configuration
 from simulator.XMLParser import XMLParser
@@ -11,11 +10,10 @@ class RandomDistribute(DataDistribute):
     # both old and new disk are disk instance, slice_index means the slice
     # which the blocks belongs to.
     def _blockMoving(self, old_disk, new_disk, slice_index):
+        position = old_disk.getChunkPosition(slice_index)
         old_disk.removeChild(slice_index)
-        new_disk.addChild(slice_index)
-        for i, disk in enumerate(self.slice_locations[slice_index]):
-            if disk == old_disk:
-                self.slice_locations[slice_index][i] = new_disk
+        new_disk.addChild(slice_index, position)
+        self.slice_locations[slice_index][position] = new_disk
 
     def _additionSpaceInBlocks(self, style, additions):
         chunks_per_disk = self.returnChunksPerDisk()
@@ -66,10 +64,10 @@ class RandomDistribute(DataDistribute):
             # choose disk from the right rack
             if len(available_racks) == 0:
                 raise Exception("No racks left")
-            prev_racks_index = randint(0, len(available_racks)-1)
+            prev_racks_index = self.random.randint(0, len(available_racks)-1)
             rack_disks = available_racks[prev_racks_index]
 
-            disk_index_in_rack = randint(0, len(rack_disks)-1)
+            disk_index_in_rack = self.random.randint(0, len(rack_disks)-1)
             disk = rack_disks[disk_index_in_rack]
             if disk.getMetadata().slice_count >= self.conf.chunks_per_disk:
                 full_disk_count += 1
@@ -95,7 +93,7 @@ class RandomDistribute(DataDistribute):
             # LZR
             self.slice_locations[slice_index].append(disk)
             # add slice indexs to children list of disks
-            disk.addChild(slice_index)
+            disk.addChild(slice_index, len(self.slice_locations[slice_index]) - 1)
             m.slices[m.slice_count] = slice_index
             m.slice_count += 1
             break
@@ -117,9 +115,9 @@ class RandomDistribute(DataDistribute):
                 for disk in pre_disks_in_machine:
                     blocks = disk.getChildren()
                     moving_amount_per_disk = int(round(len(blocks) * additions / disks_per_machine))
-                    moving_blocks_per_disk = sample(blocks, moving_amount_per_disk)
+                    moving_blocks_per_disk = self.random.sample(blocks, moving_amount_per_disk)
                     for slice_index in moving_blocks_per_disk:
-                        new_disk_for_block = choice(new_disks_in_machine)
+                        new_disk_for_block = self.random.choice(new_disks_in_machine)
                         self._blockMoving(disk, new_disk_for_block, slice_index)
                         bandwidth_cost += 1
         elif style == 2:
@@ -139,9 +137,9 @@ class RandomDistribute(DataDistribute):
                     for disk in disks:
                         blocks = disk.getChildren()
                         moving_amount_per_disk = int(round(len(blocks) * additions / machines_per_rack))
-                        moving_blocks_per_disk = sample(blocks, moving_amount_per_disk)
+                        moving_blocks_per_disk = self.random.sample(blocks, moving_amount_per_disk)
                         for slice_index in moving_blocks_per_disk:
-                            new_disk_for_block = choice(new_disks)
+                            new_disk_for_block = self.random.choice(new_disks)
                             self._blockMoving(disk, new_disk_for_block, slice_index)
                             bandwidth_cost += 1
         else:  # style == 3
@@ -165,9 +163,9 @@ class RandomDistribute(DataDistribute):
                     for disk in disks:
                         blocks = disk.getChildren()
                         moving_amount_per_disk = int(round(len(blocks)* additions / rack_count))
-                        moving_blocks_per_disk = sample(blocks, moving_amount_per_disk)
+                        moving_blocks_per_disk = self.random.sample(blocks, moving_amount_per_disk)
                         for slice_index in moving_blocks_per_disk:
-                            new_disk_for_block = choice(new_disks)
+                            new_disk_for_block = self.random.choice(new_disks)
                             self._blockMoving(disk, new_disk_for_block, slice_index)
                             bandwidth_cost += 1
 
@@ -1,5 +1,4 @@
 from math import floor
-from random import randint, sample, choice
 
 from simulator.Configuration import Configuration
 from simulator.XMLParser import XMLParser
@@ -42,10 +41,10 @@ class SSSDistribute(DataDistribute):
             # choose disk from the right rack
             if len(available_racks) == 0:
                 raise Exception("No racks left")
-            prev_racks_index = randint(0, len(available_racks)-1)
+            prev_racks_index = self.random.randint(0, len(available_racks)-1)
             rack_disks = available_racks[prev_racks_index]
 
-            disk_index_in_rack = randint(0, len(rack_disks)-1)
+            disk_index_in_rack = self.random.randint(0, len(rack_disks)-1)
             disk = rack_disks[disk_index_in_rack]
             slice_count = len(disk.getChildren())
             if slice_count >= self.conf.max_chunks_per_disk:
@@ -69,7 +68,7 @@ class SSSDistribute(DataDistribute):
             self.slice_locations[slice_index].append(disk)
 
             # add slice indexs to children list of disks
-            disk.addChild(slice_index)
+            disk.addChild(slice_index, len(self.slice_locations[slice_index]) - 1)
             break
 
 
@@ -111,7 +110,7 @@ class HierSSSDistribute(SSSDistribute):
             rack_machine_indexes = []
             while retry_count <= 100:
                 flag = False
-                chosen_rack_indexes = sample(rack_indexes, self.r)
+                chosen_rack_indexes = self.random.sample(rack_indexes, self.r)
                 for i, item in enumerate(chosen_rack_indexes):
                     if len(machine_indexes[item]) < self.slices_chunks_on_racks[i]:
                         flag = True
@@ -119,15 +118,15 @@ class HierSSSDistribute(SSSDistribute):
                     retry_count += 1
                     continue
                 for i, rack_index in enumerate(chosen_rack_indexes):
-                    chosen_machine_indexes = sample(machine_indexes[rack_index], self.slices_chunks_on_racks[i])
+                    chosen_machine_indexes = self.random.sample(machine_indexes[rack_index], self.slices_chunks_on_racks[i])
                     for m_index in chosen_machine_indexes:
                         rack_machine_indexes.append((rack_index, m_index))
                 break
 
             for rack_index, m_index in rack_machine_indexes:
-                disk_index = choice(disk_indexes[rack_index][m_index])
+                disk_index = self.random.choice(disk_indexes[rack_index][m_index])
                 disk = machines[rack_index][m_index].getChildren()[disk_index]
-                disk.addChild(slice_index)
+                disk.addChild(slice_index, len(location))
                 location.append(disk)
 
                 if len(disk.getChildren()) >= self.conf.max_chunks_per_disk:
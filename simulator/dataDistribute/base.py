@@ -1,3 +1,4 @@
+import random as random_module
 from time import strftime, time
 
 from simulator.Configuration import Configuration
@@ -7,6 +8,8 @@ from simulator.unit.Rack import Rack
 
 
 class DataDistribute(object):
+    # stream the placement is drawn from, see simulator.Seeds
+    random = random_module
 
     def __init__(self, xml):
         self.xml = xml
@@ -28,6 +31,9 @@ class DataDistribute(object):
         self.groups = None
         self.conf.printAll()
 
+    def setRandom(self, random):
+        self.random = random
+
     def _my_assert(self, expression):
         if not expression:
             raise Exception("Assertion Failed!")
@@ -42,6 +42,9 @@ class LRC(Base):
     def isMDS(self):
         return False
 
+    def tableKey(self):
+        return (self.__class__.__name__, self.n, self.k, self.ll)
+
     @property
     def ORC(self):
         return float(self.k)/float(self.ll)
@@ -49,9 +52,6 @@ class LRC(Base):
     # state format: [data block states, local parity states in group1,
     # local parity in group 2, global parity blocks]
     def isRepairable(self, state):
-        if isinstance(state, int):
-            return False
-
         if len(state) != self.n:
             raise Exception("State Length Error!")
 
@@ -0,0 +1,69 @@
+class RepairPlanner(object):
+    """
+    Repair plans of one DRS handler, cached by erasure masks (see
+    drs.base.Base). A plan is what repair/parallRepair of the handler does
+    to a stripe: the repair cost in blocks, and the indexes of the blocks it
+    brings back to Normal. The plan only depends on which blocks are
+    Unavailable and which are Lost, so the handler is asked once per
+    pattern instead of on every repair.
+    """
+
+    def __init__(self, drs_handler, hierarchical=False, distinct_racks=0):
+        self.drs_handler = drs_handler
+        # cross-rack repair traffic per block of repair cost
+        self.ratio = drs_handler.repairTraffic(hierarchical, distinct_racks) \
+            / drs_handler.ORC
+        # (unavailable mask, lost mask, index, only_lost): (cost, repaired)
+        self.plans = {}
+        self.hits = 0
+        self.misses = 0
+
+    # state with the given masks, lost blocks are taken as state -1
+    def _state(self, unavailable_mask, lost_mask):
+        state = []
+        for i in xrange(self.drs_handler.n):
+            if (lost_mask >> i) & 1:
+                state.append(-1)
+            elif (unavailable_mask >> i) & 1:
+                state.append(0)
+            else:
+                state.append(1)
+        return state
+
+    def _plan(self, key, unavailable_mask, lost_mask, index, only_lost):
+        if key in self.plans:
+            self.hits += 1
+            return self.plans[key]
+        self.misses += 1
+
+        state = self._state(unavailable_mask, lost_mask)
+        before = list(state)
+        if index is None:
+            cost = self.drs_handler.parallRepair(state, only_lost)
+        else:
+            cost = self.drs_handler.repair(state, index)
+        repaired = tuple(i for i in xrange(self.drs_handler.n)
+                         if before[i] != 1 and state[i] == 1)
+        self.plans[key] = (cost, repaired)
+        return self.plans[key]
+
+    # plan of repair(state, index), which only depends on the unavailable
+    # mask
+    def repair(self, unavailable_mask, index):
+        return self._plan((unavailable_mask, 0, index, False),
+                          unavailable_mask, 0, index, False)
+
+    # plan of parallRepair(state, only_lost), lost_mask only matters with
+    # only_lost
+    def parallRepair(self, unavailable_mask, lost_mask, only_lost=False):
+        if not only_lost:
+            lost_mask = 0
+        return self._plan((unavailable_mask, lost_mask, None, only_lost),
+                          unavailable_mask, lost_mask, None, only_lost)
+
+    # (plan lookups, hit rate)
+    def statistics(self):
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0, 0.0
+        return lookups, float(self.hits)/lookups
@@ -14,8 +14,6 @@ class XORBAS(LRC):
     """
 
     def isRepairable(self, state):
-        if isinstance(state, int):
-            return False
         if len(state) != self.n:
             raise Exception("State Length Error!")
 
@@ -1,3 +1,10 @@
+import os
+
+from numpy import array, full, unique, int8, load, save
+
+# repairable tables by code (see Base.tableKey), shared by all handlers of
+# the same code: across iterations, and with workers forked after them
+_tables = {}
 
 
 class Base(object):
@@ -7,7 +14,22 @@ class Base(object):
         block state 0 : Unavailable
         block state -1: Lost(caused by disk corruption)
         block state -2: Lost(hit by Latent Sector Error)
+
+    erasure mask: bit i is set when block i is not Normal. Whether a state
+    is repairable only depends on its erasure mask, so it is looked up by it
+    (repair plans are cached by drs.RepairPlanner). The table of a code is
+    filled in as masks are first looked up, shared by every handler of the
+    code, and can be cached on disk between runs (see setTableDir).
     """
+    # largest n with a dense repairable table (2^n entries), larger codes
+    # use a dict
+    max_table_n = 20
+    # int8 over all erasure masks: 1 repairable, 0 not, -1 not known yet
+    _repairable_table = None
+    _repairable = None
+    # directory dense tables are cached in, None for no cache
+    table_dir = None
+
     def __init__(self, params):
         self.n = int(params[0])
         self.k = int(params[1])
@@ -59,9 +81,6 @@ class Base(object):
     # Check 'state' can be recovered or not. If can be recovered, return the
     # corresponding repair cost, or return False.
     def isRepairable(self, state):
-        # state = -100 means data lost
-        if isinstance(state, int):
-            return False
         if len(state) != self.n:
             raise Exception("State Length Error!")
         avails = state.count(1)
@@ -69,6 +88,94 @@ class Base(object):
             return True
         return False
 
+    def erasureMask(self, state):
+        mask = 0
+        for i, s in enumerate(state):
+            if s != 1:
+                mask |= 1 << i
+        return mask
+
+    # a state with erasure mask, erased blocks are Unavailable
+    def maskState(self, mask):
+        return [0 if (mask >> i) & 1 else 1 for i in xrange(self.n)]
+
+    def setTableDir(self, table_dir):
+        self.table_dir = table_dir
+
+    # codes with the same key agree on isRepairable, and share a table
+    def tableKey(self):
+        return (self.__class__.__name__, self.n, self.k)
+
+    def _tablePath(self):
+        name = "_".join(str(p) for p in self.tableKey())
+        return os.path.join(self.table_dir, name + ".npy")
+
+    # the shared repairable table of the code: a dict when n > max_table_n,
+    # otherwise the dense table, read from table_dir if cached there
+    def _table(self):
+        key = self.tableKey()
+        if key in _tables:
+            return _tables[key]
+        if self.n > self.max_table_n:
+            table = {}
+        else:
+            table = None
+            if self.table_dir is not None and \
+                    os.path.exists(self._tablePath()):
+                table = load(self._tablePath())
+            if table is None or table.shape != (1 << self.n,):
+                table = full(1 << self.n, -1, dtype=int8)
+        _tables[key] = table
+        return table
+
+    # Write the dense table to table_dir for later runs. It is written aside
+    # and renamed, so runs sharing the directory never read half a table;
+    # every entry is the same whichever run filled it in.
+    def saveTable(self):
+        if self.table_dir is None or self.n > self.max_table_n:
+            return
+        if not os.path.isdir(self.table_dir):
+            os.makedirs(self.table_dir)
+        path = self._tablePath()
+        temp_path = path + "." + str(os.getpid())
+        with open(temp_path, "wb") as fp:
+            save(fp, self._table())
+        os.rename(temp_path, path)
+
+    # isRepairable by erasure mask, filled in as masks are looked up
+    def isRepairableMask(self, mask):
+        if self.n > self.max_table_n:
+            if self._repairable is None:
+                self._repairable = self._table()
+            if mask not in self._repairable:
+                self._repairable[mask] = self.isRepairable(self.maskState(mask))
+            return self._repairable[mask]
+
+        if self._repairable_table is None:
+            self._repairable_table = self._table()
+        found = self._repairable_table[mask]
+        if found < 0:
+            found = self.isRepairable(self.maskState(mask))
+            self._repairable_table[mask] = found
+        return bool(found)
+
+    # isRepairableMask for an array of erasure masks, returns a bool array
+    def isRepairableMasks(self, masks):
+        if self.n > self.max_table_n:
+            return array([self.isRepairableMask(mask)
+                          for mask in masks.tolist()], dtype=bool)
+
+        if self._repairable_table is None:
+            self._repairable_table = self._table()
+        found = self._repairable_table[masks]
+        missing = found < 0
+        if missing.any():
+            for mask in unique(masks[missing]).tolist():
+                self._repairable_table[mask] = \
+                    self.isRepairable(self.maskState(mask))
+            found = self._repairable_table[masks]
+        return found == 1
+
     # Repair failures one by one. 'index' is the block index which will be repaired.
     def repair(self, state, index):
         pass
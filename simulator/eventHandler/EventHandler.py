@@ -1,11 +1,19 @@
+import random as random_module
 from collections import OrderedDict
 from math import sqrt, ceil
-from random import randint, choice, sample
 from copy import deepcopy
 
+from numpy import zeros, array, count_nonzero, full, nan, int8, int32, \
+    int64, isnan, flatnonzero, argsort, unique, atleast_1d, arange, \
+    concatenate, repeat, in1d, searchsorted
+
+from simulator.BlockStates import blockStates, combineBits
 from simulator.Event import Event
+from simulator.drs.RepairPlanner import RepairPlanner
 from simulator.Result import Result
-from simulator.utils import FIFO
+from simulator.Tracer import Tracer
+from simulator.UnavailableDurations import UnavailableDurations
+from simulator.utils import FIFO, popcount
 from simulator.Log import info_logger, error_logger
 from simulator.unit.Rack import Rack
 from simulator.unit.Machine import Machine
@@ -13,6 +21,9 @@ from simulator.unit.Disk import Disk
 from simulator.unit.DiskWithScrubbing import DiskWithScrubbing
 from simulator.unit.SliceSet import SliceSet
 
+# components a lost slice can be attributed to, see EventHandler.lost_causes
+LOST_CAUSES = ("LSE", "disk", "machine")
+
 
 class EventHandler(object):
     """
@@ -21,11 +32,19 @@ class EventHandler(object):
 
     Repair Time = TTR(failed component) + data transfer time
     """
+    # stream of the handler's own draws, see simulator.Seeds
+    random = random_module
 
     def __init__(self, distributer):
         self.distributer = distributer
         self.conf = self.distributer.returnConf()
         self.drs_handler = self.conf.DRSHandler()
+        if self.conf.hierarchical:
+            r = self.conf.distinct_racks
+        else:
+            r = 0
+        self.planner = RepairPlanner(self.drs_handler, self.conf.hierarchical,
+                                     r)
         self.n, self.k = self.distributer.returnCodingParameters()
         self.slice_locations = self.distributer.returnSliceLocations()
 
@@ -73,20 +92,33 @@ class EventHandler(object):
 
         # for each block, 1 means Normal, 0 means Unavailable, -1 means Lost(caused by disk or node lost),
         # -2 means Lost(caused by LSE)
-        self.status = [[1 for i in xrange(self.n)] for j in xrange(self.total_slices)]
+        # The states are kept by a backend of simulator.BlockStates, chosen
+        # by block_states. Changed by setChunk, and by failDisk/
+        # recoverDiskAvailability for the chunks of a whole disk.
+        # check_counters checks them against a recount of the blocks, and
+        # the lookups done on them.
+        self.check_counters = self.conf.check_counters
+        self.blocks = blockStates(self.conf.block_states, self.total_slices,
+                                  self.n, self.check_counters)
+        # True once the slice is lost, its block states are stale then
+        self.lost = zeros(self.total_slices, dtype=bool)
 
         self.unavailable_slice_count = 0
 
-        # [(slice_index, occur_time, caused by what kind of component failure), ...],
-        # example: (13567, 12456.78, "disk 137")
-        self.undurable_slice_infos = []
+        # time each undurable slice was lost at, NaN for the others, and the
+        # component failure it is attributed to: index in LOST_CAUSES and
+        # unit id. Example: slice 13567 lost at 12456.78 due to "disk 137".
+        self.lost_times = full(self.total_slices, nan)
+        self.lost_causes = full(self.total_slices, -1, dtype=int8)
+        self.lost_cause_ids = full(self.total_slices, -1, dtype=int32)
         self.undurable_slice_count = 0
 
         self.current_slice_degraded = 0
         self.current_avail_slice_degraded = 0
 
-        # slice_index:[[fail time, recovery time], ...]
-        self.unavailable_slice_durations = {}
+        # (slice_index, fail time, recovery time) of every unavailable duration
+        self.unavailable_slice_durations = \
+            UnavailableDurations(self.total_slices)
 
         # There is an anomaly (logical bug?) that is possible in the current
         # implementation:
@@ -128,23 +160,48 @@ class EventHandler(object):
         self.total_repair_transfers = 0
         self.total_optimal_repairs = 0
 
+        self.tracer = Tracer(self.conf.trace_level, self.conf.trace_file,
+                             self.conf.trace_every, self.conf.trace_slices)
+        self.tracer.setSliceLocations(self.slice_locations)
+
+
+    def setRandom(self, random):
+        self.random = random
 
     def _my_assert(self, expression):
         if not expression:
             raise Exception("My Assertion failed!")
         return True
 
+    # blocks in state -1 or -2
+    def lostMask(self, slice_index):
+        return self.blocks.lostMask(slice_index)
+
+    # blocks not in state 1, the erasure mask of drs.base.Base
+    def erasedMask(self, slice_index):
+        return self.blocks.erasedMask(slice_index)
+
     def durableCount(self, slice_index):
-        if isinstance(self.status[slice_index], int):
-            return self.status[slice_index]
-        else:
-            return self.status[slice_index].count(1) + self.status[slice_index].count(0)
+        if self.lost[slice_index]:
+            return self.lost_slice
+        return self.blocks.durableCount(slice_index)
 
     def availableCount(self, slice_index):
-        if isinstance(self.status[slice_index], int):
-            return self.status[slice_index]
-        else:
-            return self.status[slice_index].count(1)
+        if self.lost[slice_index]:
+            return self.lost_slice
+        return self.blocks.availableCount(slice_index)
+
+    def chunkState(self, slice_index, index):
+        return self.blocks.chunkState(slice_index, index)
+
+    def setChunk(self, slice_index, index, state):
+        self.blocks.setChunk(slice_index, index, state)
+
+    # state of a slice as the DRS handlers take it: a list, or lost_slice
+    def sliceState(self, slice_index):
+        if self.lost[slice_index]:
+            return self.lost_slice
+        return self.blocks.sliceState(slice_index)
 
     def sliceRecovered(self, slice_index):
         if self.durableCount(slice_index) == self.n:
@@ -173,77 +230,291 @@ class EventHandler(object):
             self.current_avail_slice_degraded += 1
 
     def repair(self, slice_index, repaired_index):
-        rc = self.drs_handler.repair(self.status[slice_index], repaired_index)
+        if self.lost[slice_index]:
+            raise Exception("state can not be repaired!")
+        rc, repaired = self.planner.repair(self.erasedMask(slice_index),
+                                           repaired_index)
+        self.setChunk(slice_index, repaired_index, 1)
         if rc < self.drs_handler.RC:
             self.total_optimal_repairs += 1
 
         return rc * self.conf.chunk_size
 
     def parallelRepair(self, slice_index, only_lost=False):
-        rc = self.drs_handler.parallRepair(self.status[slice_index], only_lost)
+        if self.lost[slice_index]:
+            raise Exception("state can not be repaired!")
+        rc, repaired = self.planner.parallRepair(
+            self.erasedMask(slice_index), self.lostMask(slice_index),
+            only_lost)
+        for index in repaired:
+            self.setChunk(slice_index, index, 1)
         return rc * self.conf.chunk_size
 
     def getRatio(self):
-        if self.conf.hierarchical:
-            r = self.conf.distinct_racks
-        else:
-            r = 0
-        ratio = self.drs_handler.repairTraffic(self.conf.hierarchical, r)/self.drs_handler.ORC
-        return ratio
+        return self.planner.ratio
 
     def isRepairable(self, slice_index):
-        return self.drs_handler.isRepairable(self.status[slice_index])
+        if self.lost[slice_index]:
+            return False
+        repairable = self.drs_handler.isRepairableMask(
+            self.erasedMask(slice_index))
+        if self.check_counters:
+            self._my_assert(repairable == self.drs_handler.isRepairable(
+                self.sliceState(slice_index)))
+        return repairable
 
     # corresponding slice is lost or not.
     # True means lost, False means not lost
     def isLost(self, slice_index):
-        state = []
-
-        if isinstance(self.status[slice_index], int):
+        if self.lost[slice_index]:
             return True
-        for s in self.status[slice_index]:
-            if s == 1 or s == 0:
-                state.append(1)
-            else:
-                state.append(s)
-        return not self.drs_handler.isRepairable(state)
+        return not self.drs_handler.isRepairableMask(
+            self.lostMask(slice_index))
+
+    # lostMask/erasedMask for an array of slices
+    def lostMasks(self, slices):
+        return self.blocks.lostMasks(slices)
+
+    def erasedMasks(self, slices):
+        return self.blocks.erasedMasks(slices)
+
+    # durableCount/availableCount for an array of slices which are not lost
+    def durableCounts(self, slices):
+        return self.blocks.durableCounts(slices)
+
+    def availableCounts(self, slices):
+        return self.blocks.availableCounts(slices)
+
+    # isRepairable for an array of slices which are not lost
+    def areRepairable(self, slices):
+        return self.drs_handler.isRepairableMasks(self.erasedMasks(slices))
+
+    # isLost for an array of slices which are not flagged lost yet
+    def areLost(self, slices):
+        return ~self.drs_handler.isRepairableMasks(self.lostMasks(slices))
+
+    def checkBlocks(self, slices):
+        if self.check_counters:
+            self.blocks.check(slices)
+
+    # (slice indexes, chunk positions) of the chunks on disk, leaving out
+    # slices not created yet. Slices already lost are left out as well, the
+    # open unavailable durations of them are closed at time if given.
+    def diskChunks(self, disk, time=None):
+        slices, positions = disk.chunkArrays()
+        keep = slices < self.total_slices
+        slices = slices[keep]
+        positions = positions[keep]
+
+        lost = self.lost[slices]
+        if time is not None:
+            self.unavailable_slice_durations.end(slices[lost], time)
+        return slices[~lost], positions[~lost]
+
+    # Failure of all chunks on disk, see failDisks
+    def failDisk(self, disk, durable, cause, time):
+        self.failDisks([(disk, durable, cause)], time)
+
+    # (slices, positions) with every chunk in them once
+    def uniqueChunks(self, slices, positions):
+        first = unique(slices.astype(int64)*self.n + positions,
+                       return_index=True)[1]
+        return slices[first], positions[first]
+
+    # Failure of the chunks on the disks failed together at time, as one
+    # union of their chunks. failures: [(disk, durable, cause), ...] in the
+    # order the disks fail; durable=False is a temporary machine failure,
+    # which only makes chunks unavailable. cause: component the lost slices
+    # are attributed to.
+    # The states end up as if the disks failed one by one: a lost slice is
+    # attributed to the first disk after which it is lost, and the disks
+    # after that one leave its chunks as they are.
+    def failDisks(self, failures, time):
+        if failures == []:
+            return
+        chunks = [self.diskChunks(disk) for disk, durable, cause in failures]
+        slices = concatenate([c[0] for c in chunks])
+        positions = concatenate([c[1] for c in chunks])
+        owners = repeat(arange(len(failures)), [len(c[0]) for c in chunks])
+        durable = array([d for disk, d, cause in failures], dtype=bool)[owners]
+
+        # sliceDegraded/sliceDegradedAvailability of every chunk, a slice
+        # only counts at its first chunk
+        durable_slices = unique(slices[durable])
+        lost_masks = self.lostMasks(durable_slices)
+        self.current_slice_degraded += count_nonzero(lost_masks == 0)
+        if self.k != 1:
+            self.current_avail_slice_degraded += \
+                count_nonzero(self.erasedMasks(unique(slices)) == 0)
+
+        # slices lost with the union of the durable chunks, then the chunk
+        # each one is lost at, adding the chunks in failure order
+        one = lost_masks.dtype.type(1)
+        union_masks = lost_masks | combineBits(
+            slices[durable], one << positions[durable].astype(one.dtype))[1]
+        lost = durable_slices[~self.drs_handler.isRepairableMasks(union_masks)]
+        lost_at = {}
+        if len(lost) > 0:
+            masks = dict(zip(lost.tolist(), self.lostMasks(lost).tolist()))
+            for i in flatnonzero(durable & in1d(slices, lost)).tolist():
+                slice_index = int(slices[i])
+                if slice_index in lost_at:
+                    continue
+                masks[slice_index] |= 1 << int(positions[i])
+                if not self.drs_handler.isRepairableMask(masks[slice_index]):
+                    lost_at[slice_index] = i
+        losses = sorted((i, slice_index, owners[i])
+                        for slice_index, i in lost_at.items())
+
+        # chunks of lost slices on the disks after the one they are lost at
+        if len(lost) > 0:
+            last_owners = owners[[lost_at[s] for s in lost.tolist()]]
+            index = searchsorted(lost, slices).clip(max=len(lost) - 1)
+            keep = (lost[index] != slices) | (owners <= last_owners[index])
+            slices = slices[keep]
+            positions = positions[keep]
+            durable = durable[keep]
+
+        # chunks already in state -1 are left as they are
+        keep = self.blocks.chunkStates(slices, positions) != -1
+        slices = slices[keep]
+        positions = positions[keep]
+        durable = durable[keep]
+
+        touched = unique(slices)
+        repairable_before = self.areRepairable(touched)
+        # durable chunks become -1 first, then state 1 becomes 0 and state
+        # -2 stays for the others not -1 by now
+        failed_slices, failed_positions = self.uniqueChunks(
+            slices[durable], positions[durable])
+        self.blocks.failChunks(failed_slices, failed_positions, True)
+        slices = slices[~durable]
+        positions = positions[~durable]
+        keep = self.blocks.chunkStates(slices, positions) != -1
+        failed_slices, failed_positions = self.uniqueChunks(
+            slices[keep], positions[keep])
+        self.blocks.failChunks(failed_slices, failed_positions, False)
+        self.checkBlocks(touched)
+
+        repairable_current = self.areRepairable(touched)
+        unavailable = touched[repairable_before & ~repairable_current]
+        self.unavailable_slice_count += len(unavailable)
+        self.unavailable_slice_durations.start(unavailable, time)
+
+        # lost stripes have been recorded in unavailable_slice_durations
+        for i, slice_index, owner in losses:
+            info_logger.info(
+                "time: " + str(time) + " slice:" + str(slice_index) +
+                " durCount:" + str(self.durableCount(slice_index)) +
+                " due to " + failures[owner][2])
+        for i, slice_index, owner in losses:
+            self.slicesLost(slice_index, time, failures[owner][2])
+
+    # Record slices as undurable at time. cause: "<component> <unit id>",
+    # component being one of LOST_CAUSES
+    def slicesLost(self, slices, time, cause):
+        component, c_id = cause.split(' ')
+        if component not in LOST_CAUSES:
+            raise Exception("Incorrect component")
+        slices = atleast_1d(slices)
+        self.lost[slices] = True
+        self.undurable_slice_count += len(slices)
+        self.lost_times[slices] = time
+        self.lost_causes[slices] = LOST_CAUSES.index(component)
+        self.lost_cause_ids[slices] = int(c_id)
+
+    # Recovery of the chunks on disk made unavailable by a temporary machine
+    # failure, as one array operation.
+    def recoverDiskAvailability(self, disk, e, time):
+        slices, positions = self.diskChunks(disk, time)
+
+        degraded = self.erasedMasks(slices) != 0
+        if e.info == 1:  # temp & short failure
+            self.anomalous_available_count += count_nonzero(~degraded)
+        slices = slices[degraded]
+        positions = positions[degraded]
+
+        repairable_before = self.areRepairable(slices)
+        # state 0 becomes 1
+        self.blocks.restoreChunks(slices, positions)
+        self.checkBlocks(slices)
+        # sliceRecoveredAvailability of every chunk
+        if self.k != 1:
+            self.current_avail_slice_degraded -= \
+                count_nonzero(self.erasedMasks(slices) == 0)
+
+        repairable_current = self.areRepairable(slices)
+        self.unavailable_slice_durations.end(
+            slices[~repairable_before & repairable_current], time)
+
+    # Repair of the chunks on a replaced disk. Slices which may cross the
+    # recovery threshold are picked with array operations, only those are
+    # repaired one by one through the DRS handler.
+    def recoverDisk(self, disk, time):
+        transfer_required = 0.0
+        slices, positions = self.diskChunks(disk, time)
+        repairable = self.areRepairable(slices)
+        slices = slices[repairable]
+        positions = positions[repairable]
+
+        # current_slice_degraded only goes down while repairing, so
+        # actual_threshold is either its value now or recovery_threshold
+        loose_threshold = self.recovery_threshold
+        if self.conf.lazy_only_available and self.current_slice_degraded >= \
+                self.conf.max_degraded_slices*self.total_slices:
+            loose_threshold = max(loose_threshold, self.n - 1)
+        crossed = self.durableCounts(slices) <= loose_threshold
+        if self.availability_counts_for_recovery:
+            crossed |= self.availableCounts(slices) <= loose_threshold
+
+        for slice_index, index in zip(slices[crossed].tolist(),
+                                      positions[crossed].tolist()):
+            threshold_crossed = False
+            actual_threshold = self.recovery_threshold
+            if self.conf.lazy_only_available:
+                actual_threshold = self.n - 1
+            if self.current_slice_degraded < self.conf.max_degraded_slices*self.total_slices:
+                actual_threshold = self.recovery_threshold
+
+            if self.durableCount(slice_index) <= actual_threshold:
+                threshold_crossed = True
+
+            if self.availability_counts_for_recovery:
+                if self.availableCount(slice_index) <= actual_threshold:
+                    threshold_crossed = True
+
+            if threshold_crossed:
+                state = self.chunkState(slice_index, index)
+                if state == -1 or state == -2:
+                    if self.lazy_recovery or self.parallel_repair:
+                        rc = self.parallelRepair(slice_index)
+                    else:
+                        rc = self.repair(slice_index, index)
+                    if slice_index in disk.getSlicesHitByLSE():
+                        disk.slices_hit_by_LSE.remove(slice_index)
+                    self.total_repairs += 1
+                    ratio = self.getRatio()
+                    transfer_required += rc * ratio
+                    self.total_repair_transfers += rc * ratio
+
+                # must come after all counters are updated
+                self.sliceRecovered(slice_index)
+        return transfer_required
 
     # system_level=True means the TTFs/TTRs statistics come from system perspective,
-    #                   concurrent stripes' failures will be recorded as one duration;
+    #                   overlapping stripes' unavailable durations are merged
+    #                   into one system outage;
     # system_level=False is the opposite.
     def processDuration(self, system_perspective=True):
-        TTFs = []
-        # failure timestamps
-        FTs = []
-        TTRs = []
-
-        unavail_slices = self.unavailable_slice_durations.keys()
-        if len(unavail_slices) == 0:
-            return [], []
-
-        for slice_index in unavail_slices:
-            for duration in self.unavailable_slice_durations[slice_index]:
-                if system_perspective and (duration[0] in FTs):
-                    continue
-                FTs.append(duration[0])
-                if len(duration) == 1:
-                    TTRs.append(self.end_time - duration[0])
-                else:
-                    TTRs.append(duration[1] - duration[0])
-
-        FTs.sort()
-        TTFs.append(FTs[0])
-        for i in xrange(len(FTs)-1):
-            TTFs.append(FTs[i+1] - FTs[i])
-
-        return (TTFs, TTRs)
+        return self.unavailable_slice_durations.failuresAndRepairs(
+            self.end_time, system_perspective)
 
 
     def calUA(self, TTFs, TTRs):
         if len(TTFs) == 0 or len(TTRs) == 0:
             return format(0.0, ".4e")
-        MTTF = sum(TTFs)/len(TTFs)
-        MTTR = sum(TTRs)/len(TTRs)
+        MTTF = TTFs.mean()
+        MTTR = TTRs.mean()
         MTBF = MTTF + MTTR
 
         pua = MTTR/MTBF
@@ -251,33 +522,39 @@ class EventHandler(object):
 
     # unavailability = downtime/(uptime + downtime) = downtime/self.end_time
     def calUADowntime(self, TTRs):
-        pua = sum(TTRs)/self.end_time
+        pua = TTRs.sum()/self.end_time
         return format(pua, ".4e")
 
+    # indexes of the undurable slices, in the order they were lost
+    def undurableSlices(self):
+        slices = flatnonzero(~isnan(self.lost_times))
+        return slices[argsort(self.lost_times[slices], kind="mergesort")]
+
+    # [(slice_index, occur_time, caused by what kind of component failure), ...],
+    # example: (13567, 12456.78, "disk 137")
+    def undurableInfos(self):
+        slices = self.undurableSlices()
+        return [(slice_index, ts, LOST_CAUSES[cause] + " " + str(c_id))
+                for slice_index, ts, cause, c_id in zip(
+                    slices.tolist(), self.lost_times[slices].tolist(),
+                    self.lost_causes[slices].tolist(),
+                    self.lost_cause_ids[slices].tolist())]
+
     def calUndurableDetails(self):
-        lost_caused_by_LSE = 0
-        lost_caused_by_disk = 0
-        lost_caused_by_node = 0
-
-        disks_cause_lost = []
-        nodes_cause_lost = []
-
-        for slice_index, ts, info in self.undurable_slice_infos:
-            component, c_id = info.split(' ')
-            if component == "LSE":
-                lost_caused_by_LSE += 1
-            elif component == "disk":
-                lost_caused_by_disk += 1
-                if ts not in disks_cause_lost:
-                    disks_cause_lost.append(ts)
-            elif component == "machine":
-                lost_caused_by_node += 1
-                if ts not in nodes_cause_lost:
-                    nodes_cause_lost.append(ts)
-            else:
-                raise Exception("Incorrect component")
+        slices = self.undurableSlices()
+        causes = self.lost_causes[slices]
+        times = self.lost_times[slices]
+        by_disk = causes == LOST_CAUSES.index("disk")
+        by_node = causes == LOST_CAUSES.index("machine")
+
+        lost_caused_by_LSE = count_nonzero(causes == LOST_CAUSES.index("LSE"))
+        lost_caused_by_disk = count_nonzero(by_disk)
+        lost_caused_by_node = count_nonzero(by_node)
+        # failures are told apart by their times
+        disks_cause_lost = len(unique(times[by_disk]))
+        nodes_cause_lost = len(unique(times[by_node]))
 
-        return (lost_caused_by_LSE, lost_caused_by_disk, lost_caused_by_node, len(disks_cause_lost), len(nodes_cause_lost))
+        return (lost_caused_by_LSE, lost_caused_by_disk, lost_caused_by_node, disks_cause_lost, nodes_cause_lost)
 
     # normalized magnitude of data loss, bytes per TB in period of times
     def NOMDL(self, t=None):
@@ -285,9 +562,8 @@ class EventHandler(object):
         if t is None:
             undurable = self.undurable_slice_count
         else:
-            for slice_index, ts, info in self.undurable_slice_infos:
-                if ts <= t:
-                    undurable += 1
+            slices = self.undurableSlices()
+            undurable = count_nonzero(self.lost_times[slices] <= t)
 
         NOMDL = undurable * (self.conf.chunk_size * pow(2, 20)) / (self.conf.total_active_storage * pow(2, 10))
         return NOMDL
@@ -301,30 +577,41 @@ class EventHandler(object):
             if s_time <= ts <= end_time:
                 return int(ceil(count + rate*(ts - s_time)))
 
+    # Whether e can be handled in a batch with the events at its time, see
+    # handleEvents.
+    def batchable(self, e):
+        return e.getType() == Event.EventType.Failure and not e.ignore
+
+    # events: popped together by queue.removeFirstBatch(self.batchable)
+    def handleEvents(self, events, queue):
+        if not self.batchable(events[0]):
+            self.handleEvent(events[0], queue)
+            return
+
+        for e in events:
+            self.tracer.event(e)
+        self.handleFailures(events, queue)
+
     def handleEvent(self, e, queue):
-        print "********event info********"
-        print "event ID: ", e.event_id
-        print "event type: ", e.getType()
-        print "event unit: ", e.getUnit().toString()
-        print "event Time: ", e.getTime()
-        print "event next reovery time: ", e.next_recovery_time
-
-        if e.getType() == Event.EventType.Failure:
+        self.tracer.event(e)
+
+        t = e.getType()
+        if t == Event.EventType.Failure:
             self.handleFailure(e.getUnit(), e.getTime(), e, queue)
-        elif e.getType() == Event.EventType.Recovered:
+        elif t == Event.EventType.Recovered:
             self.handleRecovery(e.getUnit(), e.getTime(), e, queue)
-        elif e.getType() == Event.EventType.LatentDefect:
+        elif t == Event.EventType.LatentDefect:
             self.handleLatentDefect(e.getUnit(), e.getTime(), e)
-        elif e.getType() == Event.EventType.LatentRecovered:
+        elif t == Event.EventType.LatentRecovered:
             self.handleLatentRecovered(e.getUnit(), e.getTime(), e)
-        elif e.getType() == Event.EventType.EagerRecoveryStart:
+        elif t == Event.EventType.EagerRecoveryStart:
             self.handleEagerRecoveryStart(e.getUnit(), e.getTime(), e, queue)
-        elif e.getType() == Event.EventType.EagerRecoveryInstallment:
+        elif t == Event.EventType.EagerRecoveryInstallment:
             self.handleEagerRecoveryInstallment(e.getUnit(), e.getTime(), e)
-        elif e.getType() == Event.EventType.RAFIRecovered:
+        elif t == Event.EventType.RAFIRecovered:
             self.handleRAFIRecovery(e.getUnit(), e.getTime(), e, queue)
         else:
-            raise Exception("Unknown event: " + e.getType())
+            raise Exception("Unknown event: " + str(t))
 
     def handleFailure(self, u, time, e, queue):
         if e.ignore:
@@ -348,95 +635,63 @@ class EventHandler(object):
                     else:
                         self.total_long_temp_machine_failures += 1
 
-            disks = u.getChildren()
-            for child in disks:
-                slice_indexes = child.getChildren()
-                for slice_index in slice_indexes:
-                    if slice_index >= self.total_slices:
-                        continue
-                    if self.status[slice_index] == self.lost_slice:
-                        continue
-
-                    if e.info == 3:
-                        self.sliceDegraded(slice_index)
-                    else:
-                        self.sliceDegradedAvailability(slice_index)
-
-                    repairable_before = self.isRepairable(slice_index)
-                    index = self.slice_locations[slice_index].index(child)
-                    if self.status[slice_index][index] == -1:
-                        continue
-                    if e.info == 3:
-                        self.status[slice_index][index] = -1
-                        self._my_assert(self.durableCount(slice_index) >= 0)
-                    else:
-                        if self.status[slice_index][index] == 1:
-                            self.status[slice_index][index] = 0
-                        self._my_assert(self.availableCount(slice_index) >= 0)
-
-                    repairable_current = self.isRepairable(slice_index)
-                    if repairable_before and not repairable_current:
-                        self.unavailable_slice_count += 1
-                        if slice_index in self.unavailable_slice_durations.keys():
-                            self.unavailable_slice_durations[slice_index].append([time])
-                        else:
-                            self.unavailable_slice_durations[slice_index] = [[time]]
-
-                    if e.info == 3:
-                        # lost stripes have been recorded in unavailable_slice_durations
-                        if self.isLost(slice_index):
-                            info_logger.info(
-                                "time: " + str(time) + " slice:" + str(slice_index) +
-                                " durCount:" + str(self.durableCount(slice_index)) +
-                                " due to machine " + str(u.getID()))
-                            self.status[slice_index] = self.lost_slice
-                            self.undurable_slice_count += 1
-                            self.undurable_slice_infos.append((slice_index, time, "machine "+ str(u.getID())))
-                            continue
+            self.failDisks([(child, e.info == 3, "machine " + str(u.getID()))
+                            for child in u.getChildren()], time)
         elif isinstance(u, Disk):
             self.total_disk_failures += 1
             u.setLastFailureTime(e.getTime())
-            # need to compute projected reovery b/w needed
-            projected_bandwidth_need = 0.0
-
-            slice_indexes = u.getChildren()
-            for slice_index in slice_indexes:
-                if slice_index >= self.total_slices:
-                    continue
-                if self.status[slice_index] == self.lost_slice:
-                    continue
-
-                self.sliceDegraded(slice_index)
-                repairable_before = self.isRepairable(slice_index)
-
-                index = self.slice_locations[slice_index].index(u)
-                if self.status[slice_index][index] == -1:
-                    continue
-                self.status[slice_index][index] = -1
-
-                self._my_assert(self.durableCount(slice_index) >= 0)
-
-                repairable_current = self.isRepairable(slice_index)
-                if repairable_before and not repairable_current:
-                    self.unavailable_slice_count += 1
-                    if slice_index in self.unavailable_slice_durations.keys():
-                        self.unavailable_slice_durations[slice_index].append([time])
-                    else:
-                        self.unavailable_slice_durations[slice_index] = [[time]]
-
-                if self.isLost(slice_index):
-                    info_logger.info(
-                        "time: " + str(time) + " slice:" + str(slice_index) +
-                        " durCount:" + str(self.durableCount(slice_index)) +
-                        " due to disk " + str(u.getID()))
-                    self.status[slice_index] = self.lost_slice
-                    self.undurable_slice_count += 1
-                    self.undurable_slice_infos.append((slice_index, time, "disk "+ str(u.getID())))
-                    continue
+            self.failDisk(u, True, "disk " + str(u.getID()), time)
         else:
             for child in u.getChildren():
                 self.handleFailure(child, time, e, queue)
 
+    # Failure events at one timestamp, e.g. a rack failure or correlated
+    # failures. The failed units are expanded to disks first, in the order
+    # handleFailure on each event in turn would visit them, then the chunks
+    # of all the disks fail together (see failDisks).
+    def handleFailures(self, events, queue):
+        time = events[0].getTime()
+
+        # (disk, failed unit, event)
+        failed_disks = []
+        units = [(e.getUnit(), e) for e in events]
+        while units != []:
+            u, e = units.pop(0)
+            if isinstance(u, Machine):
+                self.total_machine_failures += 1
+                u.setLastFailureTime(e.getTime())
+
+                if e.info == 3:
+                    self.total_perm_machine_failures += 1
+                else:
+                    if e.info == 1:
+                        self.total_short_temp_machine_failures += 1
+                    elif e.info == 2:
+                        self.total_long_temp_machine_failures += 1
+                    else:
+                        self.total_machine_failures_due_to_rack_failures += 1
+                        if e.next_recovery_time - e.getTime() <= u.fail_timeout:
+                            self.total_short_temp_machine_failures += 1
+                        else:
+                            self.total_long_temp_machine_failures += 1
+                for child in u.getChildren():
+                    failed_disks.append((child, u, e))
+            elif isinstance(u, Disk):
+                self.total_disk_failures += 1
+                u.setLastFailureTime(e.getTime())
+                failed_disks.append((u, u, e))
+            else:
+                units = [(child, e) for child in u.getChildren()] + units
+
+        failures = []
+        for disk, u, e in failed_disks:
+            if isinstance(u, Disk):
+                failures.append((disk, True, "disk " + str(u.getID())))
+            else:
+                failures.append((disk, e.info == 3,
+                                 "machine " + str(u.getID())))
+        self.failDisks(failures, time)
+
     def handleRecovery(self, u, time, e, queue):
         if e.ignore:
             return
@@ -447,79 +702,11 @@ class EventHandler(object):
             # The temporary machine failures is simulated here, while the
             # permanent machine failure is simulated in disk recoveries
             if e.info != 3 and e.info != 4:
-                disks = u.getChildren()
-                for child in disks:
-                    slice_indexes = child.getChildren()
-                    for slice_index in slice_indexes:
-                        if slice_index >= self.total_slices:
-                            continue
-                        if self.status[slice_index] == self.lost_slice:
-                            if slice_index in self.unavailable_slice_durations.keys() and \
-                                len(self.unavailable_slice_durations[slice_index][-1]) == 1:
-                                self.unavailable_slice_durations[slice_index][-1].append(time)
-                            continue
-
-                        if self.availableCount(slice_index) < self.n:
-                            repairable_before = self.isRepairable(slice_index)
-
-                            index = self.slice_locations[slice_index].index(child)
-                            if self.status[slice_index][index] == 0:
-                                self.status[slice_index][index] = 1
-                            self.sliceRecoveredAvailability(slice_index)
-
-                            repairable_current = self.isRepairable(slice_index)
-                            if not repairable_before and repairable_current:
-                                self.unavailable_slice_durations[slice_index][-1].append(time)
-                        elif e.info == 1:  # temp & short failure
-                            self.anomalous_available_count += 1
-                        else:
-                            pass
+                for child in u.getChildren():
+                    self.recoverDiskAvailability(child, e, time)
             elif e.info == 4 or self.conf.queue_disable:  # permanent node failure without queue time
-                transfer_required = 0.0
-                disks = u.getChildren()
-                for disk in disks:
-                    indexes = disk.getChildren()
-                    for slice_index in indexes:
-                        if slice_index >= self.total_slices:
-                            continue
-                        if self.status[slice_index] == self.lost_slice:
-                            if slice_index in self.unavailable_slice_durations.keys() and \
-                                len(self.unavailable_slice_durations[slice_index][-1]) == 1:
-                                self.unavailable_slice_durations[slice_index][-1].append(time)
-                            continue
-                        if not self.isRepairable(slice_index):
-                            continue
-
-                        threshold_crossed = False
-                        actual_threshold = self.recovery_threshold
-                        if self.conf.lazy_only_available:
-                            actual_threshold = self.n - 1
-                        if self.current_slice_degraded < self.conf.max_degraded_slices*self.total_slices:
-                            actual_threshold = self.recovery_threshold
-
-                        if self.durableCount(slice_index) <= actual_threshold:
-                            threshold_crossed = True
-
-                        if self.availability_counts_for_recovery:
-                            if self.availableCount(slice_index) <= actual_threshold:
-                                threshold_crossed = True
-
-                        if threshold_crossed:
-                            index = self.slice_locations[slice_index].index(disk)
-                            if self.status[slice_index][index] == -1 or self.status[slice_index][index] == -2:
-                                if self.lazy_recovery or self.parallel_repair:
-                                    rc = self.parallelRepair(slice_index)
-                                else:
-                                    rc = self.repair(slice_index, index)
-                                if slice_index in disk.getSlicesHitByLSE():
-                                    disk.slices_hit_by_LSE.remove(slice_index)
-                                self.total_repairs += 1
-                                ratio = self.getRatio()
-                                transfer_required += rc * ratio
-                                self.total_repair_transfers += rc * ratio
-
-                            # must come after all counters are updated
-                            self.sliceRecovered(slice_index)
+                for disk in u.getChildren():
+                    self.recoverDisk(disk, time)
             else:  # e.info == 3 and queue_disable = False,  permanent machine failure with queue time
                 disks = u.getChildren()
                 empty_flag = True
@@ -547,7 +734,7 @@ class EventHandler(object):
                 else:
                     num = self.conf.drs_handler.k
 
-                chosen_racks = sample(all_racks, queue_rack_count)
+                chosen_racks = self.random.sample(all_racks, queue_rack_count)
                 recovery_time = self.contention_model.occupy(node_repair_start, chosen_racks, num, node_repair_time)
                 recovery_event = Event(Event.EventType.Recovered, recovery_time, u, 4)
                 queue.addEvent(recovery_event)
@@ -576,57 +763,14 @@ class EventHandler(object):
                     num = self.conf.drs_handler.d
                 else:
                     num = self.conf.drs_handler.k
-                chosen_racks = sample(all_racks, queue_rack_count)
+                chosen_racks = self.random.sample(all_racks, queue_rack_count)
                 recovery_time = self.contention_model.occupy(disk_repair_start, chosen_racks, num, disk_repair_time)
                 recovery_event = Event(Event.EventType.Recovered, recovery_time, u, 4)
                 queue.addEvent(recovery_event)
                 return
 
             self.total_disk_repairs += 1
-
-            transfer_required = 0.0
-            slice_indexes = u.getChildren()
-            for slice_index in slice_indexes:
-                if slice_index >= self.total_slices:
-                    continue
-                if self.status[slice_index] == self.lost_slice:
-                    if slice_index in self.unavailable_slice_durations.keys() and \
-                        len(self.unavailable_slice_durations[slice_index][-1]) == 1:
-                        self.unavailable_slice_durations[slice_index][-1].append(time)
-                    continue
-                if not self.isRepairable(slice_index):
-                    continue
-
-                threshold_crossed = False
-                actual_threshold = self.recovery_threshold
-                if self.conf.lazy_only_available:
-                    actual_threshold = self.n - 1
-                if self.current_slice_degraded < self.conf.max_degraded_slices*self.total_slices:
-                    actual_threshold = self.recovery_threshold
-
-                if self.durableCount(slice_index) <= actual_threshold:
-                    threshold_crossed = True
-
-                if self.availability_counts_for_recovery:
-                    if self.availableCount(slice_index) <= actual_threshold:
-                        threshold_crossed = True
-
-                if threshold_crossed:
-                    index = self.slice_locations[slice_index].index(u)
-                    if self.status[slice_index][index] == -1 or self.status[slice_index][index] == -2:
-                        if self.lazy_recovery or self.parallel_repair:
-                            rc = self.parallelRepair(slice_index)
-                        else:
-                            rc = self.repair(slice_index, index)
-                        if slice_index in u.getSlicesHitByLSE():
-                            u.slices_hit_by_LSE.remove(slice_index)
-                        self.total_repairs += 1
-                        ratio = self.getRatio()
-                        transfer_required += rc * ratio
-                        self.total_repair_transfers += rc * ratio
-
-                    # must come after all counters are updated
-                    self.sliceRecovered(slice_index)
+            self.recoverDisk(u, time)
         else:
             for child in u.getChildren():
                 self.handleRecovery(child, time, e, queue)
@@ -638,36 +782,34 @@ class EventHandler(object):
                 return
             self._my_assert(slice_count > 10)
 
-            slice_index = choice(u.getChildren())
+            slice_index = self.random.choice(u.getChildren())
             if slice_index >= self.total_slices:
                 return
 
-            if self.status[slice_index] == self.lost_slice:
+            if self.lost[slice_index]:
                 self.total_skipped_latent += 1
                 return
 
             repairable_before = self.isRepairable(slice_index)
 
-            index = self.slice_locations[slice_index].index(u)
+            index = u.chunk_positions[slice_index]
             # A LSE cannot hit lost blocks or a same block multiple times
-            if self.status[slice_index][index] == -1 or self.status[slice_index][index] == -2:
+            state = self.chunkState(slice_index, index)
+            if state == -1 or state == -2:
                 self.total_skipped_latent += 1
                 return
 
             self._my_assert(self.durableCount(slice_index) >= 0)
             self.sliceDegraded(slice_index)
 
-            self.status[slice_index][index] = -2
+            self.setChunk(slice_index, index, -2)
             u.slices_hit_by_LSE.append(slice_index)
             self.total_latent_failures += 1
 
             repairable_current = self.isRepairable(slice_index)
             if repairable_before and not repairable_current:
                 self.unavailable_slice_count += 1
-                if slice_index in self.unavailable_slice_durations.keys():
-                    self.unavailable_slice_durations[slice_index].append([time])
-                else:
-                    self.unavailable_slice_durations[slice_index] = [[time]]
+                self.unavailable_slice_durations.start(slice_index, time)
 
             if self.isLost(slice_index):
                 info_logger.info(
@@ -676,9 +818,7 @@ class EventHandler(object):
                     " latDefect " + str(True) +
                     "  due to ===latent=== error " + " on disk " +
                     str(u.getID()))
-                self.undurable_slice_count += 1
-                self.undurable_slice_infos.append((slice_index, time, "LSE "+ str(u.getID())))
-                self.status[slice_index] = self.lost_slice
+                self.slicesLost(slice_index, time, "LSE " + str(u.getID()))
         else:
             raise Exception("Latent defect should only happen for disk")
 
@@ -688,20 +828,33 @@ class EventHandler(object):
             self.total_scrubs += 1
 
             slice_indexes = u.getSlicesHitByLSE()
+            # A scrub often finds nothing to do, the LSEs were repaired with
+            # their slices already. Check all listed chunks at once, and only
+            # walk the list (which shrinks while walking it) otherwise.
+            if slice_indexes == []:
+                return
+            slices = array(slice_indexes)
+            positions = array([u.chunk_positions[s] for s in slice_indexes])
+            keep = slices < self.total_slices
+            slices = slices[keep]
+            positions = positions[keep]
+            if not self.lost[slices].any() and \
+                    not (self.blocks.chunkStates(slices, positions) ==
+                         -2).any():
+                return
+
             for slice_index in slice_indexes:
                 if slice_index >= self.total_slices:
                     continue
-                if self.status[slice_index] == self.lost_slice:
-                    if slice_index in self.unavailable_slice_durations.keys() and \
-                        len(self.unavailable_slice_durations[slice_index][-1]) == 1:
-                        self.unavailable_slice_durations[slice_index][-1].append(time)
+                if self.lost[slice_index]:
+                    self.unavailable_slice_durations.end(slice_index, time)
                     continue
 
                 if not self.isRepairable(slice_index):
                     continue
 
-                index = self.slice_locations[slice_index].index(u)
-                if self.status[slice_index][index] != -2:
+                index = u.chunk_positions[slice_index]
+                if self.chunkState(slice_index, index) != -2:
                     continue
                 self.total_scrub_repairs += 1
                 rc = self.repair(slice_index, index)
@@ -720,30 +873,32 @@ class EventHandler(object):
         # data loss probability and data unvailable probability
         data_loss_prob = format(float(self.undurable_slice_count)/(self.total_slices*self.n), ".4e")
 
-        Result.undurable_count = self.undurable_slice_count
-        Result.unavailable_count = self.unavailable_slice_count
-        Result.undurable_infos = self.undurable_slice_infos
-        Result.unavailable_slice_durations = self.unavailable_slice_durations
-        Result.PDL = data_loss_prob
+        ret.undurable_count = self.undurable_slice_count
+        ret.unavailable_count = self.unavailable_slice_count
+        ret.undurable_infos = self.undurableInfos()
+        ret.unavailable_slice_durations = \
+            self.unavailable_slice_durations.toDict()
+        ret.PDL = data_loss_prob
 
         TTFs, TTRs = self.processDuration()
-        Result.PUA = self.calUA(TTFs, TTRs)
-        # Result.unavailable_prob1 = self.calUADowntime(TTRs)
+        ret.PUA = self.calUA(TTFs, TTRs)
+        # outages are disjoint, so their TTRs add up to the system downtime
+        ret.PUA1 = self.calUADowntime(TTRs)
 
-        Result.undurable_count_details = self.calUndurableDetails()
-        Result.NOMDL = self.NOMDL()
+        ret.undurable_count_details = self.calUndurableDetails()
+        ret.NOMDL = self.NOMDL()
 
         # total repair cost in PiBs
-        Result.TRC = format(float(self.total_repair_transfers)/pow(2,30), ".2e")
+        ret.TRC = format(float(self.total_repair_transfers)/pow(2,30), ".2e")
 
 	years = self.end_time/8760
         # total storage cost in PiB*year
-        Result.TSC = format(float(self.conf.total_active_storage)*self.n/self.k*years, ".2e")
+        ret.TSC = format(float(self.conf.total_active_storage)*self.n/self.k*years, ".2e")
 
         if not self.queue_disable:
             queue_times, avg_queue_time = self.contention_model.statistics()
-            Result.queue_times = queue_times
-            Result.avg_queue_time = format(avg_queue_time, ".4f")
+            ret.queue_times = queue_times
+            ret.avg_queue_time = format(avg_queue_time, ".4f")
             info_logger.info("total times of queuing: %d, average queue time: %f" %
                     (queue_times, avg_queue_time))
 
@@ -777,6 +932,12 @@ class EventHandler(object):
              self.undurable_slice_count,
              self.total_repairs, self.total_optimal_repairs))
 
+        lookups, hit_rate = self.planner.statistics()
+        info_logger.info("repair plan lookups: %d, hit rate: %f" %
+                         (lookups, hit_rate))
+        self.tracer.setSummary("repair_plans", {"lookups": lookups,
+                                                "hit_rate": hit_rate})
+        self.tracer.close()
         return ret
 
     def handleEagerRecoveryStart(self, u, time, e, queue):
@@ -838,7 +999,7 @@ class EventHandler(object):
                 # it as an anomaly
                 if self.availableCount(slice_index) >= self.n:
                     self.anomalous_available_count += 1
-                if self.status[slice_index] == self.lost_slice:
+                if self.lost[slice_index]:
                     continue
 
                 threshold_crossed = False
@@ -847,7 +1008,8 @@ class EventHandler(object):
                     self.conf.chunk_size/recovery_rate
                 actual_threshold = self.conf.getAvailableLazyThreshold(
                     expected_recovery_time -
-                    slice_installment.getOriginalFailureTime())
+                    slice_installment.getOriginalFailureTime(),
+                    self.random.random)
 
                 if self.durableCount(slice_index) <= actual_threshold:
                     threshold_crossed = True
@@ -857,7 +1019,8 @@ class EventHandler(object):
                         threshold_crossed = True
 
                 if threshold_crossed:
-                    num_unavailable = self.status[slice_index].count(0)
+                    num_unavailable = int(popcount(
+                        self.blocks.unavailableMask(slice_index)))
                     slice_installment.slices.append(slice_index)
                     total_num_chunks_added_for_repair += self.k + \
                         num_unavailable - 1
@@ -921,17 +1084,16 @@ class EventHandler(object):
 
             for slice_index in u.slices:
                 # slice_index = s.intValue()
-                if self.status[slice_index] == self.lost_slice:
-                    if slice_index in self.unavailable_slice_durations.keys() and \
-                        len(self.unavailable_slice_durations[slice_index][-1]) == 1:
-                        self.unavailable_slice_durations[slice_index][-1].append(time)
+                if self.lost[slice_index]:
+                    self.unavailable_slice_durations.end(slice_index, time)
                     continue
 
                 threshold_crossed = False
                 actual_threshold = self.recovery_threshold
                 # need uc = u?
                 actual_threshold = self.conf.getAvailableLazyThreshold(
-                    e.getTime() - u.getOriginalFailureTime())
+                    e.getTime() - u.getOriginalFailureTime(),
+                    self.random.random)
 
                 if self.durableCount(slice_index) <= actual_threshold:
                     threshold_crossed = True
@@ -942,7 +1104,7 @@ class EventHandler(object):
 
                 if threshold_crossed:
                     if self.isLost(slice_index):
-                        self.status[slice_index] = self.lost_slice
+                        self.lost[slice_index] = True
                         continue
                     if not self.isRepairable(slice_index):
                         continue
@@ -961,11 +1123,13 @@ class EventHandler(object):
                         transfer_required += self.k - 1 + chunks_recovered
                     else:
                         if self.availableCount(slice_index) < self.n:
-                            try:
-                                index = self.status[slice_index].index(0)
-                            except ValueError:
+                            unavailable = self.blocks.unavailableMask(
+                                slice_index)
+                            if unavailable == 0:
                                 error_logger.error("No block crash in slice " + str(slice_index))
                                 continue
+                            # lowest block in state 0
+                            index = (unavailable & -unavailable).bit_length() - 1
                             rc = self.repair(slice_index, index)
                             transfer_required += rc
                             if self.durableCount(slice_index) != self.n:
@@ -976,10 +1140,8 @@ class EventHandler(object):
             u.setLastFailureTime(e.getTime())
 
     def handleSliceRecovery(self, slice_index, e, is_durable_failure):
-        if self.status[slice_index] == self.lost_slice:
-            if slice_index in self.unavailable_slice_durations.keys() and \
-                len(self.unavailable_slice_durations[slice_index][-1]) == 1:
-                self.unavailable_slice_durations[slice_index][-1].append(e.getTime())
+        if self.lost[slice_index]:
+            self.unavailable_slice_durations.end(slice_index, e.getTime())
             return 0
 
         recovered = 0
@@ -223,6 +223,9 @@ class NormalEventHandler(object):
         return rc * self.conf.chunk_size
 
     def isRepairable(self, slice_index):
+        # status -100 means data lost
+        if isinstance(self.status[slice_index], int):
+            return False
         return self.drs_handler.isRepairable(self.status[slice_index])
 
     # corresponding slice is lost or not.
@@ -395,21 +398,22 @@ class NormalEventHandler(object):
         """
         print "********event info********"
         print "event ID: ", e.event_id
-        print "event type: ", e.getType()
+        print "event type: ", e.getTypeName()
         print "event unit: ", e.getUnit().toString()
         print "event Time: ", e.getTime()
         print "event next reovery time: ", e.next_recovery_time
         """
-        if e.getType() == Event.EventType.Failure:
+        t = e.getType()
+        if t == Event.EventType.Failure:
             self.handleFailure(e.getUnit(), e.getTime(), e, queue)
-        elif e.getType() == Event.EventType.Recovered:
+        elif t == Event.EventType.Recovered:
             self.handleRecovery(e.getUnit(), e.getTime(), e)
-        elif e.getType() == Event.EventType.LatentDefect:
+        elif t == Event.EventType.LatentDefect:
             self.handleLatentDefect(e.getUnit(), e.getTime(), e)
-        elif e.getType() == Event.EventType.LatentRecovered:
+        elif t == Event.EventType.LatentRecovered:
             self.handleLatentRecovered(e.getUnit(), e.getTime(), e)
         else:
-            raise Exception("Unknown event: " + e.getType())
+            raise Exception("Unknown event: " + str(t))
 
     def handleFailure(self, u, time, e, queue):
         if e.ignore:
@@ -736,12 +740,12 @@ class NormalEventHandler(object):
         data_loss_prob = format(float(self.undurable_slice_count)/self.total_slices, ".4e")
         unavailable_prob = self.calUnavailProb()
 
-        Result.undurable_count = self.undurable_slice_count
-        Result.unavailable_durations = self.unavailable_durations
-        Result.data_loss_prob = data_loss_prob
-        Result.unavailable_prob = unavailable_prob
+        ret.undurable_count = self.undurable_slice_count
+        ret.unavailable_durations = self.unavailable_durations
+        ret.data_loss_prob = data_loss_prob
+        ret.unavailable_prob = unavailable_prob
         # repair bandwidth in GBs
-        Result.total_repair_transfers = format(float(self.total_repair_transfers)/1024, ".4e")
+        ret.total_repair_transfers = format(float(self.total_repair_transfers)/1024, ".4e")
 
         info_logger.info(
             "anomalous available count: %d, total latent failure: %d,\
@@ -1,7 +1,6 @@
 from numpy import inf
 from math import ceil
 from enum  import Enum
-from random import sample
 
 from simulator.Log import info_logger, error_logger
 from simulator.Event import Event
@@ -13,7 +12,6 @@ from simulator.eventHandler.EventHandler import EventHandler
 
 
 class FailedSlice(object):
-    intervals = []
 
     class RAFITransition(Enum):
           OutToOut = 0
@@ -55,7 +53,8 @@ class FailedSlice(object):
 
         return flag  # and not self.timeout
 
-    def check(self, ts):
+    # intervals: detect intervals, indexed by the number of failed blocks
+    def check(self, ts, intervals):
         recover_intervals = []
         origin_timeout = self.timeout
         for et in self.end_time:
@@ -65,7 +64,7 @@ class FailedSlice(object):
             recover_intervals.append(et - ts)
 
         self.timeout = True
-        threshold = FailedSlice.intervals[self.failedNum()]
+        threshold = intervals[self.failedNum()]
         for item in recover_intervals:
             if item < threshold:
                 self.timeout = False
@@ -82,37 +81,49 @@ class FailedSlice(object):
 
 
 class UnfinishRAFIEvents(object):
-    queue = None
-    events = []
-    event_id = 0
+    """
+    Pending RAFI recovery events, indexed by the slices they hold. An event
+    whose slices have all moved to newer events is cancelled in the queue.
+    """
+
+    def __init__(self):
+        self.queue = None
+        self.events = set()
+        # slice index -> pending events holding the slice
+        self.slice_events = {}
+        self.event_id = 0
 
     def addEvent(self, slices, ts):
-        s = SliceSet("SliceSet-RAFI"+str(UnfinishRAFIEvents.event_id), slices)
-        UnfinishRAFIEvents.event_id += 0
+        s = SliceSet("SliceSet-RAFI"+str(self.event_id), slices)
+        self.event_id += 0
         event = Event(Event.EventType.RAFIRecovered, ts, s)
-        UnfinishRAFIEvents.events.append(event)
-        UnfinishRAFIEvents.queue.addEvent(event)
+        for slice_index in slices:
+            self.slice_events.setdefault(slice_index, []).append(event)
+        self.events.add(event)
+        self.queue.addEvent(event)
 
     def updateEvent(self, slices, ts):
-        slices_to_event = self.indexBySlices()
-        all_slices = slices_to_event.keys()
-
-        for s in slices:
-            for item in all_slices:
-                if s in item:
-                    event = slices_to_event[item]
-                    u = event.getUnit()
-                    u.slices.remove(slice_index)
+        for slice_index in slices:
+            for event in self.slice_events.pop(slice_index, []):
+                u = event.getUnit()
+                u.removeSlice(slice_index)
+                if u.slices == []:
+                    self.events.remove(event)
+                    self.queue.remove(event)
 
         self.addEvent(slices, ts)
 
     def removeEvent(self, event):
-        UnfinishRAFIEvents.events.remove(event)
-        # UnfinishRAFIEvents.queue.remove(event)
+        for slice_index in event.getUnit().slices:
+            slice_events = self.slice_events[slice_index]
+            slice_events.remove(event)
+            if slice_events == []:
+                self.slice_events.pop(slice_index)
+        self.events.discard(event)
 
     def indexByTime(self):
         res = {}
-        for event in events:
+        for event in self.events:
             ts = event.getTime()
             event_list = res.pop(ts, [])
             event_list.append(event)
@@ -122,9 +133,8 @@ class UnfinishRAFIEvents(object):
 
     def indexBySlices(self):
         res = {}
-        for event in events:
-            slices = event.getUnit().slices
-            res[tuple(slices)] = event
+        for slice_index, events in self.slice_events.iteritems():
+            res[slice_index] = list(events)
 
         return res
 
@@ -140,16 +150,20 @@ class RAFIEventHandler(EventHandler):
         self.node_state_check = 0.25
         self.detect_intervals = self.conf.detect_intervals
         self._my_assert(len(self.detect_intervals) == self.n - self.k)
-        FailedSlice.intervals = self.detect_intervals
 
         self.failed_slices = {}
         self.unfinished_rafi_events = UnfinishRAFIEvents()
 
+    # RAFI events are scheduled per failed unit, so failures are handled
+    # one event at a time.
+    def batchable(self, e):
+        return False
+
     def handleFailure(self, u, time, e, queue):
         if e.ignore:
             return
 
-        UnfinishRAFIEvents.queue = queue
+        self.unfinished_rafi_events.queue = queue
         outtoin_slices = {}
         intoin_slices = {}
 
@@ -177,7 +191,7 @@ class RAFIEventHandler(EventHandler):
                 for slice_index in slice_indexes:
                     if slice_index >= self.total_slices:
                         continue
-                    if self.status[slice_index] == self.lost_slice:
+                    if self.lost[slice_index]:
                         continue
 
                     if e.info == 3:
@@ -186,24 +200,21 @@ class RAFIEventHandler(EventHandler):
                         self.sliceDegradedAvailability(slice_index)
 
                     repairable_before = self.isRepairable(slice_index)
-                    index = self.slice_locations[slice_index].index(child)
-                    if self.status[slice_index][index] == -1:
+                    index = child.chunk_positions[slice_index]
+                    if self.chunkState(slice_index, index) == -1:
                         continue
                     if e.info == 3:
-                        self.status[slice_index][index] == -1
+                        self.setChunk(slice_index, index, -1)
                         self._my_assert(self.durableCount(slice_index) >= 0)
                     else:
-                        if self.status[slice_index][index] == 1:
-                            self.status[slice_index][index] = 0
+                        if self.chunkState(slice_index, index) == 1:
+                            self.setChunk(slice_index, index, 0)
                         self._my_assert(self.availableCount(slice_index) >= 0)
 
                     repairable_current = self.isRepairable(slice_index)
                     if repairable_before and not repairable_current:
                         self.unavailable_slice_count += 1
-                        if slice_index in self.unavailable_slice_durations.keys():
-                            self.unavailable_slice_durations[slice_index].append([time])
-                        else:
-                            self.unavailable_slice_durations[slice_index] = [[time]]
+                        self.unavailable_slice_durations.start(slice_index, time)
 
                     # rafi start
                     unavailable = self.n - self.availableCount(slice_index)
@@ -211,7 +222,7 @@ class RAFIEventHandler(EventHandler):
                     fs.addInfo(time, e.next_recovery_time)
                     self.failed_slices[slice_index] = fs
 
-                    rafi_flag = fs.check(time)
+                    rafi_flag = fs.check(time, self.detect_intervals)
                     # slice from not in rafi event to in a rafi event
                     if rafi_flag == FailedSlice.RAFITransition.OutToIn:
                         outtoin_slices[slice_index] = fs
@@ -228,9 +239,7 @@ class RAFIEventHandler(EventHandler):
                                 "time: " + str(time) + " slice:" + str(slice_index) +
                                 " durCount:" + str(self.durableCount(slice_index)) +
                                 " due to machine " + str(u.getID()))
-                            self.status[slice_index] = self.lost_slice
-                            self.undurable_slice_count += 1
-                            self.undurable_slice_infos.append((slice_index, time, "machine "+ str(u.getID())))
+                            self.slicesLost(slice_index, time, "machine " + str(u.getID()))
                             continue
 
             outtoin_slice_indexes = outtoin_slices.keys()
@@ -274,35 +283,30 @@ class RAFIEventHandler(EventHandler):
             for slice_index in slice_indexes:
                 if slice_index >= self.total_slices:
                     continue
-                if self.status[slice_index] == self.lost_slice:
+                if self.lost[slice_index]:
                     continue
 
                 self.sliceDegraded(slice_index)
                 repairable_before = self.isRepairable(slice_index)
 
-                index = self.slice_locations[slice_index].index(u)
-                if self.status[slice_index][index] == -1:
+                index = u.chunk_positions[slice_index]
+                if self.chunkState(slice_index, index) == -1:
                     continue
-                self.status[slice_index][index] = -1
+                self.setChunk(slice_index, index, -1)
 
                 self._my_assert(self.durableCount(slice_index) >= 0)
 
                 repairable_current = self.isRepairable(slice_index)
                 if repairable_before and not repairable_current:
                     self.unavailable_slice_count += 1
-                    if slice_index in self.unavailable_slice_durations.keys():
-                        self.unavailable_slice_durations[slice_index].append([time])
-                    else:
-                        self.unavailable_slice_durations[slice_index] = [[time]]
+                    self.unavailable_slice_durations.start(slice_index, time)
 
                 if self.isLost(slice_index):
                     info_logger.info(
                         "time: " + str(time) + " slice:" + str(slice_index) +
                         " durCount:" + str(self.durableCount(slice_index)) +
                         " due to disk " + str(u.getID()))
-                    self.status[slice_index] = self.lost_slice
-                    self.undurable_slice_count += 1
-                    self.undurable_slice_infos.append((slice_index, time, "disk "+ str(u.getID())))
+                    self.slicesLost(slice_index, time, "disk " + str(u.getID()))
                     continue
         else:
             for child in u.getChildren():
@@ -343,7 +347,7 @@ class RAFIEventHandler(EventHandler):
                 else:
                     num = self.conf.drs_handler.k
 
-                chosen_racks = sample(all_racks, queue_rack_count)
+                chosen_racks = self.random.sample(all_racks, queue_rack_count)
                 recovery_time = self.contention_model.occupy(node_repair_start, chosen_racks, num, node_repair_time)
                 recovery_event = Event(Event.EventType.Recovered, recovery_time, u, 4)
                 queue.addEvent(recovery_event)
@@ -351,15 +355,19 @@ class RAFIEventHandler(EventHandler):
                 self.total_machine_repairs += 1
 
                 disks = u.getChildren()
+                # chunks lost with a permanent machine failure are repaired
+                # as those of failed disks
+                if e.info == 3 or e.info == 4:
+                    for disk in disks:
+                        self.repairDisk(disk, time)
+                    return
                 for disk in disks:
                     slice_indexes = disk.getChildren()
                     for slice_index in slice_indexes:
                         if slice_index >= self.total_slices:
                             continue
-                        if self.status[slice_index] == self.lost_slice:
-                            if slice_index in self.unavailable_slice_durations.keys() and \
-                                len(self.unavailable_slice_durations[slice_index][-1]) == 1:
-                                self.unavailable_slice_durations[slice_index][-1].append(time)
+                        if self.lost[slice_index]:
+                            self.unavailable_slice_durations.end(slice_index, time)
                             continue
 
                         delete_flag = True
@@ -373,14 +381,14 @@ class RAFIEventHandler(EventHandler):
                             if self.availableCount(slice_index) < self.n:
                                 repairable_before = self.isRepairable(slice_index)
 
-                                index = self.slice_locations[slice_index].index(disk)
-                                if self.status[slice_index][index] == 0:
-                                    self.status[slice_index][index] = 1
+                                index = disk.chunk_positions[slice_index]
+                                if self.chunkState(slice_index, index) == 0:
+                                    self.setChunk(slice_index, index, 1)
                                 self.sliceRecoveredAvailability(slice_index)
 
                                 repairable_current = self.isRepairable(slice_index)
                                 if not repairable_before and repairable_current:
-                                    self.unavailable_slice_durations[slice_index][-1].append(time)
+                                    self.unavailable_slice_durations.end(slice_index, time)
                             elif e.info == 1:  # temp & short failure
                                 self.anomalous_available_count += 1
                             else:
@@ -410,88 +418,91 @@ class RAFIEventHandler(EventHandler):
                     num = self.conf.drs_handler.d
                 else:
                     num = self.conf.drs_handler.k
-                chosen_racks = sample(all_racks, queue_rack_count)
+                chosen_racks = self.random.sample(all_racks, queue_rack_count)
                 recovery_time = self.contention_model.occupy(disk_repair_start, chosen_racks, num, disk_repair_time)
                 recovery_event = Event(Event.EventType.Recovered, recovery_time, u, 4)
                 queue.addEvent(recovery_event)
                 return
 
             self.total_disk_repairs += 1
-            transfer_required = 0.0
-            slice_indexes = u.getChildren()
-            for slice_index in slice_indexes:
-                if slice_index >= self.total_slices:
-                    continue
-                if self.status[slice_index] == self.lost_slice:
-                    if slice_index in self.unavailable_slice_durations.keys() and \
-                        len(self.unavailable_slice_durations[slice_index][-1]) == 1:
-                        self.unavailable_slice_durations[slice_index][-1].append(time)
-                    continue
-                if not self.isRepairable(slice_index):
-                    continue
+            self.repairDisk(u, time)
+        else:
+            for child in u.getChildren():
+                self.handleRecovery(child, time, e, queue)
 
-                if slice_index in failed_slice_indexes:
-                    fs = self.failed_slices[slice_index]
-                    delete_flag = fs.delete(time)
-                    if delete_flag:
-                        self.failed_slices.pop(slice_index)
-                    else:
-                        continue
+    # Repair of the lost chunks on disk, for the slices not left to a RAFI
+    # recovery. A slice with chunks on several disks of a machine leaves
+    # failed_slices with the first of them.
+    def repairDisk(self, disk, time):
+        transfer_required = 0.0
+        slice_indexes = disk.getChildren()
+        for slice_index in slice_indexes:
+            if slice_index >= self.total_slices:
+                continue
+            if self.lost[slice_index]:
+                self.unavailable_slice_durations.end(slice_index, time)
+                continue
+            if not self.isRepairable(slice_index):
+                continue
 
-                threshold_crossed = False
+            if slice_index in self.failed_slices:
+                fs = self.failed_slices[slice_index]
+                delete_flag = fs.delete(time)
+                if delete_flag:
+                    self.failed_slices.pop(slice_index)
+                else:
+                    continue
+
+            threshold_crossed = False
+            actual_threshold = self.recovery_threshold
+            if self.conf.lazy_only_available:
+                actual_threshold = self.n - 1
+            if self.current_slice_degraded < self.conf.max_degraded_slices*self.total_slices:
                 actual_threshold = self.recovery_threshold
-                if self.conf.lazy_only_available:
-                    actual_threshold = self.n - 1
-                if self.current_slice_degraded < self.conf.max_degraded_slices*self.total_slices:
-                    actual_threshold = self.recovery_threshold
 
-                if self.durableCount(slice_index) <= actual_threshold:
+            if self.durableCount(slice_index) <= actual_threshold:
+                threshold_crossed = True
+
+            if self.availability_counts_for_recovery:
+                if self.availableCount(slice_index) <= actual_threshold:
                     threshold_crossed = True
 
-                if self.availability_counts_for_recovery:
-                    if self.availableCount(slice_index) <= actual_threshold:
-                        threshold_crossed = True
-
-                if threshold_crossed:
-                    index = self.slice_locations[slice_index].index(u)
-                    if self.status[slice_index][index] == -1 or self.status[slice_index][index] == -2:
-                        repairable_before = self.isRepairable(slice_index)
-
-                        # if self.lazy_recovery or self.parallel_repair:
-                        rc = self.parallelRepair(slice_index, True)
-                        # else:
-                        #     rc = self.repair(slice_index, index)
-                        if slice_index in u.getSlicesHitByLSE():
-                            u.slices_hit_by_LSE.remove(slice_index)
-                        self.total_repairs += 1
-                        ratio = self.getRatio()
-                        transfer_required += rc * ratio
-                        self.total_repair_transfers += rc * ratio
-
-                    # must come after all counters are updated
-                    self.sliceRecovered(slice_index)
-        else:
-            for child in u.getChildren():
-                self.handleRecovery(child, time, e, queue)
+            if threshold_crossed:
+                index = disk.chunk_positions[slice_index]
+                state = self.chunkState(slice_index, index)
+                if state == -1 or state == -2:
+                    # if self.lazy_recovery or self.parallel_repair:
+                    rc = self.parallelRepair(slice_index, True)
+                    # else:
+                    #     rc = self.repair(slice_index, index)
+                    if slice_index in disk.getSlicesHitByLSE():
+                        disk.slices_hit_by_LSE.remove(slice_index)
+                    self.total_repairs += 1
+                    ratio = self.getRatio()
+                    transfer_required += rc * ratio
+                    self.total_repair_transfers += rc * ratio
+
+                # must come after all counters are updated
+                self.sliceRecovered(slice_index)
+        return transfer_required
 
     # def handleEagerRecoveryStart(self, u, time, e, queue):
     #     return
 
     def handleRAFIRecovery(self, u, time, e, queue):
         if e.ignore:
+            self.unfinished_rafi_events.removeEvent(e)
             return
 
         slices = u.slices
         transfer_required = 0.0
-        UnfinishRAFIEvents.queue = queue
+        self.unfinished_rafi_events.queue = queue
         for slice_index in slices:
-            if self.status[slice_index] == self.lost_slice:
-                if slice_index in self.unavailable_slice_durations.keys() and \
-                    len(self.unavailable_slice_durations[slice_index][-1]) == 1:
-                    self.unavailable_slice_durations[slice_index][-1].append(time)
+            if self.lost[slice_index]:
+                self.unavailable_slice_durations.end(slice_index, time)
                 continue
             if self.isLost(slice_index):
-                self.status[slice_index] = self.lost_slice
+                self.lost[slice_index] = True
                 continue
             if not self.isRepairable(slice_index):
                 continue
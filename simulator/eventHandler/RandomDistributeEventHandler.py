@@ -334,8 +334,8 @@ class RandomDistributeEventHandler(EventHandler):
 
     def end(self):
         ret = Result()
-        Result.unavailable_count = self.unavailable_slice_count
-        Result.undurable_count = self.undurable_slice_count
+        ret.unavailable_count = self.unavailable_slice_count
+        ret.undurable_count = self.undurable_slice_count
 
         info_logger.info(
             "anomalous available count: %d, total latent failure: %d,\
@@ -381,28 +381,29 @@ class RandomDistributeEventHandler(EventHandler):
     def handleEvent(self, e, queue):
         # print "********event info********"
         # print "event ID: ", e.event_id
-        # print "event type: ", e.getType()
+        # print "event type: ", e.getTypeName()
         # print "event unit: ", e.getUnit().getFullName()
         # print "event Time: ", e.getTime()
         # print "event next reovery time: ", e.next_recovery_time
-        if e.getType() == Event.EventType.Failure:
+        t = e.getType()
+        if t == Event.EventType.Failure:
             self.handleFailure(e.getUnit(), e.getTime(), e, queue)
-        elif e.getType() == Event.EventType.Recovered:
+        elif t == Event.EventType.Recovered:
             self.handleRecovery(e.getUnit(), e.getTime(), e)
-        elif e.getType() == Event.EventType.EagerRecoveryStart:
+        elif t == Event.EventType.EagerRecoveryStart:
             self.handleEagerRecoveryStart(e.getUnit(), e.getTime(), e, queue)
-        elif e.getType() == Event.EventType.EagerRecoveryInstallment:
+        elif t == Event.EventType.EagerRecoveryInstallment:
             self.handleEagerRecoveryInstallment(e.getUnit(), e.getTime(), e)
-        elif e.getType() == Event.EventType.LatentDefect:
+        elif t == Event.EventType.LatentDefect:
             self.handleLatentDefect(e.getUnit(), e.getTime(), e)
-        elif e.getType() == Event.EventType.LatentRecovered:
+        elif t == Event.EventType.LatentRecovered:
             self.handleLatentRecovered(e.getUnit(), e.getTime(), e)
-        elif e.getType() == Event.EventType.ScrubStart:
+        elif t == Event.EventType.ScrubStart:
             self.handleScrubStart(e.getUnit(), e.getTime(), e)
-        elif e.getType() == Event.EventType.ScrubComplete:
+        elif t == Event.EventType.ScrubComplete:
             self.handleScrubComplete(e.getUnit(), e.getTime(), e)
         else:
-            raise Exception("Unknown event: " + e.getType())
+            raise Exception("Unknown event: " + str(t))
 
     def computeHistogramBool(self, data, what):
         histogram = [0, 0]
@@ -1,8 +1,16 @@
+import random as random_module
 from abc import ABCMeta, abstractmethod
 
+import numpy.random
+from numpy import array, empty
+
 
 class EventGenerator:
     __metaclass__ = ABCMeta
+    # streams drawn from (see simulator.Seeds): random.Random-like for
+    # scalar draws, RandomState-like for bulk ones
+    random = random_module
+    array_random = numpy.random
 
     @abstractmethod
     def __init__(self, name, parameters):
@@ -12,6 +20,37 @@ class EventGenerator:
     def generateNextEvent(self, current_time):
         raise NotImplementedError
 
+    def setRandom(self, random, array_random):
+        self.random = random
+        self.array_random = array_random
+
+    # n successive events from current_time on, each one generated from the
+    # previous one, as an array. Generators with a closed form for the chain
+    # override this and generateUntil.
+    def generateEvents(self, current_time, n):
+        events = empty(n)
+        for i in xrange(n):
+            current_time = self.generateNextEvent(current_time)
+            events[i] = current_time
+        return events
+
+    # the next event after each of current_times, every one generated on its
+    # own rather than chained, as an array
+    def nextEvents(self, current_times):
+        return array([self.generateNextEvent(current_time)
+                      for current_time in current_times], dtype=float)
+
+    # successive events from current_time on which are not later than
+    # end_time, as an array
+    def generateUntil(self, current_time, end_time):
+        events = []
+        while True:
+            current_time = self.generateNextEvent(current_time)
+            if current_time > end_time:
+                break
+            events.append(current_time)
+        return array(events, dtype=float)
+
     @abstractmethod
     def reset(self, current_time):
         raise NotImplementedError
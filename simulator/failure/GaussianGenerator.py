@@ -1,5 +1,3 @@
-from numpy.random import randn
-
 from simulator.failure.EventGenerator import EventGenerator
 
 
@@ -28,7 +26,7 @@ class GaussianGenerator(EventGenerator):
 
         next_val = 0.0
         while next_val < self.minval:
-            next_val = randn()*self.stddev + self.mean
+            next_val = self.array_random.randn()*self.stddev + self.mean
 
         if next_val < 0:
             raise Exception("Negative value generated!")
@@ -1,5 +1,7 @@
 from math import ceil
 
+from numpy import ceil as ceil_array
+
 from simulator.failure.EventGenerator import EventGenerator
 
 
@@ -24,3 +26,6 @@ class Period(EventGenerator):
 
     def generateNextEvent(self, current_time):
         return ceil(current_time/self.gamma) * self.gamma
+
+    def nextEvents(self, current_times):
+        return ceil_array(current_times/self.gamma) * self.gamma
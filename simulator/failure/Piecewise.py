@@ -1,4 +1,3 @@
-from random import random
 from copy import deepcopy
 
 from simulator.failure.EventGenerator import EventGenerator
@@ -22,8 +21,8 @@ class Piecewise(EventGenerator):
         return 0
 
     def generateNextEvent(self, current_time):
-        index = random()
-        rang = random()
+        index = self.random.random()
+        rang = self.random.random()
 
         for i in xrange(len(Piecewise.values)):
             if index >= Piecewise.intervals[i] and \
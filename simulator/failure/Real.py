@@ -1,5 +1,3 @@
-from random import uniform
-
 from simulator.failure.EventGenerator import EventGenerator
 
 
@@ -25,4 +23,4 @@ class Real(EventGenerator):
         return 0
 
     def generateNextEvent(self, current_time):
-        return current_time + uniform(0, self.gamma) + self.lamda
+        return current_time + self.random.uniform(0, self.gamma) + self.lamda
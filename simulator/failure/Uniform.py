@@ -1,5 +1,3 @@
-from numpy.random import randint
-
 from simulator.failure.EventGenerator import EventGenerator
 
 
@@ -19,4 +17,4 @@ class Uniform(EventGenerator):
         return 0
 
     def generateNextEvent(self, current_time):
-        return current_time + float(randint(self.frequency*1000))/1000.0
+        return current_time + float(self.array_random.randint(self.frequency*1000))/1000.0
@@ -1,6 +1,6 @@
-from math import exp, log
-from numpy import isnan, isinf
-from random import random
+from math import exp, log, sqrt
+from numpy import isnan, isinf, isfinite, cumsum, power, empty, concatenate, \
+    asarray
 
 from simulator.failure.EventGenerator import EventGenerator
 
@@ -8,13 +8,27 @@ from simulator.failure.EventGenerator import EventGenerator
 class WeibullGenerator(EventGenerator):
     """
     Weibull Distribution.
+
+    The next event after t is drawn from the residual life at t: with the
+    cumulative hazard H(t) = (t/lamda)^beta since the reset point, the event
+    has hazard H(t) + E, E ~ Exp(1), which is the inverse CDF conditioned on
+    surviving t without evaluating F. H is cached for the last time it was
+    taken at, the reset point for nearly every draw, and beta == 1 (the
+    exponential distribution, memoryless) needs no powers at all.
+
+    With gamma == 0, successive events drawn from a fixed start time make a
+    Poisson process whose cumulative hazard is (t/lamda)^beta: every event
+    adds an Exp(1) increment to the hazard of the previous one, so chains of
+    events are sampled in bulk by inverting the running sums.
     """
     def __init__(self, name, parameters):
         self.name = name
         self.gamma = float(parameters['gamma'])
         self.lamda = float(parameters['lamda'])
         self.beta = float(parameters['beta'])
-        self.start_time = 0
+        self.inverse_beta = 1.0/self.beta
+        self.exponential = self.beta == 1
+        self.reset(0)
 
     def getName(self):
         return self.name
@@ -24,6 +38,9 @@ class WeibullGenerator(EventGenerator):
 
     def reset(self, current_time):
         self.start_time = current_time
+        # time the cumulative hazard was last taken at, and its value
+        self.hazard_time = current_time
+        self.hazard_value = 0.0
 
     def getRate(self):
         return self.lamda
@@ -31,17 +48,23 @@ class WeibullGenerator(EventGenerator):
     def F(self, current_time):
         return 1 - exp(-pow((current_time/self.lamda), self.beta))
 
-    def generateNextEvent(self, current_time):
-        current_time -= self.start_time
-        if current_time < 0:
-            print "current_time in weibull:", current_time
-            print "start_time: ", self.start_time
-            raise Exception("Negative current time!")
+    # time since the reset point
+    def age(self, current_time):
+        age = current_time - self.start_time
+        if age < 0:
+            raise Exception("Negative current time! current_time: %s, "
+                            "start_time: %s" % (current_time, self.start_time))
+        return age
 
-        r = random()
-        R = (1 - self.F(current_time)) * r + self.F(current_time)
-        result = self.lamda*pow(-log(1.0-R), 1.0/self.beta) + \
-            self.gamma+self.start_time
+    def generateNextEvent(self, current_time):
+        if self.exponential:
+            result = self.lamda*self.residualHazard() + self.gamma + \
+                self.start_time + self.age(current_time)
+        else:
+            hazard = self.hazard(current_time)
+            result = self.lamda*pow(hazard + self.residualHazard(),
+                                    self.inverse_beta) + \
+                self.gamma + self.start_time
 
         if isinf(result) or isnan(result):
             raise Exception("Generated time is Inf or NaN")
@@ -49,6 +72,89 @@ class WeibullGenerator(EventGenerator):
             raise Exception("Generated time is negative")
         return result
 
+    # Exp(1) hazard left until the next event, -log(1-r) being the inverse
+    # CDF of a uniform draw r
+    def residualHazard(self):
+        return -log(1.0 - self.random.random())
+
+    # the next event after each of current_times, drawn at once
+    def nextEvents(self, current_times):
+        ages = asarray(current_times, dtype=float) - self.start_time
+        if (ages < 0).any():
+            raise Exception("Negative current time!")
+        residuals = self.array_random.standard_exponential(len(ages))
+        if self.exponential:
+            result = self.lamda*residuals + self.gamma + self.start_time + \
+                ages
+        else:
+            result = self.lamda*power(power(ages/self.lamda, self.beta) +
+                                      residuals, self.inverse_beta) + \
+                self.gamma + self.start_time
+        if not isfinite(result).all():
+            raise Exception("Generated time is Inf or NaN")
+        if (result < 0).any():
+            raise Exception("Generated time is negative")
+        return result
+
+    # cumulative hazard at current_time
+    def hazard(self, current_time):
+        if current_time != self.hazard_time:
+            age = self.age(current_time)
+            self.hazard_value = pow(age/self.lamda, self.beta)
+            self.hazard_time = current_time
+        return self.hazard_value
+
+    # event times of the given cumulative hazards
+    def eventTimes(self, hazards):
+        if self.exponential:
+            result = self.lamda*hazards + self.start_time
+        else:
+            result = self.lamda*power(hazards, self.inverse_beta) + \
+                self.start_time
+        if not isfinite(result).all():
+            raise Exception("Generated time is Inf or NaN")
+        if (result < 0).any():
+            raise Exception("Generated time is negative")
+        return result
+
+    def generateEvents(self, current_time, n):
+        if self.exponential:
+            # memoryless, every event is gamma plus an exponential wait
+            # after the previous one
+            self.age(current_time)
+            return current_time + cumsum(
+                self.lamda*self.array_random.standard_exponential(n) +
+                self.gamma)
+        if self.gamma != 0:
+            return super(WeibullGenerator, self).generateEvents(current_time,
+                                                                n)
+        hazard = self.hazard(current_time)
+        return self.eventTimes(hazard + cumsum(
+            self.array_random.standard_exponential(n)))
+
+    def generateUntil(self, current_time, end_time):
+        if self.gamma != 0:
+            return super(WeibullGenerator, self).generateUntil(current_time,
+                                                               end_time)
+        hazard = self.hazard(current_time)
+        if end_time < self.start_time:
+            return empty(0)
+        end_hazard = pow((end_time - self.start_time)/self.lamda, self.beta)
+
+        chunks = []
+        while hazard <= end_hazard:
+            # the number of events left is Poisson(expected), draw a few
+            # standard deviations more than that at once
+            expected = end_hazard - hazard
+            hazards = hazard + cumsum(self.array_random.standard_exponential(
+                int(expected + 3*sqrt(expected)) + 1))
+            events = self.eventTimes(hazards)
+            chunks.append(events[events <= end_time])
+            hazard = hazards[-1]
+        if chunks == []:
+            return empty(0)
+        return concatenate(chunks)
+
 
 def main():
     w = WeibullGenerator("wei", {'gamma': 0.02, 'lamda': 0.03, 'beta': 1})
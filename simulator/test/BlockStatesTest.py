@@ -0,0 +1,101 @@
+import unittest
+from random import Random
+
+from numpy import array, int32, int8, uint32, uint64
+
+from simulator.BlockStates import blockStates, maskType, MaskBlockStates, \
+    MatrixBlockStates, CheckedBlockStates
+
+
+class BlockStatesTest(unittest.TestCase):
+    """
+    The mask backend against the matrix backend recounting its rows: random
+    chunk changes go to both through CheckedBlockStates, which raises as
+    soon as a lookup differs, and the states are compared with a plain list
+    model after every step.
+    """
+
+    def run_changes(self, n, seed, total_slices=20, steps=400):
+        states = CheckedBlockStates(MaskBlockStates(total_slices, n),
+                                    MatrixBlockStates(total_slices, n, True))
+        model = [[1] * n for i in xrange(total_slices)]
+        rnd = Random(seed)
+        slices = array(range(total_slices), dtype=int32)
+        for step in xrange(steps):
+            op = rnd.random()
+            chunk_slices = array([rnd.randrange(total_slices)
+                                  for i in xrange(8)], dtype=int32)
+            positions = array([rnd.randrange(n) for i in xrange(8)],
+                              dtype=int8)
+            chunks = sorted(set(zip(chunk_slices.tolist(),
+                                    positions.tolist())))
+            chunk_slices = array([c[0] for c in chunks], dtype=int32)
+            positions = array([c[1] for c in chunks], dtype=int8)
+            if op < 0.3:
+                s, i = chunks[0]
+                state = rnd.choice([1, 0, -1, -2])
+                states.setChunk(s, i, state)
+                model[s][i] = state
+            elif op < 0.6:
+                durable = rnd.random() < 0.3
+                states.failChunks(chunk_slices, positions, durable)
+                for s, i in chunks:
+                    if durable:
+                        model[s][i] = -1
+                    elif model[s][i] == 1:
+                        model[s][i] = 0
+            else:
+                states.restoreChunks(chunk_slices, positions)
+                for s, i in chunks:
+                    if model[s][i] == 0:
+                        model[s][i] = 1
+            states.check(slices)
+
+            for s in xrange(total_slices):
+                self.assertEqual(states.sliceState(s), model[s])
+                erased = sum(1 << i for i in xrange(n) if model[s][i] != 1)
+                self.assertEqual(states.erasedMask(s), erased)
+                self.assertEqual(states.durableCount(s),
+                                 sum(1 for b in model[s] if b >= 0))
+            states.erasedMasks(slices)
+            states.availableCounts(slices)
+            states.durableCounts(slices)
+            states.chunkStates(chunk_slices, positions)
+
+    def test_small(self):
+        self.run_changes(9, 1)
+
+    def test_32_bits(self):
+        self.run_changes(32, 2)
+
+    def test_64_bits(self):
+        self.run_changes(40, 3)
+        self.run_changes(64, 4)
+
+    def test_mismatch(self):
+        states = blockStates("masks", 10, 9, True)
+        states.failChunks(array([3], dtype=int32), array([2], dtype=int8),
+                          False)
+        # a change which only reaches the masks
+        states.states.disk_lost[3] |= 1
+        self.assertRaises(Exception, states.lostMask, 3)
+        self.assertRaises(Exception, states.check, array([3], dtype=int32))
+
+    def test_mask_types(self):
+        self.assertEqual(maskType(32), uint32)
+        self.assertEqual(maskType(33), uint64)
+        self.assertRaises(Exception, maskType, 65)
+        self.assertRaises(Exception, blockStates, "masks", 10, 65)
+        self.assertRaises(Exception, blockStates, "bits", 10, 9)
+
+    def test_kinds(self):
+        self.assertTrue(isinstance(blockStates("masks", 10, 9),
+                                   MaskBlockStates))
+        self.assertTrue(isinstance(blockStates("matrix", 10, 9),
+                                   MatrixBlockStates))
+        self.assertTrue(isinstance(blockStates("masks", 10, 9, True),
+                                   CheckedBlockStates))
+
+
+if __name__ == "__main__":
+    unittest.main()
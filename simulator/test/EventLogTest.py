@@ -0,0 +1,169 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from numpy import array, array_equal
+
+from simulator.Event import Event, EventBatch
+from simulator.EventLog import EventLogWriter, EventLogReader
+from simulator.Simulation import Simulation
+from simulator.unit.Unit import Unit
+from simulator.unit.Rack import Rack
+from simulator.unit.Machine import Machine
+
+# a small seeded system, events printed to or replayed from a file
+CONF = """[DEFAULT]
+total_time = 2000
+total_active_storage = 0.002
+chunk_size = 256
+disk_capacity = 2
+disks_per_machine = 3
+machines_per_rack = 4
+rack_count = 10
+data_redundancy = RS_9_6
+data_placement = sss
+hierarchical = false
+event_file = %s
+event_file_format = binary
+replay_file = %s
+seed = 1
+queue_disable = true
+bandwidth_contention = FIFO
+node_bandwidth = 9000000
+recovery_bandwidth_cross_rack = 90000
+availability_counts_for_recovery = true
+lazy_recovery = false
+recovery_threshold = 14
+max_degraded_slices = 0.1
+installment_size = 1000
+availability_to_durability_threshold = 0,1,10000
+recovery_probability = 0,0
+outputs = DL,UNA,RB
+"""
+
+
+# root.dc.rack0 with machine0..machine3, units get new ids on every call
+def topology():
+    root = Unit("root", None, {})
+    dc = Unit("dc", root, {})
+    root.addChild(dc)
+    rack = Rack("rack0", dc, {})
+    dc.addChild(rack)
+    for i in xrange(4):
+        rack.addChild(Machine("machine" + str(i), rack, {}))
+    return root
+
+
+class EventLogTest(unittest.TestCase):
+    """
+    Events written by EventLogWriter and read back through the memory map
+    of EventLogReader.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.dir, "events")
+        self.root = topology()
+        self.rack = self.root.getChildren()[0].getChildren()[0]
+        machines = self.rack.getChildren()
+        self.batches = [
+            EventBatch([Event.EventType.Failure, Event.EventType.Recovered],
+                       [machines[0].getID(), machines[0].getID()],
+                       [1.5, 2.5], [2.5, 0], [1, -100], [False, False]),
+            EventBatch([Event.EventType.Failure] * 3,
+                       [machines[1].getID(), self.rack.getID(),
+                        machines[3].getID()],
+                       [2.5, 7.0, 9.25], [8.0, 10.0, 12.0], [3, 0, 2],
+                       [False, True, False])]
+
+        writer = EventLogWriter(self.file_name, "test log",
+                                self.root.unitTable())
+        for batch in self.batches:
+            writer.append(batch)
+        writer.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def assertBatchEqual(self, batch, expected):
+        for field in ("types", "unit_ids", "times", "next_recovery_times",
+                      "infos", "ignores"):
+            self.assertTrue(array_equal(getattr(batch, field),
+                                        getattr(expected, field)), field)
+
+    def test_round_trip(self):
+        reader = EventLogReader(self.file_name)
+        self.assertEqual(reader.message, "test log")
+        self.assertEqual(reader.size(), 5)
+        self.assertBatchEqual(reader.readAll(),
+                              EventBatch.concatenate(self.batches))
+        self.assertEqual(reader.units[self.rack.getID()], "rack0")
+
+    def test_time_range(self):
+        reader = EventLogReader(self.file_name)
+        batch = reader.timeRange(2.5, 9.25)
+        self.assertTrue(array_equal(batch.times, array([2.5, 2.5, 7.0])))
+        self.assertEqual(reader.timeRange(20, 30).size(), 0)
+
+    def test_resolve_units(self):
+        reader = EventLogReader(self.file_name)
+        # same names, other ids
+        root = topology()
+        units = reader.resolveUnits(root)
+        events = list(reader.readAll().toEvents(units))
+        self.assertEqual([e.getUnit().toString() for e in events],
+                         ["rack0.machine0", "rack0.machine0",
+                          "rack0.machine1", "rack0", "rack0.machine3"])
+        rack = root.getChildren()[0].getChildren()[0]
+        self.assertTrue(events[2].getUnit() is rack.getChildren()[1])
+        self.assertTrue(events[3].ignore)
+        self.assertEqual(events[4].next_recovery_time, 12.0)
+
+    def test_order(self):
+        writer = EventLogWriter(self.file_name, "", self.root.unitTable())
+        writer.append(self.batches[1])
+        self.assertRaises(Exception, writer.append, self.batches[0])
+        writer.close()
+
+    def test_empty(self):
+        EventLogWriter(self.file_name, "", self.root.unitTable()).close()
+        self.assertEqual(EventLogReader(self.file_name).size(), 0)
+
+
+class ReplayTest(unittest.TestCase):
+    """
+    A seeded run printing its events to a binary log, against a run
+    replaying that log.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def simulation(self, event_file, replay_file):
+        path = os.path.join(self.dir, "test.conf")
+        with open(path, "w") as fp:
+            fp.write(CONF % (event_file, replay_file))
+        return Simulation(path)
+
+    def test_replay(self):
+        event_file = os.path.join(self.dir, "events")
+        recorded = self.simulation(event_file, "")
+        expected = recorded.run()
+        replay_file = event_file + "-" + recorded.ts
+        self.assertEqual(EventLogReader(replay_file).size(),
+                         recorded.total_events_handled)
+
+        replayed = self.simulation("", replay_file)
+        result = replayed.run()
+        self.assertTrue(replayed.total_events_handled > 0)
+        self.assertEqual(replayed.total_events_handled,
+                         recorded.total_events_handled)
+        self.assertEqual(result.toString(), expected.toString())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,607 @@
+import os
+import shutil
+import tempfile
+import unittest
+from random import Random
+
+from numpy import isnan
+
+from simulator.Configuration import Configuration
+from simulator.Event import Event
+from simulator.EventQueue import EventQueue
+from simulator.eventHandler.EventHandler import EventHandler
+from simulator.eventHandler.RAFIEventHandler import RAFIEventHandler
+from simulator.unit.DataCenter import DataCenter
+from simulator.unit.Disk import Disk
+from simulator.unit.Layer import Layer
+from simulator.unit.Machine import Machine
+from simulator.unit.Rack import Rack
+
+SLICES = 120
+
+CONF = """[DEFAULT]
+total_time = 876
+total_active_storage = 1
+chunk_size = 256
+disk_capacity = 2
+disks_per_machine = 3
+machines_per_rack = 2
+rack_count = 4
+data_redundancy = RS_6_3
+data_placement = sss
+event_file =
+queue_disable = true
+bandwidth_contention = FIFO
+node_bandwidth = 9000000
+recovery_bandwidth_cross_rack = 90000
+availability_counts_for_recovery = %s
+lazy_recovery = %s
+lazy_only_available = true
+recovery_threshold = 4
+max_degraded_slices = 0.05
+installment_size = 1000
+availability_to_durability_threshold = 0,1,10000
+recovery_probability = 0,0
+outputs = DL,UNA,RB
+check_counters = true
+"""
+
+# eager, and lazy with the threshold depending on current_slice_degraded
+EAGER = ("true", "false")
+LAZY = ("false", "true")
+# detection far beyond the steps run, RAFI recoveries never start
+RAFI = "detect_intervals = 1000,1000,1000\n"
+
+
+def child(unit_class, name, parent):
+    unit = unit_class(name, parent, {})
+    parent.addChild(unit)
+    return unit
+
+
+# 4 racks of 2 machines of 3 disks
+def topology():
+    root = Layer("Layer", None, {})
+    dc = child(DataCenter, "datacenter0", root)
+    for r in xrange(4):
+        rack = child(Rack, "rack" + str(r), dc)
+        for m in xrange(2):
+            machine = child(Machine, "machine" + str(m), rack)
+            for d in xrange(3):
+                child(Disk, "disk" + str(d), machine)
+    return root
+
+
+def disksOf(unit):
+    if isinstance(unit, Disk):
+        return [unit]
+    disks = []
+    for c in unit.getChildren():
+        disks += disksOf(c)
+    return disks
+
+
+class Placement(object):
+    """
+    The part of a DataDistribute a handler uses: the chunks of every slice
+    on n distinct disks drawn at random, two chunks of a slice may share a
+    machine.
+    """
+
+    def __init__(self, conf, root, rnd):
+        self.conf = conf
+        self.root = root
+        self.n = conf.drs_handler.n
+        self.k = conf.drs_handler.k
+        disks = disksOf(root)
+        self.slice_locations = []
+        for slice_index in xrange(conf.total_slices):
+            locations = rnd.sample(disks, self.n)
+            for position, disk in enumerate(locations):
+                disk.addChild(slice_index, position)
+            self.slice_locations.append(locations)
+
+    def returnConf(self):
+        return self.conf
+
+    def returnCodingParameters(self):
+        return (self.n, self.k)
+
+    def returnSliceLocations(self):
+        return self.slice_locations
+
+    def getAllRacks(self):
+        return self.root.getChildren()[0].getChildren()
+
+
+class Reference(object):
+    """
+    Block states changed chunk by chunk, the way the handlers did before
+    failures and recoveries became array operations: status is a list of
+    block states per slice, lost_slice for a lost slice.
+    """
+
+    def __init__(self, handler, seed):
+        self.conf = handler.conf
+        self.drs_handler = handler.drs_handler
+        self.n = handler.n
+        self.k = handler.k
+        self.slice_locations = handler.slice_locations
+        self.total_slices = handler.total_slices
+        self.recovery_threshold = handler.recovery_threshold
+        self.lost_slice = -100
+        self.status = [[1] * self.n for i in xrange(self.total_slices)]
+        self.random = Random(seed)
+        self.ratio = self.drs_handler.repairTraffic() / self.drs_handler.ORC
+        # disk: slices hit by latent errors
+        self.hit = {}
+
+        self.durations = {}
+        self.infos = []
+        self.counters = dict((name, 0) for name in COUNTERS)
+
+    def add(self, name, value=1):
+        self.counters[name] += value
+
+    def durableCount(self, slice_index):
+        state = self.status[slice_index]
+        return state.count(1) + state.count(0)
+
+    def availableCount(self, slice_index):
+        return self.status[slice_index].count(1)
+
+    def isRepairable(self, slice_index):
+        return self.drs_handler.isRepairable(self.status[slice_index])
+
+    def isLost(self, slice_index):
+        state = [1 if s == 0 else s for s in self.status[slice_index]]
+        return not self.drs_handler.isRepairable(state)
+
+    def sliceDegraded(self, slice_index):
+        if self.durableCount(slice_index) == self.n:
+            self.add("current_slice_degraded")
+        self.sliceDegradedAvailability(slice_index)
+
+    def sliceDegradedAvailability(self, slice_index):
+        if self.availableCount(slice_index) == self.n:
+            self.add("current_avail_slice_degraded")
+
+    def sliceRecovered(self, slice_index):
+        if self.durableCount(slice_index) == self.n:
+            self.add("current_slice_degraded", -1)
+        self.sliceRecoveredAvailability(slice_index)
+
+    def sliceRecoveredAvailability(self, slice_index):
+        if self.availableCount(slice_index) == self.n:
+            self.add("current_avail_slice_degraded", -1)
+
+    def startDuration(self, slice_index, time):
+        self.add("unavailable_slice_count")
+        self.durations.setdefault(slice_index, []).append([time])
+
+    def endDuration(self, slice_index, time):
+        if slice_index in self.durations and \
+                len(self.durations[slice_index][-1]) == 1:
+            self.durations[slice_index][-1].append(time)
+
+    def sliceLost(self, slice_index, time, cause):
+        self.status[slice_index] = self.lost_slice
+        self.add("undurable_slice_count")
+        self.infos.append((slice_index, time, cause))
+
+    # lose: whether durable failures mark the chunks lost
+    def failDisk(self, disk, durable, cause, time, lose=True):
+        for slice_index in disk.getChildren():
+            if self.status[slice_index] == self.lost_slice:
+                continue
+            if durable:
+                self.sliceDegraded(slice_index)
+            else:
+                self.sliceDegradedAvailability(slice_index)
+
+            repairable_before = self.isRepairable(slice_index)
+            index = self.slice_locations[slice_index].index(disk)
+            state = self.status[slice_index]
+            if state[index] == -1:
+                continue
+            if durable:
+                if lose:
+                    state[index] = -1
+            elif state[index] == 1:
+                state[index] = 0
+
+            if repairable_before and not self.isRepairable(slice_index):
+                self.startDuration(slice_index, time)
+            if durable and self.isLost(slice_index):
+                self.sliceLost(slice_index, time, cause)
+
+    def recoverDiskAvailability(self, disk, e, time):
+        for slice_index in disk.getChildren():
+            if self.status[slice_index] == self.lost_slice:
+                self.endDuration(slice_index, time)
+                continue
+            if self.availableCount(slice_index) < self.n:
+                repairable_before = self.isRepairable(slice_index)
+                index = self.slice_locations[slice_index].index(disk)
+                if self.status[slice_index][index] == 0:
+                    self.status[slice_index][index] = 1
+                self.sliceRecoveredAvailability(slice_index)
+                if not repairable_before and self.isRepairable(slice_index):
+                    self.durations[slice_index][-1].append(time)
+            elif e.info == 1:
+                self.add("anomalous_available_count")
+
+    def recoverDisk(self, disk, time):
+        for slice_index in disk.getChildren():
+            if self.status[slice_index] == self.lost_slice:
+                self.endDuration(slice_index, time)
+                continue
+            if not self.isRepairable(slice_index):
+                continue
+
+            actual_threshold = self.recovery_threshold
+            if self.conf.lazy_only_available:
+                actual_threshold = self.n - 1
+            if self.counters["current_slice_degraded"] < \
+                    self.conf.max_degraded_slices*self.total_slices:
+                actual_threshold = self.recovery_threshold
+            threshold_crossed = \
+                self.durableCount(slice_index) <= actual_threshold
+            if self.conf.availability_counts_for_recovery and \
+                    self.availableCount(slice_index) <= actual_threshold:
+                threshold_crossed = True
+
+            if threshold_crossed:
+                index = self.slice_locations[slice_index].index(disk)
+                state = self.status[slice_index]
+                if state[index] == -1 or state[index] == -2:
+                    if self.conf.lazy_recovery or self.conf.parallel_repair:
+                        rc = self.drs_handler.parallRepair(state)
+                    else:
+                        rc = self.drs_handler.repair(state, index)
+                    if slice_index in self.hit.get(disk, []):
+                        self.hit[disk].remove(slice_index)
+                    self.add("total_repairs")
+                    self.add("total_repair_transfers",
+                             rc * self.conf.chunk_size * self.ratio)
+                self.sliceRecovered(slice_index)
+
+    def latentDefect(self, disk, time):
+        slice_index = self.random.choice(disk.getChildren())
+        if self.status[slice_index] == self.lost_slice:
+            self.add("total_skipped_latent")
+            return
+        repairable_before = self.isRepairable(slice_index)
+        index = self.slice_locations[slice_index].index(disk)
+        state = self.status[slice_index]
+        if state[index] == -1 or state[index] == -2:
+            self.add("total_skipped_latent")
+            return
+        self.sliceDegraded(slice_index)
+        state[index] = -2
+        self.hit.setdefault(disk, []).append(slice_index)
+        self.add("total_latent_failures")
+        if repairable_before and not self.isRepairable(slice_index):
+            self.startDuration(slice_index, time)
+        if self.isLost(slice_index):
+            self.sliceLost(slice_index, time, "LSE " + str(disk.getID()))
+
+    def handleEvent(self, e):
+        u = e.getUnit()
+        time = e.getTime()
+        if e.getType() == Event.EventType.LatentDefect:
+            self.latentDefect(u, time)
+        elif e.ignore:
+            return
+        elif e.getType() == Event.EventType.Failure:
+            self.handleFailure(u, time, e)
+        else:
+            self.handleRecovery(u, time, e)
+
+    def handleFailure(self, u, time, e):
+        if isinstance(u, Machine):
+            self.add("total_machine_failures")
+            if e.info == 3:
+                self.add("total_perm_machine_failures")
+            elif e.info == 1:
+                self.add("total_short_temp_machine_failures")
+            elif e.info == 2:
+                self.add("total_long_temp_machine_failures")
+            else:
+                self.add("total_machine_failures_due_to_rack_failures")
+                if e.next_recovery_time - time <= u.fail_timeout:
+                    self.add("total_short_temp_machine_failures")
+                else:
+                    self.add("total_long_temp_machine_failures")
+            for disk in u.getChildren():
+                self.failDisk(disk, e.info == 3, "machine " + str(u.getID()),
+                              time)
+        elif isinstance(u, Disk):
+            self.add("total_disk_failures")
+            self.failDisk(u, True, "disk " + str(u.getID()), time)
+        else:
+            for c in u.getChildren():
+                self.handleFailure(c, time, e)
+
+    # recoveries of the eager handler with queue_disable
+    def handleRecovery(self, u, time, e):
+        if isinstance(u, Machine):
+            self.add("total_machine_repairs")
+            for disk in u.getChildren():
+                if e.info != 3 and e.info != 4:
+                    self.recoverDiskAvailability(disk, e, time)
+                else:
+                    self.recoverDisk(disk, time)
+        elif isinstance(u, Disk):
+            self.add("total_disk_repairs")
+            self.recoverDisk(u, time)
+        else:
+            for c in u.getChildren():
+                self.handleRecovery(c, time, e)
+
+
+# handler attributes the reference keeps in counters
+COUNTERS = ("current_slice_degraded", "current_avail_slice_degraded",
+            "unavailable_slice_count", "undurable_slice_count",
+            "anomalous_available_count", "total_latent_failures",
+            "total_skipped_latent", "total_repairs", "total_repair_transfers",
+            "total_disk_failures", "total_disk_repairs",
+            "total_machine_failures", "total_machine_repairs",
+            "total_perm_machine_failures",
+            "total_short_temp_machine_failures",
+            "total_long_temp_machine_failures",
+            "total_machine_failures_due_to_rack_failures")
+
+
+class FailuresTest(unittest.TestCase):
+    """
+    Failures and recoveries of whole disks, applied by the handler as array
+    operations, against Reference applying them chunk by chunk: block
+    states, lost slices with their times and causes, unavailable durations
+    and counters must agree after every step.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def handlers(self, options, seed, handler_class=EventHandler, extra=""):
+        path = os.path.join(self.dir, "test.conf")
+        with open(path, "w") as fp:
+            fp.write(CONF % options + extra)
+        conf = Configuration(path)
+        conf.total_slices = SLICES
+        self.root = topology()
+        self.disks = disksOf(self.root)
+        handler = handler_class(Placement(conf, self.root, Random(seed)))
+        handler.setRandom(Random(seed + 1))
+        return handler, Reference(handler, seed + 1)
+
+    def assertSame(self, handler, ref):
+        for slice_index in xrange(SLICES):
+            if ref.status[slice_index] == ref.lost_slice:
+                self.assertTrue(handler.lost[slice_index])
+            else:
+                self.assertFalse(handler.lost[slice_index])
+                self.assertEqual(handler.sliceState(slice_index),
+                                 ref.status[slice_index])
+        self.assertTrue((handler.lost == ~isnan(handler.lost_times)).all())
+        self.assertEqual(sorted(handler.undurableInfos()), sorted(ref.infos))
+        self.assertEqual(handler.unavailable_slice_durations.toDict(),
+                         ref.durations)
+        for name in COUNTERS:
+            self.assertAlmostEqual(getattr(handler, name), ref.counters[name],
+                                   msg=name)
+        for disk in self.disks:
+            self.assertEqual(disk.getSlicesHitByLSE(), ref.hit.get(disk, []))
+
+    # The disks of a random machine and random other disks, in random order:
+    # disks may fail twice in one batch, as a disk and with its machine.
+    def failures(self, rnd):
+        machine = rnd.choice(self.disks).getParent()
+        durable = rnd.random() < 0.2
+        failures = [(disk, durable, "machine " + str(machine.getID()))
+                    for disk in machine.getChildren()]
+        for i in xrange(rnd.randint(0, 2)):
+            disk = rnd.choice(machine.getChildren() + self.disks)
+            failures.append((disk, rnd.random() < 0.4,
+                             "disk " + str(disk.getID())))
+        rnd.shuffle(failures)
+        return failures
+
+    # Random steps of failures and recoveries, recoveries mostly of the
+    # disks failed so far
+    def run_disks(self, options, seed, steps=300):
+        handler, ref = self.handlers(options, seed)
+        rnd = Random(seed)
+        # disks failed for good, and disks only unavailable
+        lost = []
+        down = []
+        for step in xrange(steps):
+            time = float(step)
+            op = rnd.random()
+            if op < 0.2:
+                failures = self.failures(rnd)
+                handler.failDisks(failures, time)
+                for disk, durable, cause in failures:
+                    ref.failDisk(disk, durable, cause, time)
+                    if durable:
+                        lost.append(disk)
+                    else:
+                        down.append(disk)
+            elif op < 0.3:
+                disk = rnd.choice(self.disks)
+                handler.handleLatentDefect(disk, time, None)
+                ref.latentDefect(disk, time)
+            elif op < 0.65:
+                # a machine coming back
+                machine = rnd.choice(down + self.disks[:1]).getParent()
+                e = Event(Event.EventType.Recovered, time, machine,
+                          rnd.choice([1, 2]))
+                for disk in machine.getChildren():
+                    handler.recoverDiskAvailability(disk, e, time)
+                    ref.recoverDiskAvailability(disk, e, time)
+                    while disk in down:
+                        down.remove(disk)
+            else:
+                disk = rnd.choice(lost + self.disks[:1])
+                handler.recoverDisk(disk, time)
+                ref.recoverDisk(disk, time)
+                while disk in lost:
+                    lost.remove(disk)
+            self.assertSame(handler, ref)
+        return ref
+
+    # Events at one time: failures of disks, machines (info 1, 2 or 3) and
+    # racks, some of them ignored, and now and then another event among
+    # them which breaks the failures into several batches
+    def failureEvents(self, rnd, time, recoveries):
+        events = []
+        for i in xrange(rnd.randint(1, 3)):
+            disk = rnd.choice(self.disks)
+            op = rnd.random()
+            if op < 0.4:
+                e = Event(Event.EventType.Failure, time, disk)
+            elif op < 0.9:
+                e = Event(Event.EventType.Failure, time, disk.getParent(),
+                          rnd.choice([1, 2, 2, 3]))
+            else:
+                e = Event(Event.EventType.Failure, time,
+                          disk.getParent().getParent(), 0,
+                          next_recovery_time=time + rnd.choice([0.1, 5]))
+            e.ignore = rnd.random() < 0.1
+            events.append(e)
+            if rnd.random() < 0.15:
+                events.append(Event(Event.EventType.LatentDefect, time,
+                                    rnd.choice(self.disks)))
+        if recoveries:
+            for e in events:
+                if e.getType() == Event.EventType.Failure and not e.ignore:
+                    self.pending.append(e)
+        return events
+
+    # Handle the events at time as Simulation does: popped in batches of
+    # handler.batchable. Returns the batch sizes.
+    def dispatch(self, handler, queue, time):
+        sizes = []
+        batch = queue.removeFirstBatch(handler.batchable)
+        while batch != [] and batch[0].getTime() <= time:
+            handler.handleEvents(batch, queue)
+            sizes.append(len(batch))
+            batch = queue.removeFirstBatch(handler.batchable)
+        # RAFI recoveries, later than any step
+        for e in batch:
+            queue.addEvent(e)
+        return sizes
+
+    # Random steps of failure events and recoveries of the units failed so
+    # far through a queue. recoveries=False only runs the failures, e.g. for
+    # the RAFI handler which recovers in its own way. Returns the sizes of
+    # the batches handled.
+    def run_events(self, handler, ref, seed, recoveries=True, steps=300):
+        rnd = Random(seed)
+        queue = EventQueue()
+        self.pending = []
+        all_sizes = []
+        for step in xrange(steps):
+            time = float(step)
+            op = rnd.random()
+            if op < 0.2 or (not recoveries and op < 0.6):
+                events = self.failureEvents(rnd, time, recoveries)
+            elif op < 0.3 or not recoveries:
+                events = [Event(Event.EventType.LatentDefect, time,
+                                rnd.choice(self.disks))]
+            elif self.pending != []:
+                failure = self.pending.pop(rnd.randrange(len(self.pending)))
+                events = [Event(Event.EventType.Recovered, time,
+                                failure.getUnit(), failure.info)]
+            else:
+                continue
+            for e in events:
+                queue.addEvent(e)
+                ref.handleEvent(e)
+            sizes = self.dispatch(handler, queue, time)
+            self.assertEqual(sum(sizes), len(events))
+            all_sizes += sizes
+            self.assertSame(handler, ref)
+        return all_sizes
+
+    def test_events(self):
+        for seed in xrange(3):
+            handler, ref = self.handlers(EAGER, seed)
+            sizes = self.run_events(handler, ref, seed)
+            # failures at one time are handled together
+            self.assertTrue(max(sizes) > 1)
+            self.assertTrue(ref.counters["undurable_slice_count"] > 0)
+            self.assertTrue(ref.counters["total_perm_machine_failures"] > 0)
+            self.assertTrue(
+                ref.counters["total_machine_failures_due_to_rack_failures"]
+                > 0)
+
+    def test_rafi_events(self):
+        # RAFI takes failures one event at a time
+        for seed in xrange(3):
+            handler, ref = self.handlers(EAGER, seed, RAFIEventHandler, RAFI)
+            sizes = self.run_events(handler, ref, seed, False, 40)
+            self.assertEqual(max(sizes), 1)
+
+    def test_rafi_permanent_machine(self):
+        # chunks on a machine failed for good are lost, and its recovery
+        # repairs them as those of failed disks
+        handler, ref = self.handlers(EAGER, 0, RAFIEventHandler, RAFI)
+        machine = self.disks[0].getParent()
+        chunks = [(slice_index, disk.chunk_positions[slice_index])
+                  for disk in machine.getChildren()
+                  for slice_index in disk.getChildren()]
+        self.assertTrue(len(chunks) > 0)
+        queue = EventQueue()
+
+        failure = Event(Event.EventType.Failure, 1.0, machine, 3)
+        failure.next_recovery_time = 2.0
+        queue.addEvent(failure)
+        ref.handleEvent(failure)
+        self.dispatch(handler, queue, 1.0)
+        self.assertSame(handler, ref)
+        for slice_index, index in chunks:
+            if not handler.lost[slice_index]:
+                self.assertEqual(handler.chunkState(slice_index, index), -1)
+        self.assertEqual(handler.total_perm_machine_failures, 1)
+
+        # RAFI repairs all lost chunks of a slice at once, unlike Reference
+        queue.addEvent(Event(Event.EventType.Recovered, 2.0, machine, 3))
+        self.dispatch(handler, queue, 2.0)
+        for slice_index, index in chunks:
+            if not handler.lost[slice_index]:
+                self.assertEqual(handler.chunkState(slice_index, index), 1)
+                self.assertFalse(slice_index in handler.failed_slices)
+        self.assertTrue(handler.total_repairs > 0)
+        self.assertEqual(handler.total_machine_repairs, 1)
+
+    def test_batchable(self):
+        handler, ref = self.handlers(EAGER, 0)
+        rafi, ref = self.handlers(EAGER, 0, RAFIEventHandler, RAFI)
+        disk = self.disks[0]
+        failure = Event(Event.EventType.Failure, 1.0, disk)
+        ignored = Event(Event.EventType.Failure, 1.0, disk, ignore=True)
+        recovery = Event(Event.EventType.Recovered, 1.0, disk)
+        self.assertTrue(handler.batchable(failure))
+        self.assertFalse(handler.batchable(ignored))
+        self.assertFalse(handler.batchable(recovery))
+        self.assertFalse(rafi.batchable(failure))
+
+    def test_eager(self):
+        for seed in xrange(3):
+            ref = self.run_disks(EAGER, seed)
+            self.assertTrue(ref.counters["undurable_slice_count"] > 0)
+            self.assertTrue(ref.counters["total_repairs"] > 0)
+
+    def test_lazy(self):
+        for seed in xrange(3):
+            ref = self.run_disks(LAZY, seed)
+            self.assertTrue(ref.counters["unavailable_slice_count"] > 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+from random import Random
+
+from numpy.random import RandomState
+
+from simulator.Event import Event
+from simulator.EventQueue import EventQueue
+from simulator.LatentErrors import LatentErrorPopulation
+from simulator.failure.Period import Period
+from simulator.failure.WeibullGenerator import WeibullGenerator
+from simulator.unit.Disk import Disk
+from simulator.unit.DiskWithScrubbing import DiskWithScrubbing
+
+# (start, end) windows the disks draw latent errors in
+WINDOWS = [(0.0, 20000.0), (500.0, 3000.0), (100.0, 87600.0)]
+
+
+# disks with a latent error generator of the given Weibull parameters, each
+# drawing from a stream of its own, and scrubs every scrub_period hours
+def disks(count, weibull, scrub_period, seed):
+    result = []
+    for i in xrange(count):
+        disk = DiskWithScrubbing("disk" + str(i), None, {})
+        latent = WeibullGenerator("latentErrorGenerator", weibull)
+        latent.setRandom(Random(seed + i), RandomState(seed + i))
+        disk.addEventGenerator(latent)
+        disk.addEventGenerator(Period("scrubGenerator",
+                                      {"gamma": scrub_period}))
+        if i % 4 == 1:
+            # errors stop at the first one in this correlated failure
+            disk.failure_intervals = [[1000.0, 1500.0, False]]
+        result.append(disk)
+    return result
+
+
+# disks without scrubbing, which keep the errors in correlated failure
+# intervals
+def plainDisks(count, weibull, seed):
+    result = []
+    for i in xrange(count):
+        disk = Disk("disk" + str(i), None, {})
+        latent = WeibullGenerator("latentErrorGenerator", weibull)
+        latent.setRandom(Random(seed + i), RandomState(seed + i))
+        disk.addEventGenerator(latent)
+        if i % 2 == 1:
+            disk.failure_intervals = [[1000.0, 1500.0, False]]
+        result.append(disk)
+    return result
+
+
+# (disk name, type, time, next recovery time) of events, sorted
+def rows(events):
+    return sorted((e.getUnit().toString(), e.getType(), e.getTime(),
+                   e.next_recovery_time) for e in events)
+
+
+# latent error events of every disk in every window, disk by disk
+def perDisk(disk_list):
+    queue = EventQueue()
+    for disk in disk_list:
+        for start, end in WINDOWS:
+            disk.generateLatentErrors(queue, start, end)
+    return rows(queue.getAllEvents())
+
+
+# the same events, drawn by a LatentErrorPopulation
+def population(disk_list, seed=0):
+    errors = LatentErrorPopulation(RandomState(seed))
+    for disk in disk_list:
+        disk.latent_errors = errors
+        for start, end in WINDOWS:
+            disk.generateLatentErrors(None, start, end)
+    table = dict((disk.getID(), disk) for disk in disk_list)
+    return rows(errors.generate().toEvents(table))
+
+
+class LatentErrorsTest(unittest.TestCase):
+    """
+    LatentErrorPopulation against DiskWithScrubbing drawing the latent
+    errors of each window in turn.
+    """
+
+    def test_same_events(self):
+        # gamma != 0 takes the generateUntil fallback, which draws the same
+        # numbers as the per-disk loop
+        weibull = {"gamma": 1.0, "lamda": 3000.0, "beta": 1.0}
+        expected = perDisk(disks(12, weibull, 168.0, 11))
+        got = population(disks(12, weibull, 168.0, 11))
+        self.assertTrue(len(expected) > 0)
+        self.assertEqual(got, expected)
+
+    def test_streamed(self):
+        # with result_events every window is drawn as soon as it is added
+        weibull = {"gamma": 1.0, "lamda": 3000.0, "beta": 1.0}
+        expected = perDisk(disks(12, weibull, 168.0, 11))
+        queue = EventQueue()
+        errors = LatentErrorPopulation(RandomState(0), queue)
+        for disk in disks(12, weibull, 168.0, 11):
+            disk.latent_errors = errors
+            for start, end in WINDOWS:
+                disk.generateLatentErrors(queue, start, end)
+            self.assertEqual(errors.disks, [])
+        self.assertEqual(rows(queue.getAllEvents()), expected)
+
+    def test_truncation(self):
+        # scrubs slower than the windows: every window stops after its
+        # first error
+        weibull = {"gamma": 1.0, "lamda": 200.0, "beta": 1.0}
+        expected = perDisk(disks(8, weibull, 100000.0, 3))
+        self.assertEqual(population(disks(8, weibull, 100000.0, 3)),
+                         expected)
+        self.assertTrue(all(row[1] == Event.EventType.LatentDefect
+                            for row in expected))
+
+    def test_no_scrubbing(self):
+        # errors in a correlated failure interval do not stop the window
+        weibull = {"gamma": 1.0, "lamda": 500.0, "beta": 1.0}
+        expected = perDisk(plainDisks(2, weibull, 5))
+        self.assertEqual(population(plainDisks(2, weibull, 5)), expected)
+        self.assertTrue(any(1000.0 <= row[2] <= 1500.0 for row in expected
+                            if row[0] == "disk1"))
+        self.assertTrue(any(row[2] > 1500.0 for row in expected
+                            if row[0] == "disk1"))
+
+    def test_poisson_counts(self):
+        # gamma == 0 is drawn in bulk, from other numbers than the loop;
+        # the error counts must agree within a few standard deviations
+        weibull = {"gamma": 0.0, "lamda": 2000.0, "beta": 1.2}
+        loop = perDisk(disks(200, weibull, 168.0, 1))
+        bulk = population(disks(200, weibull, 168.0, 1), 2)
+        count = lambda r: sum(1 for row in r
+                              if row[1] == Event.EventType.LatentDefect)
+        expected = count(loop)
+        self.assertTrue(abs(count(bulk) - expected) < 4*expected**0.5)
+        # every recovery is the scrub right after its error
+        for name, e_type, time, next_recovery in bulk:
+            if e_type == Event.EventType.LatentDefect:
+                self.assertTrue(0 <= next_recovery - time <= 168.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
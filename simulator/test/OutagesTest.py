@@ -0,0 +1,81 @@
+import unittest
+from random import Random
+
+from numpy import array, allclose
+
+from simulator.UnavailableDurations import UnavailableDurations, outages
+
+
+# outages by merging the sorted durations one at a time
+def mergedOutages(durations):
+    merged = []
+    for start, end in sorted(durations):
+        if merged != [] and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    TTFs = []
+    last_end = 0.0
+    for start, end in merged:
+        TTFs.append(start - last_end)
+        last_end = end
+    return TTFs, [end - start for start, end in merged]
+
+
+class OutagesTest(unittest.TestCase):
+    """
+    The union of unavailable durations into system outages, against a
+    one-by-one merge.
+    """
+
+    def assertOutages(self, starts, ends, TTFs, TTRs):
+        got_TTFs, got_TTRs = outages(array(starts, dtype=float),
+                                     array(ends, dtype=float))
+        self.assertEqual(len(got_TTFs), len(TTFs))
+        self.assertTrue(allclose(got_TTFs, TTFs))
+        self.assertTrue(allclose(got_TTRs, TTRs))
+
+    def test_cases(self):
+        self.assertOutages([], [], [], [])
+        # disjoint
+        self.assertOutages([1, 5], [2, 7], [1, 3], [1, 2])
+        # nested, touching, then out of order
+        self.assertOutages([10, 1, 2, 3, 4], [12, 5, 3, 4, 4.5],
+                           [1, 5], [4, 2])
+        # a long duration covering later shorter ones
+        self.assertOutages([0, 1, 8], [10, 2, 9], [0], [10])
+
+    def test_random(self):
+        rnd = Random(3)
+        for i in xrange(50):
+            durations = []
+            for j in xrange(rnd.randint(1, 40)):
+                start = round(rnd.uniform(0, 100), 1)
+                durations.append((start, start + round(rnd.expovariate(0.2), 1)))
+            TTFs, TTRs = mergedOutages(durations)
+            self.assertOutages([d[0] for d in durations],
+                               [d[1] for d in durations], TTFs, TTRs)
+
+    def test_open_durations(self):
+        durations = UnavailableDurations(4, capacity=1)
+        durations.start([0, 1], 1.0)
+        durations.end(0, 2.0)
+        durations.start(2, 5.0)
+        durations.end([1, 3], 3.0)
+        durations.start(0, 8.0)
+        self.assertTrue(durations.isOpen(0))
+        self.assertFalse(durations.isOpen(3))
+        self.assertEqual(durations.toDict(), {0: [[1.0, 2.0], [8.0]],
+                                              1: [[1.0, 3.0]],
+                                              2: [[5.0]]})
+        # open durations end at end_time
+        TTFs, TTRs = durations.failuresAndRepairs(10.0)
+        self.assertTrue(allclose(TTFs, [1.0, 2.0]))
+        self.assertTrue(allclose(TTRs, [2.0, 5.0]))
+        TTFs, TTRs = durations.failuresAndRepairs(10.0, False)
+        self.assertTrue(allclose(TTFs, [1.0, 0.0, 4.0, 3.0]))
+        self.assertTrue(allclose(TTRs, [1.0, 2.0, 5.0, 2.0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
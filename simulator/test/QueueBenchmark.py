@@ -0,0 +1,104 @@
+import sys
+from time import time
+from random import random, seed
+
+from simulator.Event import Event
+from simulator.EventQueue import EventQueue
+
+DEFAULT_SIZES = [100000, 1000000, 10000000]
+# hold operations timed at each queue size
+HOLD_OPS = 10000
+# the sort-on-every-pop queue is only timed up to this size
+LEGACY_MAX = 1000000
+LEGACY_HOLD_OPS = 20
+
+
+class LegacyEventQueue(object):
+    """
+    The OrderedDict queue which sorts all timestamps on every pop, kept here
+    only as the reference for the benchmark.
+    """
+    def __init__(self):
+        self.events = {}
+
+    def addEvent(self, e):
+        if e.getTime() in self.events.keys():
+            self.events.get(e.getTime()).append(e)
+        else:
+            self.events.setdefault(e.getTime(), [e])
+
+    def removeFirst(self):
+        if self.events.keys() == []:
+            return None
+        keys = self.events.keys()
+        keys.sort()
+        first_key = keys[0]
+
+        first_value = self.events[first_key]
+        first_event = first_value.pop(0)
+        if len(first_value) == 0:
+            self.events.pop(first_key)
+        return first_event
+
+
+def fill(queue, size, horizon):
+    for i in xrange(size):
+        queue.addEvent(Event(Event.EventType.Failure, random()*horizon, None))
+
+
+def fillLegacy(queue, size, horizon):
+    # the legacy addEvent is O(n) itself, so build the dict directly
+    for i in xrange(size):
+        e = Event(Event.EventType.Failure, random()*horizon, None)
+        queue.events.setdefault(e.getTime(), []).append(e)
+
+
+# Classic hold model: pop the earliest event, push a new one after it.
+def hold(queue, ops, horizon):
+    start = time()
+    for i in xrange(ops):
+        e = queue.removeFirst()
+        queue.addEvent(Event(Event.EventType.Failure,
+                             e.getTime() + random()*horizon, None))
+    return (time() - start)/ops
+
+
+def drain(queue):
+    start = time()
+    count = 0
+    e = queue.removeFirst()
+    while e is not None:
+        count += 1
+        e = queue.removeFirst()
+    return (time() - start)/max(count, 1)
+
+
+def main(sizes):
+    horizon = 87600.0
+    for size in sizes:
+        queue = EventQueue()
+        start = time()
+        fill(queue, size, horizon)
+        fill_cost = (time() - start)/size
+        hold_cost = hold(queue, HOLD_OPS, horizon)
+        drain_cost = drain(queue)
+        print "heap    n=%-9d add: %.3fus  hold: %.3fus  pop: %.3fus" % \
+            (size, fill_cost*1e6, hold_cost*1e6, drain_cost*1e6)
+
+        if size <= LEGACY_MAX:
+            legacy = LegacyEventQueue()
+            fillLegacy(legacy, size, horizon)
+            legacy_cost = hold(legacy, LEGACY_HOLD_OPS, horizon)
+            print "legacy  n=%-9d hold: %.3fus  (%.0fx slower)" % \
+                (size, legacy_cost*1e6, legacy_cost/hold_cost)
+            del legacy
+        del queue
+
+
+if __name__ == "__main__":
+    seed(0)
+    if len(sys.argv) > 1:
+        sizes = [int(float(item)) for item in sys.argv[1:]]
+    else:
+        sizes = DEFAULT_SIZES
+    main(sizes)
@@ -0,0 +1,91 @@
+import unittest
+from random import Random
+
+from simulator.Event import Event
+from simulator.EventQueue import EventQueue
+from simulator.CalendarQueue import CalendarQueue
+
+
+class QueueTest(unittest.TestCase):
+    """
+    EventQueue (binary heap) and CalendarQueue against a sorted list: the
+    same adds, cancels and pops must give the same events in (time,
+    creation) order. Times are rounded, so many events tie.
+    """
+
+    def run_ops(self, queue, seed, ops=3000):
+        rnd = Random(seed)
+        # (time, label) of the live events, label being the creation order
+        live = []
+        events = {}
+        popped = []
+        now = 0.0
+        for label in xrange(ops):
+            op = rnd.random()
+            if op < 0.5 or live == []:
+                ts = now + round(rnd.expovariate(0.1), 1)
+                e = Event(Event.EventType.Failure, ts, None)
+                events[label] = e
+                queue.addEvent(e)
+                live.append((ts, label))
+            elif op < 0.7:
+                ts, cancelled = live.pop(rnd.randrange(len(live)))
+                queue.remove(events.pop(cancelled))
+            else:
+                live.sort()
+                ts, first = live.pop(0)
+                e = queue.removeFirst()
+                self.assertTrue(e is events.pop(first))
+                popped.append((ts, first))
+                now = ts
+            self.assertEqual(queue.size(), len(live))
+
+        live.sort()
+        for ts, label in live:
+            self.assertTrue(queue.removeFirst() is events.pop(label))
+        self.assertTrue(queue.removeFirst() is None)
+        return popped
+
+    def test_heap(self):
+        for seed in xrange(5):
+            self.run_ops(EventQueue(), seed)
+
+    def test_calendar(self):
+        for seed in xrange(5):
+            self.run_ops(CalendarQueue(), seed)
+
+    def test_same_order(self):
+        self.assertEqual(self.run_ops(EventQueue(), 7),
+                         self.run_ops(CalendarQueue(), 7))
+
+    def test_batch(self):
+        for queue in (EventQueue(), CalendarQueue()):
+            events = [Event(Event.EventType.Failure, ts, None)
+                      for ts in (2.0, 1.0, 1.0, 1.0, 3.0)]
+            for e in events:
+                queue.addEvent(e)
+            queue.remove(events[2])
+            batch = queue.removeFirstBatch(lambda e: True)
+            self.assertEqual(batch, [events[1], events[3]])
+            self.assertTrue(queue.removeFirst() is events[0])
+            self.assertTrue(queue.removeFirst() is events[4])
+
+    def test_infinite_times(self):
+        inf = float("inf")
+        for queue in (EventQueue(), CalendarQueue()):
+            events = [Event(Event.EventType.Failure, ts, None)
+                      for ts in (inf, 5.0, inf, 1e300, 2.0, 3.0, 4.0)]
+            for e in events:
+                queue.addEvent(e)
+            queue.remove(events[2])
+            order = [events[4], events[5], events[6], events[1], events[3]]
+            for e in order:
+                self.assertTrue(queue.removeFirst() is e)
+            queue.addEvent(events[2])
+            self.assertTrue(queue.removeFirst() is events[0])
+            self.assertTrue(queue.removeFirst() is events[2])
+            self.assertTrue(queue.removeFirst() is None)
+
+
+if __name__ == "__main__":
+    unittest.main()
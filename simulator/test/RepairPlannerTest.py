@@ -0,0 +1,97 @@
+import unittest
+from random import Random
+
+from simulator.drs.Handler import getDRSHandler
+from simulator.drs.RepairPlanner import RepairPlanner
+
+CODES = [("RS", ["9", "6"]), ("LRC", ["10", "6", "2"]),
+         ("XORBAS", ["16", "10", "5"]), ("MSR", ["9", "6", "8"])]
+
+
+# (unavailable mask, lost mask) of a block state list: blocks not in state
+# 1, and blocks in state -1 or -2
+def masksOf(state):
+    unavailable_mask = 0
+    lost_mask = 0
+    for i, s in enumerate(state):
+        if s != 1:
+            unavailable_mask |= 1 << i
+        if s in (-1, -2):
+            lost_mask |= 1 << i
+    return unavailable_mask, lost_mask
+
+
+# cost and indexes brought back to 1 by a repair of the state list
+def planOf(repair, state, *args):
+    after = list(state)
+    cost = repair(after, *args)
+    return cost, tuple(i for i in xrange(len(state))
+                       if state[i] != 1 and after[i] == 1)
+
+
+# repairable states with a few blocks in state 0, -1 or -2
+def states(drs, rnd, count):
+    result = []
+    while len(result) < count:
+        state = [1] * drs.n
+        for i in rnd.sample(xrange(drs.n), rnd.randint(1, drs.n - drs.k)):
+            state[i] = rnd.choice((0, 0, -1, -2))
+        if drs.isRepairable(state):
+            result.append(state)
+    return result
+
+
+class RepairPlannerTest(unittest.TestCase):
+    """
+    Cached repair plans against repair/parallRepair of the DRS handler on
+    block state lists.
+    """
+
+    def test_same_plans(self):
+        rnd = Random(3)
+        for name, params in CODES:
+            drs = getDRSHandler(name, params)
+            planner = RepairPlanner(drs)
+            for state in states(drs, rnd, 200):
+                unavailable_mask, lost_mask = masksOf(state)
+                for index in xrange(drs.n):
+                    if state[index] == 1:
+                        continue
+                    self.assertEqual(
+                        planner.repair(unavailable_mask, index),
+                        planOf(drs.repair, state, index), name)
+                for only_lost in (False, True):
+                    self.assertEqual(
+                        planner.parallRepair(unavailable_mask, lost_mask,
+                                             only_lost),
+                        planOf(drs.parallRepair, state, only_lost), name)
+            self.assertTrue(planner.hits > 0, name)
+
+    def test_hits(self):
+        drs = getDRSHandler("RS", ["9", "6"])
+        planner = RepairPlanner(drs)
+        self.assertEqual(planner.statistics(), (0, 0.0))
+
+        planner.repair(0b110, 1)
+        self.assertEqual((planner.hits, planner.misses), (0, 1))
+        planner.repair(0b110, 1)
+        self.assertEqual((planner.hits, planner.misses), (1, 1))
+        # another index or mask is another plan
+        planner.repair(0b110, 2)
+        planner.repair(0b111, 1)
+        self.assertEqual((planner.hits, planner.misses), (1, 3))
+
+        # the lost mask only counts with only_lost
+        planner.parallRepair(0b110, 0b010)
+        planner.parallRepair(0b110, 0b100)
+        self.assertEqual((planner.hits, planner.misses), (2, 4))
+        planner.parallRepair(0b110, 0b010, True)
+        planner.parallRepair(0b110, 0b100, True)
+        planner.parallRepair(0b110, 0b010, True)
+        self.assertEqual((planner.hits, planner.misses), (3, 6))
+        self.assertEqual(len(planner.plans), 6)
+        self.assertEqual(planner.statistics(), (9, 3.0/9))
+
+
+if __name__ == "__main__":
+    unittest.main()
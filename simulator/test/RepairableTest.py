@@ -0,0 +1,56 @@
+import unittest
+from random import Random
+
+from numpy import arange, array, uint32
+
+from simulator.drs.Handler import getDRSHandler
+
+CODES = [("RS", ["9", "6"]), ("LRC", ["10", "6", "2"]),
+         ("XORBAS", ["16", "10", "5"]), ("MSR", ["9", "6", "8"])]
+
+
+# block states of mask: 0 for the erased blocks, 1 for the others
+def stateOf(mask, n):
+    return [0 if mask & (1 << i) else 1 for i in xrange(n)]
+
+
+class RepairableTest(unittest.TestCase):
+    """
+    Repairability by erasure mask against isRepairable on the block state
+    list, for every mask of a few codes.
+    """
+
+    def test_all_masks(self):
+        for name, params in CODES:
+            drs = getDRSHandler(name, params)
+            masks = arange(1 << drs.n, dtype=uint32)
+            expected = array([drs.isRepairable(stateOf(mask, drs.n))
+                              for mask in masks.tolist()])
+            self.assertTrue((drs.isRepairableMasks(masks) == expected).all(),
+                            name)
+            for mask in (0, 1, (1 << drs.n) - 1, 0b1011):
+                self.assertEqual(drs.isRepairableMask(mask),
+                                 expected[mask], name)
+
+    def test_large_n(self):
+        # more blocks than max_table_n, looked up through a dict
+        drs = getDRSHandler("RS", ["24", "20"])
+        rnd = Random(5)
+        masks = [rnd.getrandbits(drs.n) & rnd.getrandbits(drs.n)
+                 for i in xrange(2000)]
+        for mask in masks:
+            self.assertEqual(drs.isRepairableMask(mask),
+                             drs.isRepairable(stateOf(mask, drs.n)))
+
+    def test_shared_table(self):
+        first = getDRSHandler("LRC", ["10", "6", "2"])
+        second = getDRSHandler("LRC", ["10", "6", "2"])
+        other = getDRSHandler("LRC", ["10", "6", "3"])
+        self.assertTrue(first._table() is second._table())
+        self.assertFalse(first._table() is other._table())
+        first.isRepairableMask(0b111)
+        self.assertNotEqual(second._table()[0b111], -1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import random
+import unittest
+
+import numpy.random
+from numpy import array_equal
+
+from simulator.RackEvents import generateRackEvents, byRacks
+from simulator.Seeds import Seeds
+from simulator.failure.Period import Period
+from simulator.failure.Real import Real
+from simulator.failure.WeibullGenerator import WeibullGenerator
+from simulator.unit.DataCenter import DataCenter
+from simulator.unit.DiskWithScrubbing import DiskWithScrubbing
+from simulator.unit.Layer import Layer
+from simulator.unit.Machine import Machine
+from simulator.unit.Rack import Rack
+from simulator.unit.Unit import Unit
+
+TOTAL_TIME = 87600.0
+
+
+def weibull(name, gamma, lamda, beta):
+    return WeibullGenerator(name, {"gamma": gamma, "lamda": lamda,
+                                   "beta": beta})
+
+
+def child(unit_class, name, parent, generators):
+    unit = unit_class(name, parent, {})
+    for generator in generators:
+        unit.addEventGenerator(generator)
+    parent.addChild(unit)
+    return unit
+
+
+# A small layer like conf/layer.xml with failures on every level. Unit ids
+# start from 0, as in a fresh process, so streams named by them repeat.
+def topology(racks=3, machines=2, disks=3):
+    Unit.unit_count = 0
+    root = Layer("Layer", None, {})
+    dc = child(DataCenter, "datacenter0", root, [])
+    for r in xrange(racks):
+        rack = child(Rack, "rack" + str(r), dc, [
+            weibull("failureGenerator", 0.0, 1500.0, 1.0),
+            weibull("recoveryGenerator", 24.0, 10.0, 1.0)])
+        for m in xrange(machines):
+            machine = child(Machine, "machine" + str(m), rack, [
+                weibull("failureGenerator", 0.0, 3000.0, 1.0),
+                weibull("recoveryGenerator", 0.1, 0.5, 1.0),
+                Real("recoveryGenerator2", {"gamma": 0.25, "lamda": 0.25})])
+            for d in xrange(disks):
+                child(DiskWithScrubbing, "disk" + str(d), machine, [
+                    weibull("failureGenerator", 0.0, 8760.0, 1.12),
+                    Real("recoveryGenerator", {"gamma": 12.0, "lamda": 0.0}),
+                    weibull("latentErrorGenerator", 0.0, 925.0, 1.0),
+                    Period("scrubGenerator", {"gamma": 504.0})])
+    return root
+
+
+# Events of every rack of a fresh topology, seeded with seed. With
+# global_draws the recovery generators draw from the global random module.
+def rackEvents(seed, workers, replica=0, global_draws=False):
+    root = topology()
+    seeds = Seeds(seed, replica)
+    seeds.seedUnits(root)
+    if global_draws:
+        for unit in root.unitTable().itervalues():
+            for generator in unit.getEventGenerators():
+                if isinstance(generator, Real):
+                    generator.setRandom(random, numpy.random)
+    return generateRackEvents(root, 0, TOTAL_TIME, workers, seeds)
+
+
+class SeedsTest(unittest.TestCase):
+    """
+    Streams derived from a master seed, and events generated from them rack
+    by rack in any number of processes.
+    """
+
+    def assertSameBatches(self, batches, expected):
+        self.assertEqual(len(batches), len(expected))
+        for batch, other in zip(batches, expected):
+            for field in ("types", "unit_ids", "times",
+                          "next_recovery_times", "infos", "ignores"):
+                self.assertTrue(array_equal(getattr(batch, field),
+                                            getattr(other, field)), field)
+
+    def test_streams(self):
+        seeds = Seeds(7)
+        first = seeds.stream("unit", 3).random()
+        seeds.stream("unit", 4).random()
+        self.assertEqual(seeds.stream("unit", 3).random(), first)
+        self.assertNotEqual(Seeds(7, 1).stream("unit", 3).random(), first)
+        self.assertNotEqual(Seeds(8).stream("unit", 3).random(), first)
+        self.assertTrue(Seeds().stream("unit", 3) is random)
+        self.assertTrue(Seeds().arrayStream("unit", 3) is numpy.random)
+
+    def test_worker_counts(self):
+        expected = rackEvents(7, 1)
+        self.assertTrue(sum(batch.size() for batch in expected) > 0)
+        self.assertSameBatches(rackEvents(7, 1), expected)
+        self.assertSameBatches(rackEvents(7, 2), expected)
+        self.assertSameBatches(rackEvents(7, 3), expected)
+
+    def test_seeds_differ(self):
+        expected = rackEvents(7, 1)
+        for batches in (rackEvents(8, 1), rackEvents(7, 1, 1)):
+            self.assertFalse(array_equal(batches[0].times,
+                                         expected[0].times))
+
+    def test_global_draws(self):
+        # draws from the global modules are seeded per rack as well, and
+        # leave the global states as they were
+        random.seed(1)
+        numpy.random.seed(1)
+        expected = rackEvents(7, 1, global_draws=True)
+        after = (random.random(), numpy.random.random_sample())
+        self.assertSameBatches(rackEvents(7, 3, global_draws=True), expected)
+        random.seed(1)
+        numpy.random.seed(1)
+        self.assertEqual((random.random(), numpy.random.random_sample()),
+                         after)
+
+    def test_by_racks(self):
+        root = topology()
+        self.assertTrue(byRacks(root))
+        root.getChildren()[0].addEventGenerator(
+            weibull("failureGenerator", 0.0, 1500.0, 1.0))
+        self.assertFalse(byRacks(root))
+        self.assertRaises(Exception, generateRackEvents, root, 0,
+                          TOTAL_TIME, 1, Seeds(7))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from collections import Counter
+
+from simulator.Event import Event
+from simulator.EventQueue import EventQueue
+from simulator.Seeds import Seeds
+from simulator.StreamingEventQueue import StreamingEventQueue
+from simulator.test.SeedsTest import topology, TOTAL_TIME
+
+LATENT = (Event.EventType.LatentDefect, Event.EventType.LatentRecovered)
+
+
+def row(e):
+    return (e.getUnit().toString(), e.getType(), e.getTime(),
+            e.next_recovery_time, e.info, e.ignore)
+
+
+# a fresh topology, every unit and generator drawing from a stream of its own
+def seededTopology(seed):
+    root = topology()
+    Seeds(seed).seedUnits(root)
+    return root
+
+
+class StreamingTest(unittest.TestCase):
+    """
+    Events pulled from Unit.eventCycles through a StreamingEventQueue
+    against the whole timeline generated up front.
+    """
+
+    # rows of the whole timeline, latent errors left out
+    def timeline(self, seed):
+        queue = EventQueue()
+        seededTopology(seed).generateEvents(queue, 0, TOTAL_TIME, True)
+        return sorted(row(e) for e in queue.getAllEvents()
+                      if e.getType() not in LATENT)
+
+    def test_same_events(self):
+        for seed in (7, 8):
+            root = seededTopology(seed)
+            queue = StreamingEventQueue(EventQueue())
+            queue.addSource(root.eventCycles(queue, 0, TOTAL_TIME, True,
+                                             True))
+            rows = []
+            last_time = 0
+            e = queue.removeFirst()
+            while e is not None:
+                self.assertTrue(e.getTime() >= last_time)
+                last_time = e.getTime()
+                if e.getType() not in LATENT:
+                    rows.append(row(e))
+
+                # a unit has at most its current and next failure and
+                # recovery queued
+                pending = Counter(p.getUnit() for p in
+                                  queue.queue.convertToArray()
+                                  if p.getType() not in LATENT)
+                if pending:
+                    self.assertTrue(max(pending.values()) <= 4)
+                e = queue.removeFirst()
+
+            expected = self.timeline(seed)
+            self.assertTrue(len(expected) > 0)
+            self.assertEqual(sorted(rows), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
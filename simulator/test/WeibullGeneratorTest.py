@@ -0,0 +1,113 @@
+import unittest
+from math import exp, expm1, sqrt
+from random import Random
+
+from numpy import allclose
+from numpy.random import RandomState
+
+from simulator.failure.EventGenerator import EventGenerator
+from simulator.failure.WeibullGenerator import WeibullGenerator
+
+# exponential, Weibull with a renewal offset, and the Poisson process case
+PARAMETERS = [{"gamma": 2.0, "lamda": 300.0, "beta": 1.0},
+              {"gamma": 0.0, "lamda": 300.0, "beta": 1.0},
+              {"gamma": 5.0, "lamda": 300.0, "beta": 1.7},
+              {"gamma": 0.0, "lamda": 300.0, "beta": 0.6}]
+
+
+class Exponentials(object):
+    """
+    Uniform draws of random.random() made from the Exp(1) draws of a
+    RandomState, so that -log(1 - r) of the scalar sampler gives back the
+    numbers the bulk one draws from the same seed.
+    """
+
+    def __init__(self, seed):
+        self.source = RandomState(seed)
+
+    def random(self):
+        return -expm1(-self.source.standard_exponential())
+
+
+# a generator whose scalar and bulk draws both come from seed
+def generator(parameters, seed):
+    w = WeibullGenerator("test", parameters)
+    w.setRandom(Exponentials(seed), RandomState(seed))
+    return w
+
+
+# largest gap between the empirical CDF of samples, put through their CDF,
+# and the uniform one
+def ksStatistic(uniforms):
+    uniforms = sorted(uniforms)
+    n = len(uniforms)
+    return max(max((i + 1.0)/n - u, u - float(i)/n)
+               for i, u in enumerate(uniforms))
+
+
+class WeibullGeneratorTest(unittest.TestCase):
+    """
+    Bulk sampling of WeibullGenerator against successive generateNextEvent
+    draws, and the distribution of the residual life.
+    """
+
+    def test_generate_events(self):
+        for parameters in PARAMETERS:
+            bulk = generator(parameters, 4)
+            bulk.reset(100.0)
+            scalar = generator(parameters, 4)
+            scalar.reset(100.0)
+            self.assertTrue(allclose(
+                bulk.generateEvents(250.0, 50),
+                EventGenerator.generateEvents(scalar, 250.0, 50),
+                rtol=1e-9), parameters)
+
+    def test_generate_until(self):
+        for parameters in PARAMETERS:
+            bulk = generator(parameters, 5)
+            bulk.reset(100.0)
+            scalar = generator(parameters, 5)
+            scalar.reset(100.0)
+            got = bulk.generateUntil(250.0, 20000.0)
+            expected = EventGenerator.generateUntil(scalar, 250.0, 20000.0)
+            self.assertTrue(len(expected) > 10)
+            self.assertEqual(len(got), len(expected))
+            self.assertTrue(allclose(got, expected, rtol=1e-9), parameters)
+
+    def test_next_events(self):
+        times = [100.0, 100.0, 130.5, 800.0, 2500.0]
+        for parameters in PARAMETERS:
+            bulk = generator(parameters, 6)
+            bulk.reset(100.0)
+            scalar = generator(parameters, 6)
+            scalar.reset(100.0)
+            self.assertTrue(allclose(
+                bulk.nextEvents(times),
+                [scalar.generateNextEvent(t) for t in times], rtol=1e-9),
+                parameters)
+        self.assertRaises(Exception, bulk.nextEvents, [50.0])
+
+    def test_residual_life(self):
+        # P(next > t + s) = exp(-(H(t + s) - H(t))) with H the cumulative
+        # hazard since the reset point, gamma added on top
+        n = 20000
+        for parameters in PARAMETERS:
+            w = WeibullGenerator("test", parameters)
+            w.setRandom(Random(7), RandomState(7))
+            w.reset(100.0)
+            lamda, beta = w.lamda, w.beta
+            hazard = lambda t: ((t - 100.0)/lamda)**beta
+            uniforms = []
+            for i in xrange(n):
+                t = 100.0 + 50.0*(i % 9)
+                x = w.generateNextEvent(t) - w.gamma
+                uniforms.append(1 - exp(hazard(t) - hazard(x)))
+            # 1% critical value of the Kolmogorov-Smirnov test
+            self.assertTrue(ksStatistic(uniforms) < 1.63/sqrt(n),
+                            parameters)
+            mean = sum(uniforms)/n
+            self.assertTrue(abs(mean - 0.5) < 3*sqrt(1/12.0/n), parameters)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,5 @@
 from simulator.unit.Unit import Unit
-from numpy import isnan, isinf
+from numpy import isnan, isinf, array, int32, int8
 from simulator.Event import Event
 from simulator.Configuration import Configuration
 
@@ -13,8 +13,15 @@ class Disk(Unit):
         self.disk_repair_time = conf.disk_repair_time
         self.chunk_repair_time = conf.chunk_repair_time
         self.slices_hit_by_LSE = []
+        # slice index: position of this disk's chunk in the slice's locations
+        self.chunk_positions = {}
+        # children and their chunk positions as arrays, built on demand
+        self.chunk_arrays = None
         self.latent_error_generator = None
         self.scrub_generator = None
+        # LatentErrorPopulation the latent errors are drawn by, None to draw
+        # them while generating events
+        self.latent_errors = None
 
     def setDiskCapacity(self, disk_capacity):
         self.disk_capacity = disk_capacity
@@ -25,13 +32,46 @@ class Disk(Unit):
     def getSlicesHitByLSE(self):
         return self.slices_hit_by_LSE
 
+    # children of a disk are slice indexes, position is the index of this
+    # disk in slice_locations[slice_index].
+    def addChild(self, slice_index, position=None):
+        super(Disk, self).addChild(slice_index)
+        self.chunk_positions[slice_index] = position
+        self.chunk_arrays = None
+
+    def removeChild(self, slice_index):
+        super(Disk, self).removeChild(slice_index)
+        del self.chunk_positions[slice_index]
+        self.chunk_arrays = None
+
+    def removeAllChildren(self):
+        self.chunk_positions = {}
+        self.chunk_arrays = None
+        return super(Disk, self).removeAllChildren()
+
+    def getChunkPosition(self, slice_index):
+        return self.chunk_positions[slice_index]
+
+    # (slice indexes, chunk positions) of this disk, in children order
+    def chunkArrays(self):
+        if self.chunk_arrays is None:
+            self.chunk_arrays = (
+                array(self.children, dtype=int32),
+                array([self.chunk_positions[s] for s in self.children],
+                      dtype=int8))
+        return self.chunk_arrays
+
     def addEventGenerator(self, generator):
         if generator.getName() == "latentErrorGenerator":
             self.latent_error_generator = generator
         else:
             super(Disk, self).addEventGenerator(generator)
 
-    def generateEvents(self, result_events, start_time, end_time, reset):
+    def getEventGenerators(self):
+        return [self.failure_generator, self.recovery_generator, self.latent_error_generator]
+
+    def eventCycles(self, result_events, start_time, end_time, reset,
+                    stream=False):
         if start_time < self.start_time:
             start_time = self.start_time
         current_time = start_time
@@ -92,6 +132,7 @@ class Disk(Unit):
             result_events.addEvent(Event(Event.EventType.Recovered,
                                          current_time, self))
             last_recover_time = current_time
+            yield current_time
 
     def generateRecoveryEvent(self, result_events, failure_time, end_time):
         if end_time < 0 or failure_time < 0:
@@ -125,13 +166,12 @@ class Disk(Unit):
 
     def generateLatentErrors(self, result_events, start_time, end_time):
         self.latent_error_generator.reset(start_time)
-        current_time = start_time
-        while True:
-            latent_error_time = self.latent_error_generator.generateNextEvent(
-                current_time)
-            current_time = latent_error_time
-            if current_time > end_time:
-                break
+        if self.latent_errors is not None:
+            self.latent_errors.addWindow(self, start_time, end_time)
+            return
+        latent_error_times = self.latent_error_generator.generateUntil(
+            start_time, end_time)
+        for current_time in latent_error_times.tolist():
             result_events.addEvent(Event(Event.EventType.LatentDefect,
                                          current_time, self))
 
@@ -1,4 +1,4 @@
-from numpy import isnan, isinf, ceil
+from numpy import isnan, isinf, ceil, searchsorted
 
 from simulator.Event import Event
 from simulator.unit.Disk import Disk
@@ -28,7 +28,8 @@ class DiskWithScrubbing(Disk):
     def getEventGenerators(self):
         return [self.failure_generator, self.recovery_generator, self.latent_error_generator, self.scrub_generator]
 
-    def generateEvents(self, result_events, start_time, end_time, reset):
+    def eventCycles(self, result_events, start_time, end_time, reset,
+                    stream=False):
         if start_time < self.start_time:
             start_time = self.start_time
         if isnan(start_time) or isinf(start_time):
@@ -129,6 +130,7 @@ class DiskWithScrubbing(Disk):
             current_time = self.last_recovery_time
             if current_time < 0:
                 raise Exception("current recovery time is negative")
+            yield current_time
 
     def generateRecoveryEvent(self, result_events, failure_time, end_time):
         if end_time < 0 or failure_time < 0:
@@ -167,24 +169,20 @@ class DiskWithScrubbing(Disk):
         if isinf(end_time) or isnan(end_time):
             raise Exception("end time = Inf or NaN")
 
-        current_time = start_time
-        while True:
-            latent_error_time = self.latent_error_generator.generateNextEvent(
-                current_time)
-            if isinf(latent_error_time):
-                break
-            if isinf(current_time) or isnan(current_time):
-                raise Exception("current time is infinitiy or -infinitiy")
-            if isinf(latent_error_time) or isnan(latent_error_time):
-                raise Exception("current time is infinitiy or -infinitiy")
+        if self.latent_errors is not None:
+            self.latent_errors.addWindow(self, start_time, end_time)
+            return
+        latent_error_times = self.latent_error_generator.generateUntil(
+            start_time, end_time)
+        # latent errors stop at the first one falling in a correlated
+        # failure interval
+        for [fail_time, recover_time, _bool] in self.failure_intervals:
+            first = searchsorted(latent_error_times, fail_time)
+            if first < len(latent_error_times) and \
+                    latent_error_times[first] <= recover_time:
+                latent_error_times = latent_error_times[:first]
 
-            LSE_in_CFI = False
-            for [fail_time, recover_time, _bool] in self.failure_intervals:
-                if fail_time <= latent_error_time <= recover_time:
-                    LSE_in_CFI = True
-            current_time = latent_error_time
-            if current_time > end_time or LSE_in_CFI:
-                break
+        for current_time in latent_error_times.tolist():
             e = Event(Event.EventType.LatentDefect, current_time, self)
             result_events.addEvent(e)
             latent_recovery_time = self.scrub_generator.generateNextEvent(current_time)
@@ -1,4 +1,3 @@
-from random import random, uniform
 from math import ceil
 
 from simulator.unit.Unit import Unit
@@ -67,7 +66,8 @@ class Machine(Unit):
 
         return fail_event
 
-    def generateEvents(self, result_events, start_time, end_time, reset):
+    def eventCycles(self, result_events, start_time, end_time, reset,
+                    stream=False):
         if start_time < self.start_time:
             start_time = self.start_time
         current_time = start_time
@@ -76,8 +76,9 @@ class Machine(Unit):
         if self.failure_generator is None:
             for [fail_time, recover_time, flag] in self.failure_intervals:
                 self.addCorrelatedFailures(result_events, fail_time, recover_time, flag)
-            for u in self.children:
-                u.generateEvents(result_events, start_time, end_time, True)
+            for bound in self.childCycles(result_events, start_time, end_time,
+                                          True, stream):
+                yield bound
             return
 
         if isinstance(self.failure_generator, Trace):
@@ -99,9 +100,10 @@ class Machine(Unit):
             if current_time > end_time:
                 for [fail_time, recover_time, flag] in self.failure_intervals:
                     self.addCorrelatedFailures(result_events, fail_time, recover_time, flag)
-                for u in self.children:
-                    u.generateEvents(result_events, last_recover_time,
-                                     end_time, True)
+                for bound in self.childCycles(result_events,
+                                              last_recover_time, end_time,
+                                              True, stream):
+                    yield bound
                 break
 
             if isinstance(self.failure_generator, Trace):
@@ -131,14 +133,15 @@ class Machine(Unit):
                 else:
                     self.failure_intervals.remove([fail_time, recover_time, _bool])
 
-            for u in self.children:
-                u.generateEvents(result_events, last_recover_time,
-                                 failure_time, True)
+            # the failure event of this machine is added after its children
+            for bound in self.childCycles(result_events, last_recover_time,
+                                          failure_time, True, stream):
+                yield min(bound, failure_time)
 
             if recovery_time > end_time - (1E-5):
                 recovery_time = end_time - (1E-5)
 
-            r = random()
+            r = self.random.random()
             if not self.fast_forward:  # we will process failures
                 if r < Machine.fail_fraction:
                     # failure type: tempAndShort=1, tempAndLong=2, permanent=3
@@ -189,6 +192,7 @@ class Machine(Unit):
             last_recover_time = current_time
             if current_time >= end_time - (1E-5):
                 break
+            yield current_time
 
     # def toString(self):
     #     full_name = super(Machine, self).toString()
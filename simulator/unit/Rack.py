@@ -10,7 +10,8 @@ class Rack(Unit):
         # but ignored(neither handled nor written to file).
         self.fast_forward = bool(parameters.get("fast_forward"))
 
-    def generateEvents(self, result_events, start_time, end_time, reset):
+    def eventCycles(self, result_events, start_time, end_time, reset,
+                    stream=False):
         if start_time < self.start_time:
             start_time = self.start_time
         current_time = start_time
@@ -19,8 +20,9 @@ class Rack(Unit):
         if self.failure_generator is None:
             for [fail_time, recover_time, flag] in self.failure_intervals:
                 self.addCorrelatedFailures(result_events, fail_time, recover_time, flag)
-            for u in self.children:
-                u.generateEvents(result_events, start_time, end_time, True)
+            for bound in self.childCycles(result_events, start_time, end_time,
+                                          True, stream):
+                yield bound
             return
 
         while True:
@@ -36,9 +38,10 @@ class Rack(Unit):
             if current_time > end_time:
                 for [fail_time, recover_time, flag] in self.failure_intervals:
                     self.addCorrelatedFailures(result_events, fail_time, recover_time, flag)
-                for u in self.children:
-                    u.generateEvents(result_events, last_recover_time,
-                                     end_time, True)
+                for bound in self.childCycles(result_events,
+                                              last_recover_time, end_time,
+                                              True, stream):
+                    yield bound
                 break
 
             for [fail_time, recover_time, _bool] in self.failure_intervals:
@@ -62,9 +65,9 @@ class Rack(Unit):
             if self.fast_forward:
                 fail_event.ignore = True
 
-            for u in self.children:
-                u.generateEvents(result_events, last_recover_time,
-                                 failure_time, True)
+            for bound in self.childCycles(result_events, last_recover_time,
+                                          failure_time, True, stream):
+                yield min(bound, failure_time)
 
             current_time = recovery_time
             fail_event.next_recovery_time = recovery_time
@@ -78,6 +81,7 @@ class Rack(Unit):
                 result_events.addEvent(Event(Event.EventType.Recovered,
                                        current_time, self))
             last_recover_time = current_time
+            yield current_time
 
     def toString(self):
         full_name = super(Rack, self).toString()
@@ -1,5 +1,7 @@
+import random as random_module
 from abc import ABCMeta
 from copy import deepcopy
+from heapq import heappop, heapreplace
 
 from simulator.Event import Event
 
@@ -7,6 +9,8 @@ from simulator.Event import Event
 class Unit:
     __metaclass__ = ABCMeta
     unit_count = 0
+    # stream of the unit's own draws, see simulator.Seeds
+    random = random_module
 
     def __init__(self, name, parent, parameters):
         self.children = []
@@ -36,6 +40,9 @@ class Unit:
     def getStartTime(self):
         return self.start_time
 
+    def setRandom(self, random):
+        self.random = random
+
     def setLastFailureTime(self, ts):
         self.last_failure_time = ts
 
@@ -82,6 +89,18 @@ class Unit:
     def getID(self):
         return self.id
 
+    # {unit id: unit} for this unit and all units below it, resolves the unit
+    # ids of an EventBatch.
+    def unitTable(self, table=None):
+        if table is None:
+            table = {}
+        table[self.id] = self
+        for unit in self.children:
+            if not isinstance(unit, Unit):
+                break
+            unit.unitTable(table)
+        return table
+
     def addEventGenerator(self, generator):
         if generator.getName() == "failureGenerator":
             self.failure_generator = generator
@@ -106,12 +125,24 @@ class Unit:
         return fail_event
 
     def generateEvents(self, result_events, start_time, end_time, reset):
+        for bound in self.eventCycles(result_events, start_time, end_time,
+                                      reset):
+            pass
+
+    # Generator form of generateEvents: events are added to result_events
+    # one failure/recovery cycle at a time, and after every step it yields a
+    # lower bound on the time of all events still to be added. With stream
+    # set, children are interleaved by their bounds rather than generated one
+    # after another, so a caller can pull events only as far as it needs.
+    def eventCycles(self, result_events, start_time, end_time, reset,
+                    stream=False):
         current_time = start_time
         last_recover_time = start_time
 
         if self.failure_generator is None:
-            for unit in self.children:
-                unit.generateEvents(result_events, start_time, end_time, reset)
+            for bound in self.childCycles(result_events, start_time, end_time,
+                                          reset, stream):
+                yield bound
             return
 
         while True:
@@ -122,15 +153,16 @@ class Unit:
                 current_time)
             current_time = failure_time
             if current_time > end_time:
-                for u in self.children:
-                    u.generateEvents(result_events, last_recover_time,
-                                     end_time, True)
+                for bound in self.childCycles(result_events,
+                                              last_recover_time, end_time,
+                                              True, stream):
+                    yield bound
                 break
             fail_event = Event(Event.EventType.Failure, current_time, self)
             result_events.addEvent(fail_event)
-            for u in self.children:
-                u.generateEvents(result_events, last_recover_time,
-                                 current_time, True)
+            for bound in self.childCycles(result_events, last_recover_time,
+                                          current_time, True, stream):
+                yield min(bound, failure_time)
 
             self.recovery_generator.reset(current_time)
             recovery_time = self.recovery_generator.generateNextEvent(
@@ -145,6 +177,28 @@ class Unit:
             result_events.addEvent(Event(Event.EventType.Recovered,
                                          current_time, self))
             last_recover_time = current_time
+            yield current_time
+
+    def childCycles(self, result_events, start_time, end_time, reset, stream):
+        cycles = [u.eventCycles(result_events, start_time, end_time, reset,
+                                stream) for u in self.children]
+        if not stream:
+            for cycle in cycles:
+                for bound in cycle:
+                    yield bound
+            return
+
+        # heap of [bound, child order, cycle], all children start together
+        heap = [[start_time, i, cycle] for i, cycle in enumerate(cycles)]
+        while heap != []:
+            i, cycle = heap[0][1:]
+            try:
+                heapreplace(heap, [next(cycle), i, cycle])
+            except StopIteration:
+                heappop(heap)
+                if heap == []:
+                    break
+            yield heap[0][0]
 
     def toString(self):
         if self.parent is None:
@@ -1,4 +1,26 @@
 
+from numpy import array, ndarray, uint8
+
+# set bits of every 16 bit value
+_POPCOUNT16 = array([bin(i).count("1") for i in xrange(1 << 16)], dtype=uint8)
+
+
+# number of set bits of a mask, or of each mask of a uint32/uint64 array
+def popcount(mask):
+    if isinstance(mask, ndarray):
+        count = _POPCOUNT16[mask & 0xffff] + _POPCOUNT16[(mask >> 16) & 0xffff]
+        if mask.dtype.itemsize > 4:
+            count += _POPCOUNT16[(mask >> 32) & 0xffff] + \
+                _POPCOUNT16[mask >> 48]
+        return count
+    mask = int(mask)
+    count = 0
+    while mask:
+        count += _POPCOUNT16[mask & 0xffff]
+        mask >>= 16
+    return count
+
+
 def splitMethod(string, split_with=','):
     s = string.strip()
     return s.split(split_with)